@@ -1,19 +1,28 @@
+import hashlib
+import importlib.metadata
+import json
 import os
 
 import airtrack
 
+from airtrack.settings import AIRTRACK_CACHE_PATH
 from airtrack.settings import AIRTRACK_STATE_DIAGRAM_FORMATS
-from airtrack.submodules.sttp.sttp import STTP
-
-from pybpodapi.protocol import Bpod
 
 STATE_TRANSITION_TABLE_FILENAME = 'state_transition_table.csv'
+STATE_TRANSITIONS_CACHE_FILENAME = 'state_transition_table.cache.json'
 STATE_DIAGRAM_FILENAME = 'state_diagram'
+STATE_DIAGRAM_HASH_FILENAME = f'{STATE_DIAGRAM_FILENAME}.sha256'
 STATE_TRANSITION_TABLE_FILE = os.path.join(
     os.path.dirname(__file__), STATE_TRANSITION_TABLE_FILENAME)
+# Outside the package, which may be installed read-only
+STATE_TRANSITIONS_CACHE_FILE = os.path.join(
+    AIRTRACK_CACHE_PATH, STATE_TRANSITIONS_CACHE_FILENAME)
+# Bump to invalidate caches written by an older bpodify implementation
+STATE_TRANSITIONS_CACHE_VERSION = 1
 
 
 def list_bpod_events():
+    from pybpodapi.protocol import Bpod
     return [e for e in dir(Bpod.Events)
             if e[0].isupper() and not callable(getattr(Bpod.Events, e))]
 
@@ -23,28 +32,120 @@ def list_bpod_serial_events(blacklist=[]):
             if e.startswith('Serial') and e not in blacklist]
 
 
+def _pybpod_version():
+    try:
+        return importlib.metadata.version('pybpod-api')
+    except importlib.metadata.PackageNotFoundError:
+        return ''
+
+
+def state_transition_table_hash():
+    """Return the hash of the state transition table contents.
+
+    :rtype: ``str``
+    """
+    with open(STATE_TRANSITION_TABLE_FILE, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _state_transitions_cache_key():
+    # Bpodified events depend on the Bpod events pybpod defines, too
+    return (f'{STATE_TRANSITIONS_CACHE_VERSION}:{_pybpod_version()}:'
+            f'{state_transition_table_hash()}')
+
+
+def _read_state_transitions_cache(key):
+    try:
+        with open(STATE_TRANSITIONS_CACHE_FILE) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get('key') != key:
+        return None
+    return cache.get('state_transitions')
+
+
+def _write_state_transitions_cache(key, state_transitions):
+    tmp_file = f'{STATE_TRANSITIONS_CACHE_FILE}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(AIRTRACK_CACHE_PATH, exist_ok=True)
+        with open(tmp_file, 'w') as f:
+            json.dump({'key': key, 'state_transitions': state_transitions},
+                      f, indent=2)
+        os.replace(tmp_file, STATE_TRANSITIONS_CACHE_FILE)
+    except OSError:
+        # E.g. a read-only home directory: work without the cache
+        pass
+
+
+def _state_diagram_dir():
+    return os.path.join(
+        os.path.dirname(airtrack.__path__.__dict__['_path'][0]),
+        'resources/diagrams')
+
+
 def read_state_transition_table():
     """Parse state transition table and return dictionary of state transitions.
 
     :rtype: ``dict``
     """
+    from airtrack.submodules.sttp.sttp import STTP
     sttp = STTP(stt_csv_file=STATE_TRANSITION_TABLE_FILE)
-    resources_dir = os.path.join(
-        os.path.dirname(airtrack.__path__.__dict__['_path'][0]),
-        'resources/diagrams')
-    for fmt in AIRTRACK_STATE_DIAGRAM_FORMATS:
+    return sttp.dictify()
+
+
+def render_state_diagrams(formats=AIRTRACK_STATE_DIAGRAM_FORMATS,
+                          force=False):
+    """Render the state diagram of the state transition table.
+
+    Rendering is skipped if the table did not change since the diagrams
+    were last rendered, unless `force` is ``True``.
+
+    :keyword  formats (optional):  Graphviz output formats
+    :type     formats (optional):  ``list`` of ``str``
+    :keyword  force (optional):  Render even if the table did not change
+    :type     force (optional):  ``bool``
+
+    :return: ``True`` if the diagrams were rendered, otherwise ``False``
+    :rtype: ``bool``
+    """
+    import graphviz
+    from airtrack.submodules.sttp.sttp import STTP
+    assert set(formats) <= set(graphviz.backend.FORMATS)
+    diagram_dir = _state_diagram_dir()
+    hash_file = os.path.join(diagram_dir, STATE_DIAGRAM_HASH_FILENAME)
+    table_hash = state_transition_table_hash()
+    if not force and os.path.exists(hash_file):
+        with open(hash_file) as f:
+            if f.read().strip() == table_hash:
+                return False
+    sttp = STTP(stt_csv_file=STATE_TRANSITION_TABLE_FILE)
+    for fmt in formats:
         state_machine_file = \
-            f'{os.path.join(resources_dir, STATE_DIAGRAM_FILENAME)}.{fmt}'
+            f'{os.path.join(diagram_dir, STATE_DIAGRAM_FILENAME)}.{fmt}'
         sttp.visualize(filename=state_machine_file, format=fmt)
-    return sttp.dictify()
+    with open(hash_file, 'w') as f:
+        f.write(table_hash)
+    return True
 
 
-def bpodify_state_transition_table():
+def bpodify_state_transition_table(use_cache=True):
     """Replace (non-Bpod) state transition events with Bpod protocol Serial
     events and return dictionary of state transitions.
 
+    The result is cached in `AIRTRACK_CACHE_PATH`, keyed by the table
+    contents, so the table is only parsed again once it changes.
+
+    :keyword  use_cache (optional):  Read and write the cache
+    :type     use_cache (optional):  ``bool``
+
     :rtype: ``dict``
     """
+    if use_cache:
+        cache_key = _state_transitions_cache_key()
+        cached_state_transitions = _read_state_transitions_cache(cache_key)
+        if cached_state_transitions is not None:
+            return cached_state_transitions
     state_transitions = read_state_transition_table()
     bpodified_state_transitions = {}
     bpod_events = list_bpod_events()
@@ -67,4 +168,7 @@ def bpodify_state_transition_table():
             else:
                 # Replace event with an available bpod serial event
                 new_transition[dest] = available_bpod_serial_events.pop(0)
+    if use_cache:
+        _write_state_transitions_cache(
+            cache_key, bpodified_state_transitions)
     return bpodified_state_transitions
@@ -1,39 +1,320 @@
-import os
+"""Airtrack settings.
+
+Settings are resolved lazily, on first access, from (in order of precedence):
+
+1. overrides passed to `settings.configure`
+2. environment variables of the same name, e.g. AIRTRACK_STATE_TIMER=0.05
+   (values are parsed as JSON, falling back to plain strings)
+3. the JSON object in the file named by the AIRTRACK_SETTINGS_FILE
+   environment variable
+4. the defaults below
+
+Importing this module has no side effects: nothing is created on disk until
+`settings.make_session_path()` is called (the pybpod settings call it, before
+pybpod is imported), and the session name is fixed on first access rather
+than at import time.
+
+Example:
+
+    from airtrack.settings import AIRTRACK_STATE_TIMER
+    from airtrack.settings import settings
+
+    # Must run before the modules reading the setting are imported
+    settings.configure(AIRTRACK_CAMERA_BACKEND='replay')
+"""
 import datetime
-import time
+import json
 import logging
+import os
 from pathlib import Path
 
-import graphviz
-
-# LOGGING
-AIRTRACK_LOG_LEVEL = logging.DEBUG
-AIRTRACK_DEBUG_PREFIX = '@@@@@@@@@>>>>'
-
-# SESSIONS
-homepath = os.environ.get('HOMEPATH') or os.environ.get('HOME')
-session_dirname = 'AIRTRACK_SESSIONS'
-session_path = os.path.join(homepath, 'Desktop', session_dirname)
-Path(session_path).mkdir(parents=True, exist_ok=True)
-AIRTRACK_SESSION_PATH = session_path
-AIRTRACK_SESSIONS_LOG_FILE = os.path.join(
-    AIRTRACK_SESSION_PATH, 'airtrack.log')
-AIRTRACK_STREAM_SESSION_TO_STDOUT = False
-
-# FILENAMES
-AIRTRACK_SESSION_NAME = datetime.datetime.fromtimestamp(
-    time.time()).strftime('%Y-%m-%d %H:%M:%S')
-
-# DEVICES
-AIRTRACK_BPOD_SERIAL_PORT = '/dev/ttyACM0'
-
-# STATE MACHINE
-AIRTRACK_STATE_DIAGRAM_FORMATS = ['png', 'pdf', 'svg']
-assert set(AIRTRACK_STATE_DIAGRAM_FORMATS) <= set(graphviz.backend.FORMATS)
-AIRTRACK_STATE_TIMER = 0.1
-
-# PARAMETERS
-AIRTRACK_MAX_ACTUATOR_TIMEOUT = 5
-AIRTRACK_ACTUATOR_PUSH_TIMEOUT = 3
-# Time the actuator should remain at rest before it is pulled back
-AIRTRACK_ACTUATOR_AT_REST_TIMEOUT = 3
+SETTINGS_FILE_ENV_VAR = 'AIRTRACK_SETTINGS_FILE'
+
+DEFAULTS = {
+    # LOGGING
+    'AIRTRACK_LOG_LEVEL': logging.DEBUG,
+    'AIRTRACK_DEBUG_PREFIX': '@@@@@@@@@>>>>',
+    # Records/sec each logger may log, in bursts of up to
+    # AIRTRACK_LOG_RATE_BURST records (None disables the rate limit)
+    'AIRTRACK_LOG_RATE_LIMIT': 200,
+    'AIRTRACK_LOG_RATE_BURST': 1000,
+
+    # SESSIONS
+    # AIRTRACK_SESSION_PATH and AIRTRACK_SESSIONS_LOG_FILE default to
+    # ~/Desktop/AIRTRACK_SESSIONS and its airtrack.log (see DERIVED)
+    'AIRTRACK_STREAM_SESSION_TO_STDOUT': False,
+    # Log every session to a JSON Lines file in AIRTRACK_SESSION_PATH
+    'AIRTRACK_LOG_SESSION_FILE': True,
+    # Record trials and events of every session into a columnar session
+    # store in AIRTRACK_SESSION_PATH (see airtrack/src/session.py)
+    'AIRTRACK_SESSION_RECORD': True,
+    # Number of rows per session store chunk file
+    'AIRTRACK_SESSION_CHUNK_SIZE': 4096,
+    # Name of the animal run, recorded in the session store metadata (see
+    # airtrack/src/analytics.py)
+    'AIRTRACK_ANIMAL': None,
+
+    # DEVICES
+    'AIRTRACK_BPOD_SERIAL_PORT': '/dev/ttyACM0',
+    # Connect the camera and open the Bpod concurrently, on start up
+    'AIRTRACK_PARALLEL_BRINGUP': True,
+    # Time (sec) all devices must be up within
+    'AIRTRACK_DEVICE_BRINGUP_TIMEOUT': 10,
+
+    # CAMERA
+    # One of: 'pixy', 'replay', 'server'
+    'AIRTRACK_CAMERA_BACKEND': 'pixy',
+    # Backend the 'server' backend's camera server process reads frames from
+    'AIRTRACK_CAMERA_SERVER_BACKEND': 'pixy',
+    # Number of frames in the camera server's shared-memory ring buffer
+    'AIRTRACK_CAMERA_SERVER_SLOTS': 8,
+    # Time (sec) to wait for a frame newer than this from the camera server
+    # (e.g. while it is respawned) before giving up
+    'AIRTRACK_CAMERA_SERVER_MAX_FRAME_AGE': 1,
+    # Pixy2 camera to open, if several are attached
+    'AIRTRACK_CAMERA_INDEX': 0,
+    # Record every camera frame to this file (None disables recording)
+    'AIRTRACK_CAMERA_RECORD_FILE': None,
+    # Recording served by the 'replay' backend
+    'AIRTRACK_CAMERA_REPLAY_FILE': None,
+    # Replay speed factor (e.g. 10 replays 10x faster than real time)
+    'AIRTRACK_CAMERA_REPLAY_SPEED': 1,
+    'AIRTRACK_CAMERA_REPLAY_LOOP': False,
+    # Poll the camera continuously in a background thread and serve subject
+    # queries from the latest snapshot
+    'AIRTRACK_CAMERA_CONTINUOUS_ACQUISITION': False,
+    'AIRTRACK_CAMERA_POLL_INTERVAL': 1 / 60,
+    # With lanes, poll continuously acquired frames at full rate only while
+    # the subject is near a lane boundary (within
+    # AIRTRACK_CAMERA_NEAR_LANE_DISTANCE pixels) or fast (over
+    # AIRTRACK_CAMERA_FAST_SUBJECT_SPEED pixels/sec), and down to every
+    # AIRTRACK_CAMERA_MAX_POLL_INTERVAL sec otherwise (see
+    # airtrack/src/camera/polling.py)
+    'AIRTRACK_CAMERA_ADAPTIVE_POLLING': True,
+    'AIRTRACK_CAMERA_MAX_POLL_INTERVAL': 0.25,
+    'AIRTRACK_CAMERA_NEAR_LANE_DISTANCE': 20,
+    'AIRTRACK_CAMERA_FAST_SUBJECT_SPEED': 150,
+    'AIRTRACK_CAMERA_SNAPSHOT_MAX_AGE': 0.1,
+    'AIRTRACK_CAMERA_SNAPSHOT_BUFFER_SIZE': 64,
+
+    # TRACING
+    # Time trial hot paths (see airtrack/src/trace.py) and export the spans
+    # to the session directory, at the end of the session
+    'AIRTRACK_TRACE': False,
+    # Number of most recent spans kept
+    'AIRTRACK_TRACE_BUFFER_SIZE': 100000,
+
+    # RIGS
+    # Times a crashed rig worker is restarted (see airtrack/src/rigs.py)
+    'AIRTRACK_RIG_MAX_RESTARTS': 3,
+    # Time (sec) to wait before restarting a crashed rig worker
+    'AIRTRACK_RIG_RESTART_DELAY': 5,
+
+    # SOAK TESTS
+    # Time (sec) between memory samples (see airtrack/src/soak.py)
+    'AIRTRACK_SOAK_SAMPLE_INTERVAL': 60,
+
+    # STATE MACHINE
+    # The parsed state transition table is cached in AIRTRACK_CACHE_PATH,
+    # which defaults to $XDG_CACHE_HOME/airtrack or ~/.cache/airtrack (see
+    # DERIVED)
+    'AIRTRACK_STATE_DIAGRAM_FORMATS': ['png', 'pdf', 'svg'],
+    'AIRTRACK_STATE_TIMER': 0.1,
+    # Build and send the state machine once per session, rather than per
+    # trial
+    'AIRTRACK_REUSE_STATE_MACHINE': True,
+    # Otherwise, build the next trial's state machine while a trial runs
+    'AIRTRACK_PIPELINE_TRIALS': True,
+
+    # PARAMETERS
+    'AIRTRACK_MAX_ACTUATOR_TIMEOUT': 5,
+    'AIRTRACK_ACTUATOR_PUSH_TIMEOUT': 3,
+    # Time the actuator should remain at rest before it is pulled back
+    'AIRTRACK_ACTUATOR_AT_REST_TIMEOUT': 3,
+    # Time actuator peeks with Bpod states (BNC output actions and state
+    # timers) instead of in Python
+    'AIRTRACK_ACTUATOR_HARDWARE_TIMING': False,
+    # Enter the lane (and start peeking) up to this long (sec) before the
+    # tracked subject is predicted to enter a lane, to make up for the
+    # actuator's mechanical lag (0 disables predictions; needs
+    # AIRTRACK_LANES)
+    'AIRTRACK_ACTUATOR_LEAD_TIME': 0,
+
+    # SUBJECT
+    # Lane polygons in camera (Pixy2 block) coordinates: lane name -> list
+    # of [x, y] vertices. Without lanes, the subject is inside the lane
+    # whenever its marker is hidden (see airtrack/src/subject/lanes.py).
+    'AIRTRACK_LANES': None,
+    # Time (sec) the subject marker may be hidden for (e.g. occluded) before
+    # the subject stops being located where it was last seen. A hidden
+    # marker is only read as inside the lane (without lanes) this long
+    # after it was last seen.
+    'AIRTRACK_SUBJECT_OCCLUSION_GRACE': 0,
+    # Switch the subject lane status once this many of the last
+    # AIRTRACK_SUBJECT_DEBOUNCE_WINDOW camera frames disagree with it, and
+    # no sooner than AIRTRACK_SUBJECT_DEBOUNCE_MIN_DWELL sec after the last
+    # switch (see airtrack/src/subject/debounce.py). The votes must be a
+    # majority of the window. The defaults pass every frame through. Each
+    # extra vote delays every switch by a frame: without continuous
+    # acquisition a frame is read per subject query, i.e. per
+    # AIRTRACK_STATE_TIMER, so e.g. 2 votes of 3 add 0.1 sec of reaction
+    # time by default.
+    'AIRTRACK_SUBJECT_DEBOUNCE_VOTES': 1,
+    'AIRTRACK_SUBJECT_DEBOUNCE_WINDOW': 1,
+    'AIRTRACK_SUBJECT_DEBOUNCE_MIN_DWELL': 0,
+    # With lanes, the subject must be this far (pixels) past a lane boundary
+    # to switch its lane status
+    'AIRTRACK_SUBJECT_LANE_HYSTERESIS': 2,
+    # Standard deviations of the subject acceleration (pixels/sec^2) and of
+    # the block positions (pixels) the subject tracker assumes (see
+    # airtrack/src/subject/tracker.py)
+    'AIRTRACK_SUBJECT_TRACKER_ACCELERATION': 500,
+    'AIRTRACK_SUBJECT_TRACKER_MEASUREMENT_NOISE': 2,
+
+    # SIMULATION
+    'AIRTRACK_SIMULATION_MEAN_INSIDE_LANE_TIME': 5,
+    'AIRTRACK_SIMULATION_MEAN_OUTSIDE_LANE_TIME': 5,
+
+    # STARTUP
+    # Maximum time (sec) `import airtrack.src` may take, and importing the
+    # system as the CLI does (Bpod, camera, ...) may take (see
+    # scripts/check_import_time.py)
+    'AIRTRACK_IMPORT_TIME_BUDGET': 0.5,
+    'AIRTRACK_CLI_IMPORT_TIME_BUDGET': 3.0,
+}
+
+
+def _session_path(settings):
+    homepath = os.environ.get('HOMEPATH') or os.environ.get('HOME')
+    return os.path.join(homepath, 'Desktop', 'AIRTRACK_SESSIONS')
+
+
+def _sessions_log_file(settings):
+    return os.path.join(settings.AIRTRACK_SESSION_PATH, 'airtrack.log')
+
+
+def _cache_path(settings):
+    cache_home = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'airtrack')
+
+
+def _session_name(settings):
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Settings whose default is computed (on first access) from other settings
+DERIVED = {
+    'AIRTRACK_SESSION_PATH': _session_path,
+    'AIRTRACK_SESSIONS_LOG_FILE': _sessions_log_file,
+    'AIRTRACK_SESSION_NAME': _session_name,
+    'AIRTRACK_CACHE_PATH': _cache_path,
+}
+
+
+def _parse_log_level(value):
+    if isinstance(value, str):
+        return logging.getLevelName(value.upper())
+    return value
+
+
+# Converters applied to values read from the environment or a file
+CONVERTERS = {
+    'AIRTRACK_LOG_LEVEL': _parse_log_level,
+}
+
+
+class AirtrackSettings:
+    """Lazily resolved Airtrack configuration."""
+
+    def __init__(self, environ=None):
+        """
+        :keyword  environ (optional):  Environment to read overrides from
+            (defaults to ``os.environ``)
+        :type     environ (optional):  ``dict``
+        """
+        self._environ = os.environ if environ is None else environ
+        self._overrides = {}
+        self._file_values = None
+        self._values = {}
+
+    def _check_name(self, name):
+        if name not in DEFAULTS and name not in DERIVED:
+            raise AttributeError(f'Unknown Airtrack setting: {name}')
+
+    def _read_file(self):
+        if self._file_values is None:
+            self._file_values = {}
+            filename = self._environ.get(SETTINGS_FILE_ENV_VAR)
+            if filename:
+                with open(filename) as f:
+                    self._file_values = json.load(f)
+        return self._file_values
+
+    def _parse_env(self, text):
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+    def _resolve(self, name):
+        if name in self._overrides:
+            return self._overrides[name]
+        convert = CONVERTERS.get(name, lambda value: value)
+        if name in self._environ:
+            return convert(self._parse_env(self._environ[name]))
+        file_values = self._read_file()
+        if name in file_values:
+            return convert(file_values[name])
+        if name in DERIVED:
+            return DERIVED[name](self)
+        return DEFAULTS[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        self._check_name(name)
+        if name not in self._values:
+            self._values[name] = self._resolve(name)
+        return self._values[name]
+
+    def configure(self, **overrides):
+        """Override settings.
+
+        Modules read settings when they are imported, so configure the
+        settings before importing the rest of airtrack.
+        """
+        for name in overrides:
+            self._check_name(name)
+        self._overrides.update(overrides)
+        for name in overrides:
+            self._values.pop(name, None)
+
+    def names(self):
+        """Return the names of all settings.
+
+        :rtype: ``list`` of ``str``
+        """
+        return [*DEFAULTS, *DERIVED]
+
+    def make_session_path(self):
+        """Create the session directory (if needed) and return its path.
+
+        :rtype: ``str``
+        """
+        Path(self.AIRTRACK_SESSION_PATH).mkdir(parents=True, exist_ok=True)
+        return self.AIRTRACK_SESSION_PATH
+
+
+settings = AirtrackSettings()
+
+
+def __getattr__(name):
+    # Resolve `from airtrack.settings import AIRTRACK_...` lazily
+    if name.startswith('AIRTRACK_'):
+        return getattr(settings, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return [*globals(), *settings.names()]
@@ -1 +1,6 @@
-from airtrack.src.base import Airtrack
+def __getattr__(name):
+    # Import the system (Bpod, camera, ...) only once it is used
+    if name == 'Airtrack':
+        from airtrack.src.base import Airtrack
+        return Airtrack
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -23,22 +23,28 @@ Example:
     aa.pull()  # Trigger pull action
     time.sleep(3)
 
-    # Trigger peek action (must loop)
-    while True:
-        aa.peek()
+    # Trigger peek action (must loop, until the peek completes)
+    while not aa.peek():
+        time.sleep(0.1)
 
 """
-import time
+import functools
+import threading
 
 from airtrack.settings import AIRTRACK_MAX_ACTUATOR_TIMEOUT
 from airtrack.settings import AIRTRACK_ACTUATOR_PUSH_TIMEOUT
 from airtrack.settings import AIRTRACK_ACTUATOR_AT_REST_TIMEOUT
 
+from airtrack.src import trace
 from airtrack.src import utils
 
+from airtrack.src.actuator.scheduler import AirtrackMotionScheduler
+from airtrack.src.clock import AirtrackClock
 from airtrack.src.definitions import AirtrackActuatorState
+from airtrack.src.definitions import AirtrackSessionEventType as EventType
 from airtrack.src.errors import AirtrackActuatorError
 from airtrack.src.errors import on_error_raise
+from airtrack.src.session import NULL_RECORDER
 
 from pybpodapi.protocol import Bpod
 
@@ -57,193 +63,148 @@ class AirtrackActuator:
     """Airtrack linear actuator interface."""
     LOW = 0
     HIGH = 255
+    BNC_CHANNELS = (1, 2)
     STATE = AirtrackActuatorState
 
-    def __init__(self, bpod):
+    def __init__(self, bpod, clock=None, loop=None, recorder=None):
         """
         :keyword  bpod:  A pybpod Bpod object
         :type     bpod:  :class:``pybpodapi.protocol.Bpod``
+        :keyword  clock (optional):  The clock to time actions with
+        :type     clock (optional):  :class:``AirtrackClock``
+        :keyword  loop (optional):  Time actions with this event loop,
+            rather than a timer thread
+        :type     loop (optional):  :class:``asyncio.AbstractEventLoop``
+        :keyword  recorder (optional):  The session recorder to record
+            actuator transitions with
+        :type     recorder (optional):
+            :class:``airtrack.src.session.AirtrackSessionRecorder``
         """
         self._bpod = bpod
+        # Actions scheduled in real time write from the scheduler thread
+        self._bpod_lock = utils.bpod_lock(bpod)
+        self._clock = clock or AirtrackClock()
+        self._recorder = recorder or NULL_RECORDER
+        self._scheduler = AirtrackMotionScheduler(self._clock, loop=loop)
+        # Guards actuator state against the scheduler thread
+        self._lock = threading.RLock()
         self._current_state = self.STATE.AT_REST
+        # Last written BNC output values (None: unknown)
+        self._bnc_outputs = dict.fromkeys(self.BNC_CHANNELS)
         self._peek_push_enabled = True
-        self._reset_peek_times()
-
-    @property
-    def _peek_push_start_time(self):
-        return self.__peek_push_start_time
-
-    @_peek_push_start_time.setter
-    def _peek_push_start_time(self, value):
-        if value is None:
-            self.__peek_push_start_time = None
-        elif self._peek_push_start_time is None:
-            self.__peek_push_start_time = value
-
-    @property
-    def _peek_push_elapsed_time(self):
-        return self.__peek_push_elapsed_time
-
-    @_peek_push_elapsed_time.setter
-    def _peek_push_elapsed_time(self, value):
-        if self._peek_push_elapsed_time is None or value != 0:
-            self.__peek_push_elapsed_time = value
-
-    @property
-    def _peek_push_timeout(self):
-        return self.__peek_push_timeout
-
-    @_peek_push_timeout.setter
-    def _peek_push_timeout(self, value):
-        if value is None:
-            self.__peek_push_timeout = None
-        elif self._peek_push_timeout is None:
-            self.__peek_push_timeout = value
-
-    @property
-    def _peek_at_rest_start_time(self):
-        return self.__peek_at_rest_start_time
-
-    @_peek_at_rest_start_time.setter
-    def _peek_at_rest_start_time(self, value):
-        if value is None:
-            self.__peek_at_rest_start_time = None
-        elif self._peek_at_rest_start_time is None:
-            self.__peek_at_rest_start_time = value
-
-    @property
-    def _peek_at_rest_timeout(self):
-        return self.__peek_at_rest_timeout
-
-    @_peek_at_rest_timeout.setter
-    def _peek_at_rest_timeout(self, value):
-        if value is None:
-            self.__peek_at_rest_timeout = None
-        elif self._peek_at_rest_timeout is None:
-            self.__peek_at_rest_timeout = value
-
-    @property
-    def _peek_at_rest_elapsed_time(self):
-        return self.__peek_at_rest_elapsed_time
-
-    @_peek_at_rest_elapsed_time.setter
-    def _peek_at_rest_elapsed_time(self, value):
-        if self._peek_at_rest_elapsed_time is None or value != 0:
-            self.__peek_at_rest_elapsed_time = value
-
-    @property
-    def _peek_pull_start_time(self):
-        return self.__peek_pull_start_time
-
-    @_peek_pull_start_time.setter
-    def _peek_pull_start_time(self, value):
-        if value is None:
-            self.__peek_pull_start_time = None
-        elif self._peek_pull_start_time is None:
-            self.__peek_pull_start_time = value
-
-    @property
-    def _peek_pull_elapsed_time(self):
-        return self.__peek_pull_elapsed_time
-
-    @_peek_pull_elapsed_time.setter
-    def _peek_pull_elapsed_time(self, value):
-        if self._peek_pull_elapsed_time is None or value != 0:
-            self.__peek_pull_elapsed_time = value
-
-    @property
-    def _peek_pull_timeout(self):
-        return self.__peek_pull_timeout
-
-    @_peek_pull_timeout.setter
-    def _peek_pull_timeout(self, value):
-        if self.__peek_pull_timeout is None or \
-                value != 0:
-            self.__peek_pull_timeout = value
-
-    def _reset_peek_times(self):
-        self.__peek_push_start_time = None
-        self.__peek_push_elapsed_time = 0
-        self.__peek_push_timeout = AIRTRACK_ACTUATOR_PUSH_TIMEOUT
-        self.__peek_at_rest_start_time = None
-        self.__peek_at_rest_elapsed_time = 0
-        self.__peek_at_rest_timeout = AIRTRACK_ACTUATOR_AT_REST_TIMEOUT
-        self.__peek_pull_start_time = None
-        self.__peek_pull_elapsed_time = 0
-        self.__peek_pull_timeout = 0
-
-    def _peek_push_timed_out(self):
-        return self._peek_push_elapsed_time >= self._peek_push_timeout
-
-    def _peek_at_rest_timed_out(self):
-        return self._peek_at_rest_elapsed_time >= self._peek_at_rest_timeout
-
-    def _peek_pull_timed_out(self):
-        return self._peek_pull_timeout == 0 or \
-            self._peek_pull_elapsed_time >= self._peek_pull_timeout
-
-    def _can_peek_rest(self):
-        return self._peek_push_timed_out()
-
-    def _can_peek_push(self):
-        cannot_pull = self._peek_pull_elapsed_time == 0 or \
-            self._peek_pull_timeout == 0 or \
-            self._peek_pull_timed_out()
-        return self._peek_push_enabled and cannot_pull
-
-    def _can_peek_pull(self):
-        return self._peek_at_rest_timed_out()
-
+        self._peek_generation = 0
+        self._reset_peek()
+
+    def _forget_outputs(self):
+        # The BNC outputs are unknown: the next action writes its outputs
+        self._bnc_outputs = dict.fromkeys(self.BNC_CHANNELS)
+
+    def _reset_peek(self):
+        # Invalidate the actions scheduled for the previous peek
+        self._peek_generation += 1
+        self._scheduler.clear()
+        self._peeking = False
+        self._push_start_time = None
+        self._push_end_time = None
+        self._pull_end_time = None
+        self._pull_after_push = False
+
+    def _pushed_time(self, now):
+        if self._push_start_time is None:
+            return 0
+        return min(now, self._push_end_time) - self._push_start_time
+
+    @trace.span('actuator.trigger_bnc_output')
     @handle_error
     def _trigger_bnc_output(self, channel_number, value):
-        self._bpod.manual_override(
-            channel_type=Bpod.ChannelTypes.OUTPUT,
-            channel_name=Bpod.ChannelNames.BNC,
-            channel_number=channel_number,
-            value=value,
-            ignore_emulator=True)
+        with self._bpod_lock:
+            self._bpod.manual_override(
+                channel_type=Bpod.ChannelTypes.OUTPUT,
+                channel_name=Bpod.ChannelNames.BNC,
+                channel_number=channel_number,
+                value=value,
+                ignore_emulator=True)
+
+    def _write_bnc_outputs(self, outputs):
+        """Set several BNC outputs at once.
+
+        Outputs already at the requested value are not written (see
+        `note_state_entry` for when they no longer are). Lowered outputs are
+        written before raised ones, so that the actuator passes through rest
+        rather than being driven both ways at once.
+
+        :keyword  outputs:  BNC channel number -> value
+        :type     outputs:  ``dict``
+        """
+        changes = sorted(
+            ((channel_number, value)
+             for channel_number, value in outputs.items()
+             if self._bnc_outputs[channel_number] != value),
+            key=lambda change: change[1])
+        for channel_number, value in changes:
+            self._trigger_bnc_output(channel_number, value)
+            self._bnc_outputs[channel_number] = value
 
     def _trigger_ok(self, state, desired_state):
-        return state == desired_state and self._current_state != desired_state
+        # Outputs already written are skipped by `_write_bnc_outputs`
+        return state == desired_state
 
     def _trigger_rest(self):
-        self._trigger_bnc_output(channel_number=1, value=self.LOW)
-        self._trigger_bnc_output(channel_number=2, value=self.LOW)
+        self._write_bnc_outputs({1: self.LOW, 2: self.LOW})
 
     def _trigger_push(self):
-        self._trigger_bnc_output(channel_number=1, value=self.HIGH)
-        self._trigger_bnc_output(channel_number=2, value=self.LOW)
+        self._write_bnc_outputs({1: self.HIGH, 2: self.LOW})
 
     def _trigger_pull(self):
-        self._trigger_bnc_output(channel_number=1, value=self.LOW)
-        self._trigger_bnc_output(channel_number=2, value=self.HIGH)
+        self._write_bnc_outputs({1: self.LOW, 2: self.HIGH})
 
     def _trigger(self, state):
+        with self._lock:
+            self._trigger_state(state)
+
+    def _trigger_state(self, state):
         if self._trigger_ok(state, self.STATE.AT_REST):
             self._trigger_rest()
-            self._current_state = self.STATE.AT_REST
         elif self._trigger_ok(state, self.STATE.PUSHING):
             self._trigger_push()
-            self._current_state = self.STATE.PUSHING
         elif self._trigger_ok(state, self.STATE.PULLING):
             self._trigger_pull()
-            self._current_state = self.STATE.PULLING
-
-    def _peek_rest(self):
-        self._peek_at_rest_start_time = time.time()
-        self.rest()
-        self._peek_at_rest_elapsed_time = time.time() - \
-            self._peek_at_rest_start_time
-
-    def _peek_push(self):
-        self._peek_push_start_time = time.time()
+        else:
+            return
+        if state != self._current_state:
+            self._current_state = state
+            self._recorder.record(EventType.ACTUATOR, state.name)
+
+    def _start_peek(self, now):
+        self._peeking = True
+        self._push_start_time = now
+        self._push_end_time = now + AIRTRACK_ACTUATOR_PUSH_TIMEOUT
+        rest_end_time = \
+            self._push_end_time + AIRTRACK_ACTUATOR_AT_REST_TIMEOUT
+        generation = self._peek_generation
         self.push()
-        self._peek_push_elapsed_time = time.time() - \
-            self._peek_push_start_time
-        self._peek_pull_timeout = self._peek_push_elapsed_time
-
-    def _peek_pull(self):
-        return self.pull(enable_push=False)
+        self._scheduler.schedule(
+            self._push_end_time,
+            functools.partial(self._peek_rest, generation))
+        self._scheduler.schedule(
+            rest_end_time,
+            functools.partial(self._peek_pull, generation))
+
+    def _peek_rest(self, generation, deadline):
+        with self._lock:
+            if generation == self._peek_generation:
+                self.rest()
+
+    def _peek_pull(self, generation, deadline):
+        with self._lock:
+            if generation != self._peek_generation:
+                return
+            # Pull back for as long as the actuator was pushed
+            self._pull_end_time = deadline + self._pushed_time(deadline)
+            self._pull_after_push = True
+            self._peek_push_enabled = False
+            logger.debug('PULLING...')
+            self._trigger(self.STATE.PULLING)
 
     def _rest(self):
         self._trigger(self.STATE.AT_REST)
@@ -256,23 +217,34 @@ class AirtrackActuator:
     def push(self):
         """Trigger an actuator push action."""
         logger.debug('PUSHING...')
-        self._rest()
         self._trigger(self.STATE.PUSHING)
 
     def pull(self, enable_push=True):
-        """Trigger an actuator pull action."""
+        """Trigger an actuator pull action.
+
+        The first call after a push schedules the pull to end after as long
+        as the actuator was pushed for; subsequent calls keep pulling.
+
+        :return: ``True`` once a pull following a push has ended,
+            otherwise ``False``
+        :rtype: ``bool``
+        """
         logger.debug('PULLING...')
-        self._peek_pull_start_time = time.time()
-        self._rest()
-        self._trigger(self.STATE.PULLING)
-        self._peek_pull_elapsed_time = time.time() - \
-            self._peek_pull_start_time
-        self._peek_push_enabled = enable_push
-        if self._peek_pull_timed_out():
-            pull_time_out_initialized = self._peek_pull_timeout != 0
-            self._reset_peek_times()
-            return pull_time_out_initialized
-        return False
+        with self._lock:
+            self._scheduler.run_pending()
+            now = self._clock.time()
+            if self._pull_end_time is None:
+                pushed_time = self._pushed_time(now)
+                self._reset_peek()
+                self._pull_end_time = now + pushed_time
+                self._pull_after_push = pushed_time > 0
+            self._trigger(self.STATE.PULLING)
+            self._peek_push_enabled = enable_push
+            if now >= self._pull_end_time:
+                pull_ended = self._pull_after_push
+                self._reset_peek()
+                return pull_ended
+            return False
 
     def peek(self):
         """Trigger an actuator peek action.
@@ -282,22 +254,55 @@ class AirtrackActuator:
         while True:
             aa.peek()
 
-        On each call, this method does one of the following:
-        a. pull (if `AIRTRACK_ACTUATOR_PUSH_TIMEOUT` seconds have passed since
-            first call)
-        b. rest (if `AIRTRACK_ACTUATOR_AT_REST_TIMEOUT` seconds have passed
-            since first call)
-        c. push (if permitted)
+        The first call pushes the actuator and schedules, at absolute
+        deadlines, its rest (after `AIRTRACK_ACTUATOR_PUSH_TIMEOUT` seconds)
+        and its pull (after a further `AIRTRACK_ACTUATOR_AT_REST_TIMEOUT`
+        seconds). Subsequent calls only report whether the peek completed.
+
+        :return: ``True`` once the peek pull has ended, otherwise ``False``
+        :rtype: ``bool``
         """
-        peek_completed = False
-        if self._can_peek_pull():
-            peek_completed = self._peek_pull()
-        elif self._can_peek_rest():
-            self._peek_rest()
-        elif self._can_peek_push():
-            self._peek_push()
-        return peek_completed
+        with self._lock:
+            self._scheduler.run_pending()
+            now = self._clock.time()
+            if self._peeking or self._pull_end_time is not None:
+                # Re-assert the outputs of the current peek phase, in case
+                # a state entry drove them low since
+                self._trigger(self._current_state)
+            if self._pull_end_time is not None:
+                if self._peeking and now >= self._pull_end_time:
+                    self._reset_peek()
+                    return True
+                return False
+            if not self._peeking and self._peek_push_enabled:
+                self._start_peek(now)
+            return False
+
+    def note_state_entry(self):
+        """Note a Bpod state entry.
+
+        The Bpod drives BNC outputs low on entering a state that does not set
+        them, so call this on every state entry: the next action (or `peek`
+        call) then raises the outputs it needs again, rather than skipping
+        them as already set.
+        """
+        with self._lock:
+            self._bnc_outputs = dict.fromkeys(self.BNC_CHANNELS, self.LOW)
+
+    def reset_peek(self):
+        """Cancel any peek or pull in progress and re-enable peeking."""
+        with self._lock:
+            self._reset_peek()
+            self._forget_outputs()
+            self._peek_push_enabled = True
+
+    def close(self):
+        """Cancel any scheduled action, leaving the actuator as it is."""
+        with self._lock:
+            self._reset_peek()
 
     def reset(self):
         """Reset the actuator."""
+        with self._lock:
+            self._forget_outputs()
         self.pull()
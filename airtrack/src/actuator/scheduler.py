@@ -0,0 +1,152 @@
+"""Airtrack actuator motion scheduler module.
+
+This module provides a deadline-driven scheduler (AirtrackMotionScheduler)
+for actuator actions. Actions are kept in a heap ordered by their absolute
+deadline and fired, without polling, either by a timer thread sleeping until
+the earliest deadline, by an asyncio event loop timer (if given an event
+loop, firing them in the loop's default executor) or, for virtual clocks, by
+explicit `run_pending` calls.
+
+Example:
+
+    from airtrack.src.actuator.scheduler import AirtrackMotionScheduler
+
+    scheduler = AirtrackMotionScheduler()
+    now = scheduler.time()
+    scheduler.schedule(now + 1, lambda deadline: print('1 sec later'))
+    scheduler.schedule(now + 2, lambda deadline: print('2 sec later'))
+"""
+import collections
+import heapq
+import itertools
+import threading
+
+from airtrack.src.clock import AirtrackClock
+
+
+class AirtrackMotionScheduler:
+    """Deadline-driven actuator action scheduler."""
+    LATENESS_HISTORY_SIZE = 1024
+
+    def __init__(self, clock=None, threaded=None, loop=None):
+        """
+        :keyword  clock (optional):  The clock deadlines refer to
+        :type     clock (optional):  :class:``AirtrackClock``
+        :keyword  threaded (optional):  Fire actions from a timer thread
+            (defaults to ``True`` for real-time clocks without a `loop`)
+        :type     threaded (optional):  ``bool``
+        :keyword  loop (optional):  Fire actions from this event loop
+            instead (real-time clocks only)
+        :type     loop (optional):  :class:``asyncio.AbstractEventLoop``
+        """
+        self._clock = clock or AirtrackClock()
+        self._loop = loop if self._clock.realtime else None
+        self._timer = None
+        self._threaded = \
+            self._clock.realtime and self._loop is None \
+            if threaded is None else threaded
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        # Time (sec) actions were fired after their deadline
+        self.lateness = collections.deque(maxlen=self.LATENESS_HISTORY_SIZE)
+
+    def _pop_due(self, now):
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            due.append(heapq.heappop(self._queue))
+        return due
+
+    def _fire(self, due, now):
+        for deadline, _, action in due:
+            self.lateness.append(now - deadline)
+            action(deadline)
+
+    def _run(self):
+        with self._condition:
+            while self._queue:
+                timeout = self._queue[0][0] - self._clock.time()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+                now = self._clock.time()
+                due = self._pop_due(now)
+                self._condition.release()
+                try:
+                    self._fire(due, now)
+                finally:
+                    self._condition.acquire()
+            # The thread exits when idle, and is restarted by `schedule`
+            self._thread = None
+
+    def _arm_timer(self):
+        # Runs in the event loop: time the earliest deadline
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        with self._condition:
+            if not self._queue:
+                return
+            timeout = self._queue[0][0] - self._clock.time()
+        self._timer = self._loop.call_later(max(timeout, 0), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        # Actions take the actuator lock and write to the Bpod serial port:
+        # fire them off the event loop thread
+        future = self._loop.run_in_executor(None, self.run_pending)
+        future.add_done_callback(self._on_fired)
+
+    def _on_fired(self, future):
+        self._arm_timer()
+        # Let the event loop report errors of the fired actions
+        future.result()
+
+    def _rearm_timer(self):
+        # The event loop may be closed by now (e.g. on reset at exit)
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._arm_timer)
+
+    def time(self):
+        """Return the current time of the scheduler clock (sec)."""
+        return self._clock.time()
+
+    def schedule(self, deadline, action):
+        """Schedule `action(deadline)` to be called at `deadline`.
+
+        :keyword  deadline:  Absolute time (sec) on the scheduler clock
+        :type     deadline:  ``float``
+        :keyword  action:    Callable taking the deadline as argument
+        :type     action:    ``callable``
+        """
+        with self._condition:
+            heapq.heappush(
+                self._queue, (deadline, next(self._counter), action))
+            if self._threaded:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name='AirtrackMotionScheduler',
+                        daemon=True)
+                    self._thread.start()
+                self._condition.notify()
+        self._rearm_timer()
+
+    def clear(self):
+        """Cancel all scheduled actions."""
+        with self._condition:
+            self._queue.clear()
+            self._condition.notify()
+        self._rearm_timer()
+
+    def run_pending(self):
+        """Fire the actions whose deadline has passed.
+
+        :return: The number of fired actions
+        :rtype: ``int``
+        """
+        now = self._clock.time()
+        with self._condition:
+            due = self._pop_due(now)
+        self._fire(due, now)
+        return len(due)
@@ -0,0 +1,212 @@
+"""Airtrack asyncio module.
+
+This module provides an asyncio interface (AsyncAirtrack) for the Airtrack
+system, for running one or more rigs (and e.g. a monitoring endpoint) from a
+single event loop:
+
+- `run`, `run_trial` and `close` are awaitable.
+- Trial events (started, ended, failed) are delivered through async
+  iterators, one per `events` call.
+- Camera polling is an asyncio task, and actuator actions are timed with
+  event loop timers, rather than with threads.
+
+pybpod runs state machines with blocking serial I/O, so each trial itself
+still runs in the event loop's default executor.
+
+Example:
+
+    import asyncio
+    from airtrack.src.aio import AsyncAirtrack
+
+    async def main():
+        async with await AsyncAirtrack.create() as airtrack:
+            async def monitor():
+                async for event in airtrack.events():
+                    print(event)
+            asyncio.create_task(monitor())
+            await airtrack.run(trials=10)
+
+    asyncio.run(main())
+"""
+import asyncio
+import collections
+import contextlib
+import functools
+import itertools
+
+from airtrack.src import utils
+
+from airtrack.src.base import Airtrack
+from airtrack.src.definitions import AirtrackTrialEventType
+
+logger = utils.create_logger(__name__)
+
+TrialEvent = collections.namedtuple(
+    'TrialEvent', ['type', 'trial', 'time', 'duration', 'error'])
+
+
+class TrialEventStream:
+    """Async iterator over the trial events of an AsyncAirtrack."""
+
+    def __init__(self, subscribers, buffer_size):
+        self._subscribers = subscribers
+        self._queue = asyncio.Queue(maxsize=buffer_size)
+        # Subscribe right away, so that no event is missed
+        self._subscribers.add(self)
+
+    def put(self, event):
+        if self._queue.full():
+            # Drop the oldest event, rather than block the publisher
+            self._queue.get_nowait()
+        self._queue.put_nowait(event)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self._queue.get()
+        if event is None:
+            self.close()
+            raise StopAsyncIteration
+        return event
+
+    def close(self):
+        """Stop receiving trial events."""
+        self._subscribers.discard(self)
+
+
+class AsyncAirtrack:
+    """Airtrack system asyncio interface."""
+    EVENT_BUFFER_SIZE = 1024
+
+    def __init__(self, airtrack, loop):
+        """Use `AsyncAirtrack.create` to create an AsyncAirtrack.
+
+        :keyword  airtrack:  The system, timing actuator actions with `loop`
+        :type     airtrack:  :class:``airtrack.src.Airtrack``
+        :keyword  loop:  The event loop
+        :type     loop:  :class:``asyncio.AbstractEventLoop``
+        """
+        self._airtrack = airtrack
+        self._loop = loop
+        self._subscribers = set()
+        self._camera_task = None
+        self._trial = None
+        self._closed = False
+
+    @classmethod
+    async def create(cls, airtrack_class=Airtrack, **kwargs):
+        """Create (and bring up) the system.
+
+        :keyword  airtrack_class (optional):  The system class (e.g.
+            :class:``airtrack.src.simulation.AirtrackSimulation``)
+        :type     airtrack_class (optional):  ``type``
+
+        Other keyword arguments are passed on to the system.
+
+        :rtype: :class:``AsyncAirtrack``
+        """
+        loop = asyncio.get_running_loop()
+        # Device bring-up blocks
+        airtrack = await asyncio.to_thread(
+            functools.partial(airtrack_class, loop=loop, **kwargs))
+        self = cls(airtrack, loop)
+        self._start_camera_task()
+        return self
+
+    @property
+    def airtrack(self):
+        """The (synchronous) system."""
+        return self._airtrack
+
+    def _start_camera_task(self):
+        camera = getattr(self._airtrack.subject, 'camera', None)
+        if camera is not None:
+            # Brought up in an executor thread
+            camera.install_signal_handlers()
+            self._camera_task = self._loop.create_task(
+                camera.acquire_async())
+
+    def _publish(self, event_type, trial, duration=None, error=None):
+        event = TrialEvent(
+            event_type, trial, self._loop.time(), duration, error)
+        for stream in list(self._subscribers):
+            stream.put(event)
+
+    def events(self):
+        """Return an async iterator over the trial events from now on.
+
+        Iteration ends when the system is closed. Events are dropped, oldest
+        first, for iterators more than `EVENT_BUFFER_SIZE` events behind.
+
+        :rtype: :class:``TrialEventStream``
+        """
+        return TrialEventStream(self._subscribers, self.EVENT_BUFFER_SIZE)
+
+    def _end_trial(self, trial):
+        error = self._trial.exception()
+        if error is not None:
+            self._publish(AirtrackTrialEventType.FAILED, trial, error=error)
+            raise error
+        duration = self._trial.result()
+        self._publish(AirtrackTrialEventType.ENDED, trial, duration=duration)
+        return duration
+
+    async def _wait_trial(self):
+        # Unlike awaiting it, waiting for the trial does not cancel it
+        if self._trial is not None:
+            await asyncio.wait([self._trial])
+
+    async def run_trial(self):
+        """Run a single trial.
+
+        A cancelled trial still runs to its end (its thread cannot be
+        interrupted) before the cancellation is raised.
+
+        :return: The trial duration (sec)
+        :rtype: ``float``
+        """
+        trial = self._airtrack.trial_count + 1
+        self._publish(AirtrackTrialEventType.STARTED, trial)
+        self._trial = asyncio.ensure_future(
+            asyncio.to_thread(self._airtrack.run_trial))
+        try:
+            await self._wait_trial()
+        except asyncio.CancelledError:
+            await self._wait_trial()
+            with contextlib.suppress(Exception):
+                self._end_trial(trial)
+            raise
+        return self._end_trial(trial)
+
+    async def run(self, trials=None):
+        """Run the system.
+
+        A cancelled run stops after the trial in progress.
+
+        :keyword  trials (optional):  Number of trials to run the system for.
+        :type     trials (optional):  ``int``
+        """
+        iterator = range(trials or 0) or itertools.count()
+        for _ in iterator:
+            await self.run_trial()
+
+    async def close(self):
+        """Close the system, once the trial in progress (if any) ended."""
+        if self._closed:
+            return
+        self._closed = True
+        await self._wait_trial()
+        if self._camera_task is not None:
+            self._camera_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._camera_task
+        await asyncio.to_thread(self._airtrack.close)
+        for stream in list(self._subscribers):
+            stream.put(None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,369 @@
+"""Airtrack analytics module.
+
+This module provides per-session and per-animal metrics (AirtrackAnalytics)
+over the session stores (see airtrack/src/session.py) in
+AIRTRACK_SESSION_PATH:
+
+- trials, total and mean trial duration
+- time spent in ENTER_LANE (including hardware-timed peeks) and in
+  EXIT_LANE
+- actuator peeks (pushes, or with hardware timing PEEK_PUSH state entries),
+  in total and per trial
+- lane entries of the subject (transitions from outside to inside the lane,
+  as queried in QUERY_SUBJECT_LOCATION), and the lane occupancy (the
+  fraction of trial time the subject was inside the lane)
+
+Per-trial metrics are computed with NumPy, without Python-level loops over
+events, and cached in an index directory: a trials file concatenating the
+per-trial metrics of every session, and a manifest mapping every session to
+its trial offset and count in it. Updating the index only reads the session
+stores added or changed since the last update, and session and animal
+metrics are reduced from the cached per-trial metrics.
+
+Example:
+
+    from airtrack.src.analytics import AirtrackAnalytics
+
+    analytics = AirtrackAnalytics()
+    analytics.update()
+    for animal, metrics in analytics.animal_metrics().items():
+        print(animal, metrics['mean_trial_duration'])
+"""
+import glob
+import json
+import os
+
+import numpy as np
+
+from airtrack.settings import settings
+
+from airtrack.src import utils
+
+from airtrack.src.definitions import AirtrackSessionEventType as EventType
+from airtrack.src.definitions import AirtrackPeekState as PeekState
+from airtrack.src.definitions import AirtrackState as State
+from airtrack.src.definitions import AirtrackActuatorState
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackAnalyticsError
+from airtrack.src.session import read_metadata
+from airtrack.src.session import read_session
+from airtrack.src.session import SESSION_STORE_EXTENSION
+
+logger = utils.create_logger(__name__)
+
+# Bump to discard indexes built by older versions
+INDEX_VERSION = 3
+INDEX_DIR = 'analytics'
+MANIFEST_FILE = 'manifest.json'
+TRIALS_FILE = 'trials.npz'
+UNKNOWN_ANIMAL = 'unknown'
+
+# Per-trial metric -> dtype
+TRIAL_METRICS = {
+    'trial': np.uint32,
+    'duration': np.float64,
+    'enter_lane_time': np.float64,
+    'exit_lane_time': np.float64,
+    'peeks': np.uint32,
+    'lane_entries': np.uint32,
+    'inside_lane_time': np.float64,
+}
+
+
+def _empty_trial_metrics():
+    return {metric: np.empty(0, dtype=dtype)
+            for metric, dtype in TRIAL_METRICS.items()}
+
+
+def _segment_durations(rows, times, end_times):
+    # Time from every event to the next event of the same trial, or to the
+    # end of the trial for the last one
+    next_times = end_times[rows]
+    same_trial = rows[1:] == rows[:-1]
+    next_times[:-1][same_trial] = times[1:][same_trial]
+    return next_times - times
+
+
+def trial_metrics(session):
+    """Compute the per-trial metrics of a session.
+
+    Events of trials that did not end (e.g. of a crashed session) are
+    ignored.
+
+    :keyword  session:  The session tables, as returned by `read_session`
+    :type     session:  ``dict``
+
+    :return: Metric (see `TRIAL_METRICS`) -> column, a row per trial
+    :rtype: ``dict`` of ``str`` -> ``numpy.ndarray``
+    """
+    trials, events = session['trials'], session['events']
+    ntrials = len(trials['trial'])
+    if not ntrials:
+        return _empty_trial_metrics()
+    # Trial row of every event
+    order = np.argsort(trials['trial'], kind='stable')
+    sorted_trials = trials['trial'][order]
+    positions = np.minimum(
+        np.searchsorted(sorted_trials, events['trial']), ntrials - 1)
+    ended = sorted_trials[positions] == events['trial']
+    rows = order[positions][ended]
+    # Events in trial, then time order
+    by_time = np.lexsort((events['time'][ended], rows))
+    rows = rows[by_time]
+    times = events['time'][ended][by_time]
+    kinds = events['kind'][ended][by_time]
+    names = events['name'][ended][by_time]
+    values = events['value'][ended][by_time]
+    end_times = trials['end_time']
+
+    def per_trial(mask, weights=None):
+        if weights is not None:
+            weights = weights[mask]
+        return np.bincount(rows[mask], weights=weights, minlength=ntrials)
+
+    states = kinds == EventType.STATE.value
+    state_durations = np.zeros(len(rows))
+    state_durations[states] = _segment_durations(
+        rows[states], times[states], end_times)
+    # Subject events record every change of the queried lane occupancy
+    subject = kinds == EventType.SUBJECT.value
+    inside_lane_durations = np.zeros(len(rows))
+    inside_lane_durations[subject] = _segment_durations(
+        rows[subject], times[subject], end_times) * values[subject]
+    return {
+        'trial': trials['trial'].astype(TRIAL_METRICS['trial']),
+        'duration': trials['duration'].astype(TRIAL_METRICS['duration']),
+        'enter_lane_time': per_trial(
+            states & np.isin(names, [State.ENTER_LANE.name,
+                                     PeekState.PEEK_PUSH.name]),
+            state_durations),
+        'exit_lane_time': per_trial(
+            states & (names == State.EXIT_LANE.name), state_durations),
+        # The Bpod times hardware-timed peeks, without actuator events
+        'peeks': per_trial(
+            ((kinds == EventType.ACTUATOR.value)
+             & (names == AirtrackActuatorState.PUSHING.name))
+            | (states & (names == PeekState.PEEK_PUSH.name))
+        ).astype(TRIAL_METRICS['peeks']),
+        'lane_entries': per_trial(
+            subject & (values == 1)).astype(TRIAL_METRICS['lane_entries']),
+        'inside_lane_time': per_trial(subject, inside_lane_durations),
+    }
+
+
+def _metrics(trials, sums):
+    # Metrics of groups of trials, from their per-trial metric sums
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'trials': trials,
+            'duration': sums['duration'],
+            'mean_trial_duration': sums['duration'] / trials,
+            'enter_lane_time': sums['enter_lane_time'],
+            'exit_lane_time': sums['exit_lane_time'],
+            'enter_lane_fraction': sums['enter_lane_time']
+            / (sums['enter_lane_time'] + sums['exit_lane_time']),
+            'peeks': sums['peeks'],
+            'peeks_per_trial': sums['peeks'] / trials,
+            'lane_entries': sums['lane_entries'],
+            'lane_occupancy': sums['inside_lane_time'] / sums['duration'],
+        }
+
+
+def _store_signature(store):
+    # Changes whenever a chunk is written to the session store
+    signature = []
+    for entry in sorted(os.scandir(store), key=lambda e: e.name):
+        stat = entry.stat()
+        signature.append([entry.name, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+class AirtrackAnalytics:
+    """Airtrack session analytics."""
+    UNKNOWN_SESSION_ERROR_MSG = 'No session named {!r} is indexed.'
+
+    def __init__(self, path=None, index_path=None):
+        """
+        :keyword  path (optional):  The directory holding the session stores
+            (defaults to AIRTRACK_SESSION_PATH)
+        :type     path (optional):  ``str``
+        :keyword  index_path (optional):  The index directory (defaults to
+            the `INDEX_DIR` directory in `path`)
+        :type     index_path (optional):  ``str``
+        """
+        self.path = path or settings.AIRTRACK_SESSION_PATH
+        self.index_path = index_path or os.path.join(self.path, INDEX_DIR)
+        self._sessions = []
+        self._trials = _empty_trial_metrics()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.index_path, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+            with np.load(os.path.join(self.index_path, TRIALS_FILE)) as f:
+                trials = {metric: f[metric] for metric in TRIAL_METRICS}
+        except (OSError, ValueError, KeyError):
+            return
+        if manifest.get('version') != INDEX_VERSION or \
+                manifest.get('rows') != len(trials['trial']):
+            # Stale or partially written index: rebuild it
+            return
+        self._sessions = manifest['sessions']
+        self._trials = trials
+
+    def _save(self):
+        os.makedirs(self.index_path, exist_ok=True)
+        # Write under temporary names, and the manifest last, so that a
+        # manifest never describes another trials file than its own
+        trials_file = os.path.join(self.index_path, TRIALS_FILE)
+        with open(f'{trials_file}.tmp', 'wb') as f:
+            np.savez(f, **self._trials)
+        os.replace(f'{trials_file}.tmp', trials_file)
+        manifest_file = os.path.join(self.index_path, MANIFEST_FILE)
+        with open(f'{manifest_file}.tmp', 'w') as f:
+            json.dump({'version': INDEX_VERSION,
+                       'rows': len(self._trials['trial']),
+                       'sessions': self._sessions}, f)
+        os.replace(f'{manifest_file}.tmp', manifest_file)
+
+    def _session_trials(self, session):
+        start = session['offset']
+        return {metric: column[start:start + session['trials']]
+                for metric, column in self._trials.items()}
+
+    def _index(self, store):
+        name = os.path.basename(store)[:-len(SESSION_STORE_EXTENSION)]
+        logger.debug('Indexing session %s', name)
+        metadata = read_metadata(store)
+        return {
+            'name': name,
+            'animal': metadata.get('animal') or UNKNOWN_ANIMAL,
+        }, trial_metrics(read_session(store))
+
+    def update(self):
+        """Index the session stores added or changed since the last update
+        (and drop the removed ones).
+
+        :return: Number of sessions (re)indexed
+        :rtype: ``int``
+        """
+        stores = sorted(glob.glob(os.path.join(
+            glob.escape(self.path), f'*{SESSION_STORE_EXTENSION}')))
+        indexed = {session['name']: session for session in self._sessions}
+        sessions, trials = [], []
+        offset = changed = 0
+        for store in stores:
+            if not os.path.isdir(store):
+                continue
+            signature = _store_signature(store)
+            name = os.path.basename(store)[:-len(SESSION_STORE_EXTENSION)]
+            session = indexed.pop(name, None)
+            if session is not None and session['signature'] == signature:
+                session_trials = self._session_trials(session)
+            else:
+                session, session_trials = self._index(store)
+                changed += 1
+            session = dict(session, signature=signature, offset=offset,
+                           trials=len(session_trials['trial']))
+            offset += session['trials']
+            sessions.append(session)
+            trials.append(session_trials)
+        if not changed and not indexed:
+            return 0
+        self._sessions = sessions
+        self._trials = {metric: np.concatenate(
+            [t[metric] for t in trials], dtype=dtype)
+            for metric, dtype in TRIAL_METRICS.items()} if trials \
+            else _empty_trial_metrics()
+        self._save()
+        logger.info('Indexed %d sessions (%d removed), %d sessions in total',
+                    changed, len(indexed), len(sessions))
+        return changed
+
+    def sessions(self):
+        """Return the indexed sessions (name, animal, trial offset and count
+        in the index).
+
+        :rtype: ``list`` of ``dict``
+        """
+        return [{key: session[key]
+                 for key in ('name', 'animal', 'offset', 'trials')}
+                for session in self._sessions]
+
+    def trials(self, session=None):
+        """Return the per-trial metrics of a session, or of every session.
+
+        :keyword  session (optional):  The session name
+        :type     session (optional):  ``str``
+
+        :return: Metric (see `TRIAL_METRICS`) -> column, a row per trial
+        :rtype: ``dict`` of ``str`` -> ``numpy.ndarray``
+        """
+        if session is None:
+            return dict(self._trials)
+        for s in self._sessions:
+            if s['name'] == session:
+                return self._session_trials(s)
+        err(AirtrackAnalyticsError, logger,
+            message=self.UNKNOWN_SESSION_ERROR_MSG.format(session))
+
+    def _group_metrics(self, groups, names):
+        # Sum every per-trial metric into its trial's group, at once
+        counts = np.array([s['trials'] for s in self._sessions], dtype=int)
+        trial_groups = np.repeat(groups, counts)
+        ngroups = len(names)
+        sums = {metric: np.bincount(
+            trial_groups, weights=self._trials[metric],
+            minlength=ngroups).astype(dtype)
+            for metric, dtype in TRIAL_METRICS.items()}
+        trials = np.bincount(trial_groups, minlength=ngroups)
+        metrics = _metrics(trials, sums)
+        return {name: {metric: column[i].item()
+                       for metric, column in metrics.items()}
+                for i, name in enumerate(names)}
+
+    def session_metrics(self):
+        """Return the metrics of every session.
+
+        :rtype: ``dict`` of session name -> ``dict`` of metric -> value
+        """
+        names = [s['name'] for s in self._sessions]
+        return self._group_metrics(np.arange(len(names)), names)
+
+    def animal_metrics(self):
+        """Return the metrics of every animal, over all of its sessions.
+
+        :rtype: ``dict`` of animal name -> ``dict`` of metric -> value
+        """
+        names, groups = np.unique(
+            np.array([s['animal'] for s in self._sessions], dtype=str),
+            return_inverse=True)
+        return self._group_metrics(groups, names.tolist())
+
+
+def format_metrics(metrics, title):
+    """Return metrics (as returned by e.g. `session_metrics`) as a table.
+
+    :keyword  metrics:  Group name -> metric -> value
+    :type     metrics:  ``dict``
+    :keyword  title:    Title of the group name column
+    :type     title:    ``str``
+
+    :rtype: ``str``
+    """
+    columns = [
+        ('trials', 'trials', '{:d}'),
+        ('mean_trial_duration', 'mean dur', '{:.2f}'),
+        ('enter_lane_fraction', 'enter %', '{:.1%}'),
+        ('peeks_per_trial', 'peeks/trial', '{:.2f}'),
+        ('lane_occupancy', 'in lane %', '{:.1%}'),
+    ]
+    width = max([len(title)] + [len(name) for name in metrics])
+    lines = [' '.join([title.ljust(width)]
+                      + [header.rjust(11) for _, header, _ in columns])]
+    for name, values in metrics.items():
+        lines.append(' '.join([name.ljust(width)] + [
+            fmt.format(values[metric]).rjust(11)
+            for metric, _, fmt in columns]))
+    return '\n'.join(lines)
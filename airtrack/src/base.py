@@ -12,13 +12,30 @@ Example:
 """
 import atexit
 import itertools
+import os
 
+from airtrack.settings import settings
+from airtrack.settings import AIRTRACK_LOG_SESSION_FILE
+from airtrack.settings import AIRTRACK_PARALLEL_BRINGUP
+from airtrack.settings import AIRTRACK_PIPELINE_TRIALS
+from airtrack.settings import AIRTRACK_REUSE_STATE_MACHINE
+from airtrack.settings import AIRTRACK_SESSION_RECORD
+
+from airtrack.src import log
+from airtrack.src import trace
 from airtrack.src import utils
 
+from airtrack.src.bringup import bring_up
+from airtrack.src.clock import AirtrackClock
+from airtrack.src.pipeline import AirtrackTrialPipeline
+from airtrack.src.session import AirtrackSessionRecorder
+from airtrack.src.session import NULL_RECORDER
+from airtrack.src.session import SESSION_STORE_EXTENSION
 from airtrack.src.sma import AirtrackStateMachine
 from airtrack.src.subject import AirtrackSubject
 from airtrack.src.errors import on_error_raise
 from airtrack.src.errors import AirtrackError
+from airtrack.src.errors import AirtrackSessionError
 
 from pybpodapi.protocol import Bpod
 
@@ -30,13 +47,59 @@ handle_error = on_error_raise(AirtrackError, logger)
 class Airtrack:
     """Airtrack system interface."""
 
-    def __init__(self):
+    def __init__(self, subject=None, clock=None,
+                 reuse_state_machine=AIRTRACK_REUSE_STATE_MACHINE,
+                 pipeline_trials=AIRTRACK_PIPELINE_TRIALS,
+                 parallel_bringup=AIRTRACK_PARALLEL_BRINGUP,
+                 loop=None):
+        """
+        :keyword  subject (optional):  The subject to query (defaults to a
+            camera-backed AirtrackSubject)
+        :type     subject (optional):  :class:``AirtrackSubject``
+        :keyword  clock (optional):  The clock to time the system with
+        :type     clock (optional):  :class:``AirtrackClock``
+        :keyword  reuse_state_machine (optional):  Build and send the state
+            machine once, and only run it on every trial
+        :type     reuse_state_machine (optional):  ``bool``
+        :keyword  pipeline_trials (optional):  When not reusing the state
+            machine, build the next trial's one while a trial runs
+        :type     pipeline_trials (optional):  ``bool``
+        :keyword  parallel_bringup (optional):  Connect the camera and open
+            the Bpod concurrently, now, rather than one after the other
+        :type     parallel_bringup (optional):  ``bool``
+        :keyword  loop (optional):  Time actuator actions with this event
+            loop, rather than a timer thread
+        :type     loop (optional):  :class:``asyncio.AbstractEventLoop``
+        """
         self.__bpod = None
         self._bpod_closed = True
-        self._subject = AirtrackSubject()
+        self._sma = None
+        self._reuse_state_machine = reuse_state_machine
+        self._pipeline = None
+        if pipeline_trials and not reuse_state_machine:
+            self._pipeline = AirtrackTrialPipeline(
+                self._build_state_machine,
+                discard=AirtrackStateMachine.discard)
+        self._clock = clock or AirtrackClock()
+        self._loop = loop
+        self._recorder = NULL_RECORDER
+        self._subject = subject
+        self.bring_up_times = {}
+        self.trial_count = 0
+        # Trial count `run` stops at (None: no end)
+        self._last_trial = None
+        if parallel_bringup:
+            self._bring_up()
+        elif self._subject is None:
+            self._subject = AirtrackSubject()
         # Register exit handler
         atexit.register(self.close)
 
+    @property
+    def subject(self):
+        """The subject the system queries."""
+        return self._subject
+
     @property
     def _bpod(self):
         if self.__bpod is None:
@@ -45,31 +108,119 @@ class Airtrack:
             self._open_bpod()
         return self.__bpod
 
+    def _make_bpod(self):
+        return Bpod(emulator_mode=True)
+
     @handle_error
     def _create_bpod(self):
-        self.__bpod = Bpod(emulator_mode=True)
+        # pybpod writes the session files there
+        session_path = settings.make_session_path()
+        if AIRTRACK_LOG_SESSION_FILE:
+            log.open_session_file(os.path.join(
+                session_path, f'{settings.AIRTRACK_SESSION_NAME}.jsonl'))
+        if AIRTRACK_SESSION_RECORD:
+            self._recorder = AirtrackSessionRecorder(
+                os.path.join(session_path, settings.AIRTRACK_SESSION_NAME
+                             + SESSION_STORE_EXTENSION),
+                clock=self._clock,
+                metadata={'session': settings.AIRTRACK_SESSION_NAME,
+                          'animal': settings.AIRTRACK_ANIMAL})
+        self.__bpod = self._make_bpod()
 
     @handle_error
     def _open_bpod(self):
         self.__bpod.open()
         self._bpod_closed = False
 
+    def _bring_up_bpod(self):
+        self._create_bpod()
+        self._open_bpod()
+        return self.__bpod
+
+    def _bring_up_subject(self):
+        self._subject = AirtrackSubject()
+        return self._subject
+
+    def _bring_up(self):
+        bring_ups = {'bpod': self._bring_up_bpod}
+        if self._subject is None:
+            bring_ups['camera'] = self._bring_up_subject
+        try:
+            _, self.bring_up_times = bring_up(bring_ups)
+        except AirtrackError:
+            # Do not leave the devices that did come up open (bring_up
+            # waits for them)
+            if not self._bpod_closed:
+                self._close()
+            if 'camera' in bring_ups and self._subject is not None:
+                self._subject.clean_up()
+                self._subject = None
+            raise
+        if 'camera' in bring_ups:
+            # Brought up in a pool thread, where signal handlers cannot be
+            # installed
+            self._subject.camera.install_signal_handlers()
+
     @handle_error
     def _close(self):
         self.__bpod.close(ignore_emulator=True)
         self._bpod_closed = True
 
+    @handle_error
+    def _build_state_machine(self):
+        # Bring up the Bpod (and the session recorder) first
+        bpod = self._bpod
+        sma = AirtrackStateMachine(
+            bpod, self._subject, clock=self._clock, loop=self._loop,
+            recorder=self._recorder)
+        sma.setup()
+        return sma
+
+    def _replace_state_machine(self, sma):
+        if self._sma is not None:
+            self._sma.discard()
+        self._sma = sma
+        with utils.bpod_lock(self._bpod):
+            self._bpod.send_state_machine(self._sma, ignore_emulator=True)
+
+    @trace.span('trial')
     @handle_error
     def _run(self):
-        self._sma = AirtrackStateMachine(self._bpod, self._subject)
-        self._sma.setup()
-        self._bpod.send_state_machine(self._sma, ignore_emulator=True)
+        if self._pipeline is not None:
+            self._replace_state_machine(self._pipeline.next())
+            if self.trial_count != self._last_trial:
+                self._pipeline.prefetch()
+        elif self._sma is None or not self._reuse_state_machine:
+            self._replace_state_machine(self._build_state_machine())
+        else:
+            # The Bpod still holds the state machine sent for a past trial
+            self._sma.prepare_trial()
         self._bpod.run_state_machine(self._sma)
 
     @handle_error
     def _clean_up(self):
+        if self._pipeline is not None:
+            self._pipeline.close()
         self._subject.clean_up()
-        self._sma.clean_up()
+        if self._sma is not None:
+            self._sma.clean_up()
+
+    def run_trial(self):
+        """Run a single trial.
+
+        :return: The trial duration (sec)
+        :rtype: ``float``
+        """
+        self.trial_count += 1
+        trial = self.trial_count
+        logger.debug('Starting trial #%d...', trial)
+        start_time = self._clock.time()
+        self._recorder.start_trial(trial)
+        self._run()
+        duration = self._clock.time() - start_time
+        self._recorder.end_trial(trial, duration)
+        logger.debug('End of trial #%d (%.3f sec).', trial, duration)
+        return duration
 
     def run(self, trials=None):
         """Run the system.
@@ -78,13 +229,36 @@ class Airtrack:
         :type     trials (optional):  ``int``
         """
         iterator = range(trials or 0) or itertools.count()
-        for i in iterator:
-            trial = i + 1
-            logger.debug(f'Starting trial #{trial}...')
-            self._run()
-            logger.debug(f'End of trial #{trial}.')
+        # Do not prepare a trial past the last one
+        self._last_trial = self.trial_count + trials if trials else None
+        try:
+            for _ in iterator:
+                self.run_trial()
+        finally:
+            self._last_trial = None
+
+    def _export_trace(self):
+        tracer = trace.tracer()
+        if tracer is None or not tracer.spans():
+            return
+        filename = os.path.join(
+            settings.make_session_path(),
+            f'{settings.AIRTRACK_SESSION_NAME}.trace.json')
+        tracer.export_chrome_trace(filename)
+        logger.info('Span latencies:\n%s', tracer.format_histograms())
+        logger.info('Wrote trace to %s', filename)
+        tracer.clear()
 
     def close(self):
         """Close the system."""
+        # Rather than again at exit (e.g. once the event loop is closed)
+        atexit.unregister(self.close)
         self._clean_up()
         self._close()
+        self._export_trace()
+        try:
+            self._recorder.close()
+        except AirtrackSessionError:
+            # Already logged: still close the session log
+            pass
+        log.close_session_file()
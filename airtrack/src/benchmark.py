@@ -0,0 +1,279 @@
+"""Airtrack benchmark module.
+
+This module provides an end-to-end benchmark (run_benchmark) of the Airtrack
+system: it runs trials against the Bpod emulator (in real time) or the
+simulated Bpod (on a virtual clock), with a scripted subject instead of the
+camera, and measures:
+
+- trials per second
+- state callback latency percentiles
+- the gap between consecutive trials
+- serial (Bpod) commands per trial
+- the peak resident set size of the process
+
+Latencies are read off the trace spans, so tracing (AIRTRACK_TRACE) must be
+enabled before airtrack is imported. Results are plain dicts, meant to be
+written as JSON and compared (compare) against a stored baseline.
+
+Example:
+
+    from airtrack.settings import settings
+    settings.configure(AIRTRACK_TRACE=True)
+
+    from airtrack.src import benchmark
+
+    results = benchmark.run_benchmark('simulated', trials=1000)
+    for regression in benchmark.compare(results, baseline):
+        print(regression)
+"""
+import collections
+import functools
+import itertools
+import time
+
+import numpy as np
+
+from airtrack.src import trace
+from airtrack.src import utils
+
+from airtrack.src.base import Airtrack
+from airtrack.src.clock import AirtrackClock
+from airtrack.src.clock import AirtrackVirtualClock
+from airtrack.src.definitions import AirtrackBenchmarkMode
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackBenchmarkError
+from airtrack.src.simulation import AirtrackSimulation
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = utils.create_logger(__name__)
+
+TRACING_DISABLED_ERROR_MSG = \
+    'Benchmarks need tracing: configure AIRTRACK_TRACE=True before ' \
+    'importing airtrack.'
+
+# Metric name -> True if higher is better
+METRICS = {
+    'trials_per_sec': True,
+    'callback_latency_p50_us': False,
+    'callback_latency_p99_us': False,
+    'callback_latency_max_us': False,
+    'inter_trial_gap_mean_us': False,
+    'inter_trial_gap_p99_us': False,
+    'serial_commands_per_trial': False,
+    'peak_rss_kb': False,
+}
+
+Regression = collections.namedtuple(
+    'Regression', ['metric', 'baseline', 'value', 'change'])
+
+
+class ScriptedSubject:
+    """Subject entering and leaving the lane on a fixed, repeating script."""
+    DEFAULT_SCRIPT = ((False, 0.5), (True, 1.0))
+
+    def __init__(self, clock, script=DEFAULT_SCRIPT):
+        """
+        :keyword  clock:   The clock the script is played on
+        :type     clock:   :class:``airtrack.src.clock.AirtrackClock``
+        :keyword  script:  Repeating (inside lane, duration (sec)) steps
+        :type     script:  ``iterable`` of (``bool``, ``float``)
+        """
+        self._clock = clock
+        self._steps = itertools.cycle(script)
+        self._inside_lane, duration = next(self._steps)
+        self._next_step_time = self._clock.time() + duration
+
+    def is_inside_lane(self):
+        """Query subject for being inside or outside the airtable lane.
+
+        :return: ``True`` if the subject is inside the lane,
+            otherwise ``False``
+        :rtype: ``bool``
+        """
+        while self._clock.time() >= self._next_step_time:
+            self._inside_lane, duration = next(self._steps)
+            self._next_step_time += duration
+        return self._inside_lane
+
+    def clean_up(self):
+        """Clean up the object."""
+
+
+class CountingBpod:
+    """Bpod proxy counting the commands sent to the Bpod."""
+    COMMANDS = ('manual_override', 'trigger_event_by_name',
+                'send_state_machine', 'run_state_machine')
+
+    def __init__(self, bpod):
+        """
+        :keyword  bpod:  The Bpod (or Bpod proxy) to count commands of
+        :type     bpod:  :class:``pybpodapi.protocol.Bpod``
+        """
+        self._bpod = bpod
+        self.commands = collections.Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self._bpod, name)
+        if name not in self.COMMANDS or not callable(attr):
+            return attr
+
+        # Count calls, rather than lookups
+        @functools.wraps(attr)
+        def command(*args, **kwargs):
+            self.commands[name] += 1
+            return attr(*args, **kwargs)
+        return command
+
+
+class _CountingBpodMixin:
+
+    def _make_bpod(self):
+        return CountingBpod(super()._make_bpod())
+
+    @property
+    def bpod_commands(self):
+        return self._bpod.commands
+
+
+class BenchmarkAirtrack(_CountingBpodMixin, Airtrack):
+    """Airtrack system, counting Bpod commands."""
+
+
+class BenchmarkSimulation(_CountingBpodMixin, AirtrackSimulation):
+    """Airtrack system simulation, counting Bpod commands."""
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else None
+
+
+def _trial_gaps(spans):
+    trials = sorted(
+        (s for s in spans if s.name == 'trial'), key=lambda s: s.start_ns)
+    return np.array([b.start_ns - a.end_ns
+                     for a, b in zip(trials, trials[1:])], dtype=float) / 1e3
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def create_airtrack(mode, script=ScriptedSubject.DEFAULT_SCRIPT, **kwargs):
+    """Create the Airtrack system to benchmark.
+
+    :keyword  mode:    The benchmark mode
+    :type     mode:    :class:``AirtrackBenchmarkMode`` or ``str``
+    :keyword  script:  The subject script (see :class:``ScriptedSubject``)
+    :type     script:  ``iterable`` of (``bool``, ``float``)
+
+    Other keyword arguments are passed on to the system.
+
+    :rtype: :class:``airtrack.src.Airtrack``
+    """
+    mode = AirtrackBenchmarkMode(mode)
+    if mode is AirtrackBenchmarkMode.SIMULATED:
+        airtrack_class = BenchmarkSimulation
+        clock = kwargs.pop('clock', None) or AirtrackVirtualClock()
+    else:
+        airtrack_class = BenchmarkAirtrack
+        clock = kwargs.pop('clock', None) or AirtrackClock()
+    subject = ScriptedSubject(clock, script)
+    return airtrack_class(subject=subject, clock=clock, **kwargs)
+
+
+def run_benchmark(mode, trials, warmup_trials=1,
+                  script=ScriptedSubject.DEFAULT_SCRIPT, **kwargs):
+    """Benchmark the Airtrack system.
+
+    :keyword  mode:    The benchmark mode
+    :type     mode:    :class:``AirtrackBenchmarkMode`` or ``str``
+    :keyword  trials:  Number of trials to measure
+    :type     trials:  ``int``
+    :keyword  warmup_trials:  Number of trials to run before measuring
+    :type     warmup_trials:  ``int``
+    :keyword  script:  The subject script (see :class:``ScriptedSubject``)
+    :type     script:  ``iterable`` of (``bool``, ``float``)
+
+    Other keyword arguments are passed on to the system.
+
+    :return: The benchmark results (metrics under 'metrics')
+    :rtype: ``dict``
+    """
+    if not trace.enabled():
+        err(AirtrackBenchmarkError, logger,
+            message=TRACING_DISABLED_ERROR_MSG)
+    mode = AirtrackBenchmarkMode(mode)
+    tracer = trace.tracer()
+    airtrack = create_airtrack(mode, script, **kwargs)
+    try:
+        if warmup_trials:
+            airtrack.run(trials=warmup_trials)
+        tracer.clear()
+        airtrack.bpod_commands.clear()
+        start_time = time.perf_counter()
+        airtrack.run(trials=trials)
+        wall_time = time.perf_counter() - start_time
+        commands = dict(airtrack.bpod_commands)
+        spans = tracer.spans()
+        durations = tracer.durations()
+        histograms = tracer.histograms()
+    finally:
+        # Closing exports (and drops) the trace
+        airtrack.close()
+    callback_us = np.concatenate([
+        us for name, us in durations.items()
+        if name.startswith('callback.')] or [np.empty(0)])
+    gaps = _trial_gaps(spans)
+    metrics = {
+        'trials_per_sec': trials / wall_time,
+        'callback_latency_p50_us': _percentile(callback_us, 50),
+        'callback_latency_p99_us': _percentile(callback_us, 99),
+        'callback_latency_max_us': _percentile(callback_us, 100),
+        'inter_trial_gap_mean_us': float(gaps.mean()) if len(gaps) else None,
+        'inter_trial_gap_p99_us': _percentile(gaps, 99),
+        'serial_commands_per_trial': sum(commands.values()) / trials,
+        'peak_rss_kb': _peak_rss_kb(),
+    }
+    return {
+        'mode': mode.value,
+        'trials': trials,
+        'wall_time_sec': wall_time,
+        'metrics': metrics,
+        'serial_commands': commands,
+        'spans': histograms,
+    }
+
+
+def compare(results, baseline, tolerance=0.1):
+    """Compare benchmark results against baseline results.
+
+    :keyword  results:   Benchmark results
+    :type     results:   ``dict``
+    :keyword  baseline:  Baseline benchmark results
+    :type     baseline:  ``dict``
+    :keyword  tolerance:  Relative change (e.g. 0.1 for 10%) a metric may
+        worsen by before it counts as a regression
+    :type     tolerance:  ``float``
+
+    :return: The regressed metrics
+    :rtype: ``list`` of :class:``Regression``
+    """
+    regressions = []
+    for metric, higher_is_better in METRICS.items():
+        value = results['metrics'].get(metric)
+        baseline_value = baseline['metrics'].get(metric)
+        if value is None or not baseline_value:
+            continue
+        change = (value - baseline_value) / baseline_value
+        worsening = -change if higher_is_better else change
+        if worsening > tolerance:
+            regressions.append(
+                Regression(metric, baseline_value, value, change))
+    return regressions
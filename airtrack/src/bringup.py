@@ -0,0 +1,84 @@
+"""Airtrack device bring-up module.
+
+This module provides a function (bring_up) that brings up several devices
+concurrently, in a thread pool, timing each of them and failing with a
+single error naming every failed device, if any of them fails or times out.
+
+Once a device fails, the devices still being brought up are waited for
+(within the timeout), so that the caller can close those that did come up.
+
+Example:
+
+    from airtrack.src.bringup import bring_up
+
+    devices, bring_up_times = bring_up(
+        {'camera': AirtrackCamera, 'bpod': open_bpod}, timeout=10)
+"""
+import concurrent.futures
+import time
+
+from airtrack.settings import AIRTRACK_DEVICE_BRINGUP_TIMEOUT
+
+from airtrack.src import utils
+
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackBringUpError
+
+logger = utils.create_logger(__name__)
+
+BRINGUP_ERROR_MSG = 'Device bring-up failed: {}'
+TIMEOUT_ERROR_MSG = 'timed out after {} sec'
+CANCELLED_ERROR_MSG = 'cancelled'
+
+
+def _timed(bring_up_device):
+    start_time = time.perf_counter()
+    device = bring_up_device()
+    return device, time.perf_counter() - start_time
+
+
+def bring_up(bring_ups, timeout=AIRTRACK_DEVICE_BRINGUP_TIMEOUT):
+    """Bring up devices concurrently.
+
+    :keyword  bring_ups:  Device name -> callable bringing up and returning
+        the device
+    :type     bring_ups:  ``dict``
+    :keyword  timeout (optional):  Time (sec) all devices must be up within
+    :type     timeout (optional):  ``float``
+
+    :return: Device name -> device, and device name -> bring-up time (sec)
+    :rtype: ``tuple`` of ``dict``
+    """
+    deadline = time.monotonic() + timeout
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(bring_ups) or 1,
+        thread_name_prefix='AirtrackBringUp')
+    futures = {executor.submit(_timed, bring_up_device): name
+               for name, bring_up_device in bring_ups.items()}
+    done, not_done = concurrent.futures.wait(
+        futures, timeout=timeout,
+        return_when=concurrent.futures.FIRST_EXCEPTION)
+    # Do not wait for devices that hang (their threads cannot be killed),
+    # nor start the ones not started yet
+    executor.shutdown(wait=False, cancel_futures=True)
+    if not_done:
+        # A device failed: let the others come up (or fail) before
+        # reporting, so that none is left opening in the background
+        _, not_done = concurrent.futures.wait(
+            not_done, timeout=max(deadline - time.monotonic(), 0))
+    devices, bring_up_times, errors = {}, {}, []
+    for future, name in futures.items():
+        if future.cancelled():
+            errors.append(f'{name}: {CANCELLED_ERROR_MSG}')
+        elif future in not_done:
+            errors.append(f'{name}: {TIMEOUT_ERROR_MSG.format(timeout)}')
+        elif future.exception() is not None:
+            errors.append(f'{name}: {future.exception()}')
+        else:
+            devices[name], bring_up_times[name] = future.result()
+            logger.debug('Brought up %s in %.3f sec.',
+                         name, bring_up_times[name])
+    if errors:
+        err(AirtrackBringUpError, logger,
+            message=BRINGUP_ERROR_MSG.format('; '.join(errors)))
+    return devices, bring_up_times
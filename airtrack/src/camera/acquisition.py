@@ -0,0 +1,198 @@
+"""Airtrack camera acquisition module.
+
+This module provides an interface (AirtrackCameraAcquisition) for acquiring
+camera frames continuously, in a background thread (or an asyncio task),
+into a buffer of timestamped snapshots. Readers get the freshest snapshot
+without waiting on a camera round-trip.
+
+Frames are polled every `interval` seconds, or, given an interval policy
+(e.g. airtrack.src.camera.polling.AdaptivePollInterval), after the time the
+policy picks from the frame just polled.
+
+Example:
+
+    from airtrack.src.camera.pixy import PixyCam
+    from airtrack.src.camera.acquisition import AirtrackCameraAcquisition
+
+    aca = AirtrackCameraAcquisition(PixyCam())
+    aca.start()
+
+    snapshot = aca.latest(max_age=0.1)
+    print(snapshot.timestamp, snapshot.signatures)
+
+    aca.stop()
+
+    # Or, acquire from an asyncio task
+    # task = asyncio.create_task(aca.run_async())
+"""
+import asyncio
+import collections
+import threading
+import time
+
+from airtrack.settings import AIRTRACK_CAMERA_POLL_INTERVAL
+from airtrack.settings import AIRTRACK_CAMERA_SNAPSHOT_BUFFER_SIZE
+
+from airtrack.src import utils
+
+from airtrack.src.camera import blocks
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackCameraError
+
+logger = utils.create_logger(__name__)
+
+
+class Snapshot(collections.namedtuple('Snapshot', ['timestamp', 'blocks'])):
+    """A camera frame: its acquisition time and a copy of its blocks."""
+    __slots__ = ()
+
+    @property
+    def signatures(self):
+        return blocks.signatures(self.blocks)
+
+
+class AirtrackCameraAcquisition:
+    """Airtrack continuous camera acquisition interface."""
+    STALE_SNAPSHOT_ERROR_MSG = 'No camera snapshot newer than {} sec.'
+
+    def __init__(self, camera,
+                 interval=AIRTRACK_CAMERA_POLL_INTERVAL,
+                 buffer_size=AIRTRACK_CAMERA_SNAPSHOT_BUFFER_SIZE,
+                 interval_policy=None):
+        """
+        :keyword  camera:       A camera backend (e.g. a PixyCam)
+        :type     camera:       :class:``CameraBackend``
+        :keyword  interval:     Time (sec) between consecutive camera polls
+        :type     interval:     ``float``
+        :keyword  buffer_size:  Number of most recent snapshots kept
+        :type     buffer_size:  ``int``
+        :keyword  interval_policy (optional):  Callable returning the time
+            (sec) to wait after a snapshot, instead of `interval`
+        :type     interval_policy (optional):  ``callable``
+        """
+        self._camera = camera
+        self._interval = interval
+        self._interval_policy = interval_policy
+        # Time (sec) waited after the last snapshot
+        self.interval = interval
+        self.polls = 0
+        self._snapshots = collections.deque(maxlen=buffer_size)
+        self._snapshot_available = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._error = None
+
+    def _poll(self):
+        # The camera reuses its block buffer, so keep a copy per snapshot
+        frame = self._camera.get_blocks_array().copy()
+        return Snapshot(time.monotonic(), frame)
+
+    def _acquire(self):
+        try:
+            snapshot = self._poll()
+            interval = self._interval if self._interval_policy is None \
+                else self._interval_policy(snapshot)
+        except Exception as e:
+            with self._snapshot_available:
+                self._error = e
+                self._snapshot_available.notify_all()
+            return None
+        with self._snapshot_available:
+            self._snapshots.append(snapshot)
+            self._snapshot_available.notify_all()
+        self.polls += 1
+        self.interval = interval
+        return interval
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            interval = self._acquire()
+            if interval is None:
+                break
+            self._stop_event.wait(interval)
+
+    def _fresh_snapshot(self, max_age):
+        if not self._snapshots:
+            return None
+        snapshot = self._snapshots[-1]
+        if max_age is not None and \
+                time.monotonic() - snapshot.timestamp > max_age:
+            return None
+        return snapshot
+
+    def set_interval_policy(self, interval_policy):
+        """Set the interval policy (``None`` polls every `interval`
+        seconds), from the next snapshot on."""
+        self._interval_policy = interval_policy
+
+    @property
+    def running(self):
+        """``True`` if the acquisition thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start acquiring camera frames in a background thread."""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._error = None
+        self._thread = threading.Thread(
+            target=self._run, name='AirtrackCameraAcquisition', daemon=True)
+        self._thread.start()
+
+    async def run_async(self):
+        """Acquire camera frames from the running event loop, rather than
+        a background thread, until stopped or cancelled.
+
+        Frames are read in the event loop's default executor (camera reads
+        block), and the loop waits out the poll intervals.
+        """
+        loop = asyncio.get_running_loop()
+        self._stop_event.clear()
+        self._error = None
+        while not self._stop_event.is_set():
+            interval = await loop.run_in_executor(None, self._acquire)
+            if interval is None:
+                break
+            await asyncio.sleep(interval)
+
+    def stop(self):
+        """Stop acquiring camera frames."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def latest(self, max_age=None):
+        """Return the most recent snapshot.
+
+        If no snapshot younger than `max_age` is available yet, wait up to
+        `max_age` seconds for the acquisition thread to produce one. While
+        an interval policy lowers the poll rate, `max_age` is extended by
+        as much as the poll interval is.
+
+        :keyword  max_age (optional):  Maximum snapshot age (sec)
+        :type     max_age (optional):  ``float``
+
+        :rtype: :class:``Snapshot``
+        """
+        if max_age is not None:
+            max_age += max(self.interval - self._interval, 0)
+        with self._snapshot_available:
+            snapshot = self._snapshot_available.wait_for(
+                lambda: self._error or self._fresh_snapshot(max_age),
+                timeout=max_age)
+            if self._error is not None:
+                raise self._error
+        if snapshot is None:
+            err(AirtrackCameraError, logger,
+                message=self.STALE_SNAPSHOT_ERROR_MSG.format(max_age))
+        return snapshot
+
+    def history(self):
+        """Return the buffered snapshots, oldest first.
+
+        :rtype: ``list`` of :class:``Snapshot``
+        """
+        with self._snapshot_available:
+            return list(self._snapshots)
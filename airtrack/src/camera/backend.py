@@ -0,0 +1,63 @@
+"""Airtrack camera backend module.
+
+This module provides the base class (CameraBackend) of the camera backends
+(e.g. PixyCam, ReplayCam) that AirtrackCamera reads frames from.
+
+A backend only needs to implement `get_blocks_array` and `close`; signature
+queries are derived from the block array.
+"""
+from airtrack.src import utils
+
+from airtrack.src.camera import blocks
+
+logger = utils.create_logger(__name__)
+
+
+class CameraBackend:
+    """Camera backend base class."""
+
+    def get_blocks_array(self):
+        """Return the blocks of the current frame.
+
+        :rtype: ``numpy.ndarray`` of
+            :data:``airtrack.src.camera.blocks.BLOCK_DTYPE``
+        """
+        raise NotImplementedError
+
+    def get_signatures(self):
+        """Return a list of detected signatures.
+
+        :rtype: ``list`` of ``int``
+        """
+        signatures = blocks.signatures(self.get_blocks_array())
+        logger.debug('Got blocks with signatures: %s', signatures)
+        return signatures
+
+    def find_targets(self, signatures=None):
+        """Find signatures.
+
+        :keyword  signatures:  A list of camera signatures.
+        :type     signatures:  ``list`` of ``int``
+
+        :return: ``True`` if the given signatures were found,
+            otherwise ``False``
+        :rtype: ``bool``
+        """
+        if signatures is None:
+            return False
+        found_targets = blocks.contains(self.get_blocks_array(), signatures)
+        if found_targets:
+            logger.debug('Found targets: %s', signatures)
+        return found_targets
+
+    def install_signal_handlers(self):
+        """Install the backend signal handlers, if any.
+
+        Signal handlers can only be installed from the main thread (and are
+        not, elsewhere), e.g. not by a backend created during a parallel
+        bring-up.
+        """
+
+    def close(self):
+        """Close the backend."""
+        raise NotImplementedError
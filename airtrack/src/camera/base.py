@@ -7,10 +7,19 @@ Example:
 
     from airtrack.src.camera import AirtrackCamera
 
-    from airtrack.src.definitions.camera import AirtrackCameraObject
+    from airtrack.src.definitions.camera import AirtrackCameraBackend
 
     ac = AirtrackCamera()
 
+    # Or, serve queries from a continuously acquired snapshot
+    # ac = AirtrackCamera(continuous=True)
+
+    # Or, replay a camera recording (no camera attached)
+    # ac = AirtrackCamera(backend=AirtrackCameraBackend.REPLAY)
+
+    # Or, read frames from a camera server process
+    # ac = AirtrackCamera(backend=AirtrackCameraBackend.SERVER)
+
     # Query the camera N times
     N = 500
     for i in range(N):
@@ -20,38 +29,137 @@ Example:
 
     ac.close()
 """
+import time
+
+from airtrack.settings import AIRTRACK_CAMERA_BACKEND
+from airtrack.settings import AIRTRACK_CAMERA_CONTINUOUS_ACQUISITION
+from airtrack.settings import AIRTRACK_CAMERA_RECORD_FILE
+from airtrack.settings import AIRTRACK_CAMERA_REPLAY_FILE
+from airtrack.settings import AIRTRACK_CAMERA_REPLAY_LOOP
+from airtrack.settings import AIRTRACK_CAMERA_REPLAY_SPEED
+from airtrack.settings import AIRTRACK_CAMERA_SNAPSHOT_MAX_AGE
+
+from airtrack.src import trace
 from airtrack.src import utils
-from airtrack.src.camera.pixy import PixyCam
+from airtrack.src.camera import blocks
+from airtrack.src.camera.acquisition import AirtrackCameraAcquisition
+from airtrack.src.camera.backend import CameraBackend
+from airtrack.src.camera.recorder import CameraRecorder
+from airtrack.src.definitions import AirtrackCameraBackend
 from airtrack.src.definitions import AirtrackCameraObject
+from airtrack.src.errors import err
 from airtrack.src.errors import on_error_raise
-from airtrack.src.errors import PixyCamError
+from airtrack.src.errors import CameraBackendError
 from airtrack.src.errors import AirtrackCameraError
 
 logger = utils.create_logger(__name__)
 
+UNKNOWN_BACKEND_ERROR_MSG = 'Unknown camera backend {!r} (expected one of {}).'
+NO_REPLAY_FILE_ERROR_MSG = \
+    'The replay camera backend needs AIRTRACK_CAMERA_REPLAY_FILE.'
 
-handle_pixy_error = on_error_raise(
+handle_backend_error = on_error_raise(
     AirtrackCameraError,
     logger,
-    catch_error=PixyCamError)
+    catch_error=CameraBackendError)
+
+
+@handle_backend_error
+def create_backend(backend=AIRTRACK_CAMERA_BACKEND,
+                   record_file=AIRTRACK_CAMERA_RECORD_FILE):
+    """Create a camera backend.
+
+    Backends are imported on demand, so that e.g. replaying does not require
+    the pixy2 extension.
+
+    :keyword  backend:  Backend to create
+    :type     backend:  :class:``AirtrackCameraBackend`` or ``str``
+    :keyword  record_file (optional):  Record every frame to this file
+    :type     record_file (optional):  ``str``
+
+    :rtype: :class:``airtrack.src.camera.backend.CameraBackend``
+    """
+    try:
+        backend = AirtrackCameraBackend(backend)
+    except ValueError:
+        err(AirtrackCameraError, logger,
+            message=UNKNOWN_BACKEND_ERROR_MSG.format(
+                backend, [b.value for b in AirtrackCameraBackend]))
+    if backend is AirtrackCameraBackend.PIXY:
+        from airtrack.src.camera.pixy import PixyCam
+        camera = PixyCam()
+    elif backend is AirtrackCameraBackend.REPLAY:
+        if not AIRTRACK_CAMERA_REPLAY_FILE:
+            err(AirtrackCameraError, logger,
+                message=NO_REPLAY_FILE_ERROR_MSG)
+        from airtrack.src.camera.replay import ReplayCam
+        camera = ReplayCam(AIRTRACK_CAMERA_REPLAY_FILE,
+                           speed=AIRTRACK_CAMERA_REPLAY_SPEED,
+                           loop=AIRTRACK_CAMERA_REPLAY_LOOP)
+    elif backend is AirtrackCameraBackend.SERVER:
+        from airtrack.src.camera.server import CameraServerCam
+        camera = CameraServerCam()
+    if record_file:
+        camera = CameraRecorder(camera, record_file)
+    return camera
 
 
 class AirtrackCamera:
     """Airtrack camera interface."""
 
-    def __init__(self):
-        self._pixy_cam = PixyCam()
-
-    @handle_pixy_error
+    def __init__(self, backend=None,
+                 continuous=AIRTRACK_CAMERA_CONTINUOUS_ACQUISITION):
+        """
+        :keyword  backend (optional):  Camera backend (or backend name) to
+            read frames from. Defaults to `AIRTRACK_CAMERA_BACKEND`.
+        :type     backend (optional):  :class:``CameraBackend``,
+            :class:``AirtrackCameraBackend`` or ``str``
+        :keyword  continuous (optional):  Acquire frames continuously in the
+            background and answer queries from the latest snapshot.
+        :type     continuous (optional):  ``bool``
+        """
+        if not isinstance(backend, CameraBackend):
+            backend = create_backend(backend or AIRTRACK_CAMERA_BACKEND)
+        self._backend = backend
+        self._acquisition = None
+        self._interval_policy = None
+        if continuous:
+            self._acquisition = AirtrackCameraAcquisition(self._backend)
+            self._acquisition.start()
+
+    @handle_backend_error
     def _find_signature(self, signature):
-        return self._pixy_cam.find_targets(
+        if self._acquisition is not None:
+            snapshot = self._acquisition.latest(
+                max_age=AIRTRACK_CAMERA_SNAPSHOT_MAX_AGE)
+            return blocks.contains(snapshot.blocks, [signature])
+        return self._backend.find_targets(
             [signature])
 
+    @handle_backend_error
+    def _get_blocks(self):
+        if self._acquisition is not None:
+            return self._acquisition.latest(
+                max_age=AIRTRACK_CAMERA_SNAPSHOT_MAX_AGE).blocks
+        return self._backend.get_blocks_array()
+
+    @handle_backend_error
+    def _get_frames(self, since):
+        if self._acquisition is None:
+            return [(time.monotonic(), self._backend.get_blocks_array())]
+        latest = self._acquisition.latest(
+            max_age=AIRTRACK_CAMERA_SNAPSHOT_MAX_AGE)
+        if since is None:
+            return [latest]
+        return [snapshot for snapshot in self._acquisition.history()
+                if snapshot.timestamp > since]
+
     def _find_object(self, object_enum):
         signature = object_enum.value
         signature_found = self._find_signature(signature)
         return signature_found
 
+    @trace.span('camera.find_subject')
     def find_subject(self):
         """Find subject (e.g. mouse).
 
@@ -61,6 +169,68 @@ class AirtrackCamera:
         object_found = self._find_object(AirtrackCameraObject.SUBJECT)
         return object_found
 
+    @trace.span('camera.find_subject_block')
+    def find_subject_block(self):
+        """Find the subject (e.g. mouse) block, i.e. the largest block of
+        the subject signature, with its position and size.
+
+        :return: The subject block, or ``None`` if the subject was not found
+        :rtype: :class:``numpy.void`` of
+            :data:``airtrack.src.camera.blocks.BLOCK_DTYPE``
+        """
+        return blocks.largest(
+            self._get_blocks(), AirtrackCameraObject.SUBJECT.value)
+
+    @trace.span('camera.find_subject_blocks')
+    def find_subject_blocks(self, since=None):
+        """Find the subject block in every frame acquired after `since`.
+
+        With continuous acquisition, these are the buffered frames newer
+        than `since` (or the latest frame, if `since` is not given);
+        otherwise, the current frame.
+
+        :keyword  since (optional):  Time (`time.monotonic`) of the last
+            frame already seen
+        :type     since (optional):  ``float``
+
+        :return: The time (`time.monotonic`) of every frame, oldest first,
+            and its subject block (``None`` if the subject was not found)
+        :rtype: ``list`` of ``tuple`` of (``float``, ``numpy.void``)
+        """
+        signature = AirtrackCameraObject.SUBJECT.value
+        return [(timestamp, blocks.largest(frame, signature))
+                for timestamp, frame in self._get_frames(since)]
+
+    async def acquire_async(self):
+        """Acquire frames continuously from the running event loop, and
+        answer queries from the latest snapshot, until cancelled."""
+        if self._acquisition is not None and self._acquisition.running:
+            return
+        if self._acquisition is None:
+            self._acquisition = AirtrackCameraAcquisition(
+                self._backend, interval_policy=self._interval_policy)
+        await self._acquisition.run_async()
+
+    def set_poll_interval_policy(self, interval_policy):
+        """Poll continuously acquired frames after the time (sec)
+        `interval_policy` picks from every frame, rather than at a fixed
+        rate.
+
+        :keyword  interval_policy:  Callable returning the time to wait
+            after a snapshot (``None`` restores the fixed rate), e.g. an
+            :class:``airtrack.src.camera.polling.AdaptivePollInterval``
+        :type     interval_policy:  ``callable``
+        """
+        self._interval_policy = interval_policy
+        if self._acquisition is not None:
+            self._acquisition.set_interval_policy(interval_policy)
+
+    def install_signal_handlers(self):
+        """Install the backend signal handlers (from the main thread)."""
+        self._backend.install_signal_handlers()
+
     def close(self):
         """Close the camera."""
-        self._pixy_cam.close()
+        if self._acquisition is not None:
+            self._acquisition.stop()
+        self._backend.close()
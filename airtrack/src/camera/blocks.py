@@ -0,0 +1,66 @@
+"""Airtrack camera blocks module.
+
+This module provides the NumPy representation of camera blocks (i.e. detected
+color connected components) together with vectorized helpers operating on
+arrays of blocks.
+
+Example:
+
+    from airtrack.src.camera import blocks
+
+    array = blocks.empty(10)
+    array[0] = (1, 158, 104, 20, 10, 0, 0, 3)
+    print(blocks.signatures(array[:1]))  # [1]
+    print(blocks.contains(array[:1], [1]))  # True
+    print(blocks.largest(array[:1], 1)['x'])  # 158
+"""
+import numpy as np
+
+# One field per Pixy2 Block member (without the `m_` prefix)
+BLOCK_DTYPE = np.dtype([
+    ('signature', np.uint16),
+    ('x', np.uint16),
+    ('y', np.uint16),
+    ('width', np.uint16),
+    ('height', np.uint16),
+    ('angle', np.int16),
+    ('index', np.uint8),
+    ('age', np.uint8),
+])
+
+
+def empty(size):
+    """Return a zeroed array of `size` blocks.
+
+    :rtype: ``numpy.ndarray`` of :data:``BLOCK_DTYPE``
+    """
+    return np.zeros(size, dtype=BLOCK_DTYPE)
+
+
+def signatures(blocks):
+    """Return the sorted, unique signatures of `blocks`.
+
+    :rtype: ``list`` of ``int``
+    """
+    return np.unique(blocks['signature']).tolist()
+
+
+def contains(blocks, target_signatures):
+    """Return ``True`` if every target signature appears in `blocks`.
+
+    :rtype: ``bool``
+    """
+    return bool(np.isin(target_signatures, blocks['signature']).all())
+
+
+def largest(blocks, signature):
+    """Return the largest (by area) block of `signature` in `blocks`.
+
+    :return: A copy of the block, or ``None`` if there is none
+    :rtype: :class:``numpy.void`` of :data:``BLOCK_DTYPE``
+    """
+    matches = blocks[blocks['signature'] == signature]
+    if not len(matches):
+        return None
+    areas = matches['width'].astype(np.uint32) * matches['height']
+    return matches[np.argmax(areas)]
@@ -10,6 +10,10 @@ Example:
 
     pc = PixyCam()
 
+    # Get detected blocks (structured array, overwritten on the next call)
+    blocks = pc.get_blocks_array()
+    print(blocks['signature'], blocks['x'], blocks['y'])
+
     # Get detected signatures
     signatures = pc.get_signatures()
     print(signatures)
@@ -25,11 +29,20 @@ Example:
 
     pc.close()
 """
+import ctypes
 import functools
+import inspect
 import signal
+import threading
+
+import numpy as np
+
+from airtrack.settings import AIRTRACK_CAMERA_INDEX
 
 from airtrack.src import utils
 
+from airtrack.src.camera import blocks
+from airtrack.src.camera.backend import CameraBackend
 from airtrack.src.errors import err
 from airtrack.src.errors import PixyCamError
 
@@ -37,59 +50,119 @@ from airtrack.submodules.pixy2.build.python_demos import pixy
 
 logger = utils.create_logger(__name__)
 
+# Layout of a Block of the pixy2 python bindings (a C int per member)
+C_BLOCK_DTYPE = np.dtype([(name, np.intc)
+                          for name in blocks.BLOCK_DTYPE.names])
+
 
-class PixyCam:
+class PixyCam(CameraBackend):
     MAX_BLOCKS = 100
     PROGRAM_CCC = 'color_connected_components'
     CONNECT_ERROR_MSG = 'Could not connect to PixyCam.'
+    INDEX_ERROR_MSG = 'This pixy2 build can only open the first PixyCam.'
 
-    def __init__(self):
-        if pixy.init() == -1:
+    def __init__(self, index=AIRTRACK_CAMERA_INDEX):
+        """
+        :keyword  index (optional):  The camera to open, if several are
+            attached (stock pixy2 builds can only open the first one, see
+            `index_supported`)
+        :type     index (optional):  ``int``
+        """
+        if self._init(index) == -1:
             err(PixyCamError, logger, message=self.CONNECT_ERROR_MSG)
         pixy.change_prog(self.PROGRAM_CCC)
         self._toggle_lamp()
         self._initiated = True
         self._blocks = pixy.BlockArray(self.MAX_BLOCKS)
-        # Register segmentation fault handler
+        self._blocks_array = blocks.empty(self.MAX_BLOCKS)
+        self._blocks_view = self._view_blocks()
+        # Outside the main thread (e.g. during a parallel bring-up), left
+        # to whoever brought the camera up
+        self.install_signal_handlers()
+
+    def install_signal_handlers(self):
+        """Register the segmentation fault handler, if on the main
+        thread."""
+        if threading.current_thread() is not threading.main_thread():
+            logger.debug('Not on the main thread: SIGSEGV handler not '
+                         'installed.')
+            return
         signal.signal(signal.SIGSEGV, functools.partial(
             err, PixyCamError, logger, message=self.CONNECT_ERROR_MSG))
 
+    @staticmethod
+    def index_supported():
+        """Return ``True`` if the pixy2 build can open other cameras than
+        the first one.
+
+        :rtype: ``bool``
+        """
+        try:
+            return bool(inspect.signature(pixy.init).parameters)
+        except (TypeError, ValueError):
+            # No signature to inspect: assume stock bindings
+            return False
+
+    def _init(self, index):
+        if not index:
+            return pixy.init()
+        try:
+            return pixy.init(index)
+        except TypeError:
+            # Stock pixy2 python bindings take no camera argument
+            err(PixyCamError, logger, message=self.INDEX_ERROR_MSG)
+
+    def _view_blocks(self):
+        # A NumPy view of the block array of the bindings, to copy frames at
+        # once rather than attribute by attribute (None if it cannot be had)
+        try:
+            address = int(self._blocks.this)
+        except (AttributeError, TypeError, ValueError):
+            logger.debug('Block array address unavailable: copying blocks '
+                         'one by one.')
+            return None
+        size = C_BLOCK_DTYPE.itemsize * self.MAX_BLOCKS
+        view = np.frombuffer((ctypes.c_char * size).from_address(address),
+                             dtype=C_BLOCK_DTYPE)
+        # Check the layout: write a block through the bindings, read it back
+        probe = pixy.Block()
+        values = tuple(range(1, len(C_BLOCK_DTYPE.names) + 1))
+        for name, value in zip(C_BLOCK_DTYPE.names, values):
+            setattr(probe, f'm_{name}', value)
+        self._blocks[self.MAX_BLOCKS - 1] = probe
+        if view[-1].tolist() != values:
+            logger.debug('Unexpected block layout: copying blocks one by '
+                         'one.')
+            return None
+        return view
+
     def _toggle_lamp(self, on=True):
         pixy.set_lamp(int(on), 0)
 
     def _get_blocks(self):
-        return pixy.ccc_get_blocks(100, self._blocks)
+        return pixy.ccc_get_blocks(self.MAX_BLOCKS, self._blocks)
 
-    def get_signatures(self):
-        """Return a list of detected signatures.
+    def get_blocks_array(self):
+        """Return the detected blocks as a NumPy structured array.
 
-        :rtype: ``list`` of ``int``
-        """
-        nblocks = self._get_blocks()
-        signatures = set()
-        for i in range(0, nblocks):
-            sign = self._blocks[i].m_signature
-            logger.debug(f'Got block with signature: {sign}')
-            signatures.add(sign)
-        return list(signatures)
-
-    def find_targets(self, signatures=None):
-        """Find signatures.
-
-        :keyword  signatures:  A list of Pixy2 cam signatures.
-        :type     signatures:  ``list`` of ``int``
-
-        :return: ``True`` if the given signatures were found,
-            otherwise ``False``
-        :rtype: ``bool``
+        The returned array is a view of a buffer preallocated once and
+        reused on every call, i.e. it is overwritten by the next call.
+        Copy it if it needs to outlive the current frame.
+
+        :rtype: ``numpy.ndarray`` of
+            :data:``airtrack.src.camera.blocks.BLOCK_DTYPE``
         """
-        if signatures is None:
-            return False
-        found_targets = list(set(signatures).intersection(
-            self.get_signatures()))
-        if found_targets:
-            logger.debug(f'Found targets: {found_targets}')
-        return signatures == found_targets
+        nblocks = max(self._get_blocks(), 0)
+        array = self._blocks_array
+        if self._blocks_view is not None:
+            array[:nblocks] = self._blocks_view[:nblocks]
+            return array[:nblocks]
+        for i in range(nblocks):
+            block = self._blocks[i]
+            array[i] = (block.m_signature, block.m_x, block.m_y,
+                        block.m_width, block.m_height, block.m_angle,
+                        block.m_index, block.m_age)
+        return array[:nblocks]
 
     def close(self):
         """Close Pixy2 cam."""
@@ -0,0 +1,112 @@
+"""Airtrack camera polling module.
+
+This module provides an adaptive poll interval (AdaptivePollInterval) for
+continuous camera acquisition: after every frame, it picks the time to wait
+before the next one from the subject block in the frame,
+
+- the full rate (AIRTRACK_CAMERA_POLL_INTERVAL) while the subject is within
+  AIRTRACK_CAMERA_NEAR_LANE_DISTANCE pixels of a lane boundary, moves faster
+  than AIRTRACK_CAMERA_FAST_SUBJECT_SPEED pixels/sec or is not found
+- otherwise, half the time the subject takes to come that near a lane
+  boundary at its current speed, down to AIRTRACK_CAMERA_MAX_POLL_INTERVAL
+
+so that a static or distant subject costs few camera reads.
+
+Example:
+
+    from airtrack.src.camera.acquisition import AirtrackCameraAcquisition
+    from airtrack.src.camera.pixy import PixyCam
+    from airtrack.src.camera.polling import AdaptivePollInterval
+    from airtrack.src.subject.lanes import LaneMap
+
+    lane_map = LaneMap({'lane': [(0, 0), (150, 0), (150, 207), (0, 207)]})
+    aca = AirtrackCameraAcquisition(
+        PixyCam(), interval_policy=AdaptivePollInterval(lane_map))
+    aca.start()
+"""
+import math
+
+from airtrack.settings import AIRTRACK_CAMERA_FAST_SUBJECT_SPEED
+from airtrack.settings import AIRTRACK_CAMERA_MAX_POLL_INTERVAL
+from airtrack.settings import AIRTRACK_CAMERA_NEAR_LANE_DISTANCE
+from airtrack.settings import AIRTRACK_CAMERA_POLL_INTERVAL
+
+from airtrack.src.camera import blocks
+from airtrack.src.definitions import AirtrackCameraObject
+
+
+class AdaptivePollInterval:
+    """Poll interval adapting to the subject proximity to lane boundaries."""
+    # Block position jitter (pixels) not counted as movement: speeds are
+    # measured over moves longer than this
+    JITTER = 2
+
+    def __init__(self, lane_map,
+                 min_interval=AIRTRACK_CAMERA_POLL_INTERVAL,
+                 max_interval=AIRTRACK_CAMERA_MAX_POLL_INTERVAL,
+                 near_distance=AIRTRACK_CAMERA_NEAR_LANE_DISTANCE,
+                 fast_speed=AIRTRACK_CAMERA_FAST_SUBJECT_SPEED):
+        """
+        :keyword  lane_map:  The lane map to locate the subject on
+        :type     lane_map:  :class:``airtrack.src.subject.lanes.LaneMap``
+        :keyword  min_interval:  Time (sec) between polls at full rate
+        :type     min_interval:  ``float``
+        :keyword  max_interval:  Time (sec) between polls at the lowest rate
+        :type     max_interval:  ``float``
+        :keyword  near_distance:  Distance (pixels) to a lane boundary
+            within which to poll at full rate
+        :type     near_distance:  ``float``
+        :keyword  fast_speed:  Subject speed (pixels/sec) above which to
+            poll at full rate
+        :type     fast_speed:  ``float``
+        """
+        self._lane_map = lane_map
+        self._min_interval = min_interval
+        self._max_interval = max(max_interval, min_interval)
+        self._near_distance = near_distance
+        self._fast_speed = fast_speed
+        self._reference = None
+        self._speed = 0.
+
+    def _update_speed(self, timestamp, x, y):
+        if self._reference is None:
+            self._reference = (timestamp, x, y)
+            self._speed = 0.
+            return
+        reference_timestamp, reference_x, reference_y = self._reference
+        dt = timestamp - reference_timestamp
+        if dt <= 0:
+            return
+        distance = math.hypot(x - reference_x, y - reference_y)
+        if distance > self.JITTER:
+            self._speed = distance / dt
+            self._reference = (timestamp, x, y)
+        else:
+            # Still within the jitter since the reference position
+            self._speed = min(self._speed, self.JITTER / dt)
+
+    def __call__(self, snapshot):
+        """Return the time (sec) to wait before polling the next frame.
+
+        :keyword  snapshot:  The frame just polled
+        :type     snapshot:
+            :class:``airtrack.src.camera.acquisition.Snapshot``
+
+        :rtype: ``float``
+        """
+        block = blocks.largest(
+            snapshot.blocks, AirtrackCameraObject.SUBJECT.value)
+        if block is None:
+            # Hidden (or occluded) subjects may be anywhere
+            self._reference = None
+            return self._min_interval
+        x, y = int(block['x']), int(block['y'])
+        self._update_speed(snapshot.timestamp, x, y)
+        _, distance = self._lane_map.locate(x, y)
+        margin = abs(distance) - self._near_distance
+        if margin <= 0 or self._speed >= self._fast_speed:
+            return self._min_interval
+        # Poll at least twice before the subject may come near a boundary
+        time_to_near = margin / self._speed if self._speed else math.inf
+        return min(max(time_to_near / 2, self._min_interval),
+                   self._max_interval)
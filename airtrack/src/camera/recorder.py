@@ -0,0 +1,82 @@
+"""Airtrack camera recorder module.
+
+This module provides a camera backend wrapper (CameraRecorder) that streams
+every frame of the wrapped backend into an append-only binary recording,
+which ReplayCam can serve back later without a camera attached.
+
+Recording file layout:
+
+    MAGIC (8 bytes)
+    frame, frame, ...
+
+where each frame is a FRAME_HEADER_DTYPE record (monotonic timestamp and
+number of blocks) followed by that many RECORD_BLOCK_DTYPE records.
+
+Example:
+
+    from airtrack.src.camera.pixy import PixyCam
+    from airtrack.src.camera.recorder import CameraRecorder
+
+    cr = CameraRecorder(PixyCam(), 'session.airtrack-cam')
+    for i in range(500):
+        cr.get_blocks_array()
+    cr.close()
+"""
+import os
+import time
+
+import numpy as np
+
+from airtrack.src import utils
+
+from airtrack.src.camera import blocks
+from airtrack.src.camera.backend import CameraBackend
+
+logger = utils.create_logger(__name__)
+
+MAGIC = b'ATRKCAM1'
+FRAME_HEADER_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('nblocks', '<u4'),
+])
+RECORD_BLOCK_DTYPE = blocks.BLOCK_DTYPE.newbyteorder('<')
+
+
+class CameraRecorder(CameraBackend):
+    """Camera backend wrapper recording every frame to a file."""
+
+    def __init__(self, camera, filename):
+        """
+        :keyword  camera:    The camera backend to record
+        :type     camera:    :class:``CameraBackend``
+        :keyword  filename:  Recording file (appended to if it exists)
+        :type     filename:  ``str``
+        """
+        self._camera = camera
+        new_file = not os.path.exists(filename) or \
+            os.path.getsize(filename) == 0
+        self._file = open(filename, 'ab')
+        if new_file:
+            self._file.write(MAGIC)
+        self._header = np.zeros(1, dtype=FRAME_HEADER_DTYPE)
+        logger.debug('Recording camera frames to %s', filename)
+
+    def _write(self, frame):
+        self._header['timestamp'] = time.monotonic()
+        self._header['nblocks'] = len(frame)
+        self._file.write(self._header.tobytes())
+        self._file.write(
+            frame.astype(RECORD_BLOCK_DTYPE, copy=False).tobytes())
+
+    def get_blocks_array(self):
+        frame = self._camera.get_blocks_array()
+        self._write(frame)
+        return frame
+
+    def install_signal_handlers(self):
+        self._camera.install_signal_handlers()
+
+    def close(self):
+        """Close the recording and the recorded camera."""
+        self._file.close()
+        self._camera.close()
@@ -0,0 +1,111 @@
+"""Airtrack camera replay module.
+
+This module provides a camera backend (ReplayCam) serving the frames of a
+recording made by CameraRecorder, at real-time or accelerated speed, so that
+the system can run without a camera attached.
+
+Example:
+
+    from airtrack.src.camera.replay import ReplayCam
+
+    rc = ReplayCam('session.airtrack-cam', speed=10)
+    print(rc.get_signatures())
+    rc.close()
+"""
+import time
+
+import numpy as np
+
+from airtrack.src import utils
+
+from airtrack.src.camera.backend import CameraBackend
+from airtrack.src.camera.recorder import MAGIC
+from airtrack.src.camera.recorder import FRAME_HEADER_DTYPE
+from airtrack.src.camera.recorder import RECORD_BLOCK_DTYPE
+from airtrack.src.errors import err
+from airtrack.src.errors import ReplayCamError
+
+logger = utils.create_logger(__name__)
+
+
+class ReplayCam(CameraBackend):
+    """Camera backend replaying a camera recording."""
+    INVALID_FILE_ERROR_MSG = 'Not a camera recording: {}'
+    EMPTY_FILE_ERROR_MSG = 'Empty camera recording: {}'
+    END_OF_RECORDING_ERROR_MSG = 'End of camera recording.'
+
+    def __init__(self, filename, speed=1, loop=False):
+        """
+        :keyword  filename:  Recording file
+        :type     filename:  ``str``
+        :keyword  speed:     Replay speed factor relative to real time
+        :type     speed:     ``float``
+        :keyword  loop:      Restart from the first frame at the end
+        :type     loop:      ``bool``
+        """
+        self._data = np.memmap(filename, dtype=np.uint8, mode='r')
+        if self._data[:len(MAGIC)].tobytes() != MAGIC:
+            err(ReplayCamError, logger,
+                message=self.INVALID_FILE_ERROR_MSG.format(filename))
+        self._speed = speed
+        self._loop = loop
+        self._index_frames()
+        if not len(self):
+            err(ReplayCamError, logger,
+                message=self.EMPTY_FILE_ERROR_MSG.format(filename))
+        self._duration = self._timestamps[-1] - self._timestamps[0]
+        self._start_time = None
+
+    def _index_frames(self):
+        offsets, timestamps, counts = [], [], []
+        offset = len(MAGIC)
+        size = len(self._data)
+        while offset + FRAME_HEADER_DTYPE.itemsize <= size:
+            header = self._data[
+                offset:offset + FRAME_HEADER_DTYPE.itemsize].view(
+                    FRAME_HEADER_DTYPE)[0]
+            offset += FRAME_HEADER_DTYPE.itemsize
+            nblocks = int(header['nblocks'])
+            if offset + nblocks * RECORD_BLOCK_DTYPE.itemsize > size:
+                # Truncated last frame (e.g. recorder was killed)
+                break
+            offsets.append(offset)
+            timestamps.append(header['timestamp'])
+            counts.append(nblocks)
+            offset += nblocks * RECORD_BLOCK_DTYPE.itemsize
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._timestamps = np.array(timestamps, dtype=np.float64)
+        self._counts = np.array(counts, dtype=np.int64)
+
+    def _frame_number(self):
+        now = time.monotonic()
+        if self._start_time is None:
+            self._start_time = now
+        elapsed = (now - self._start_time) * self._speed
+        if elapsed > self._duration:
+            if not self._loop:
+                err(ReplayCamError, logger,
+                    message=self.END_OF_RECORDING_ERROR_MSG)
+            elapsed %= self._duration or 1
+        return int(np.searchsorted(
+            self._timestamps, self._timestamps[0] + elapsed,
+            side='right')) - 1
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def get_blocks_array(self):
+        """Return the blocks of the recorded frame due now.
+
+        The returned array is a read-only view of the memory-mapped
+        recording.
+        """
+        i = self._frame_number()
+        start = self._offsets[i]
+        stop = start + self._counts[i] * RECORD_BLOCK_DTYPE.itemsize
+        return self._data[start:stop].view(RECORD_BLOCK_DTYPE)
+
+    def close(self):
+        """Close the recording."""
+        # The mapping is released once the last frame view is gone
+        self._data = None
@@ -0,0 +1,279 @@
+"""Airtrack camera server module.
+
+This module isolates the camera in a separate process: a camera server
+process owns the camera (e.g. the Pixy2, whose C extension can crash the
+interpreter) and publishes its frames into a shared-memory ring buffer, and
+a camera backend (CameraServerCam) reads the latest frame out of it. Reading
+a frame is a memory read rather than a USB call, and if the server process
+dies, it is respawned, costing a few frames rather than the session.
+
+Ring buffer slots are written under a sequence lock: the writer makes a
+slot's sequence number odd before and even after writing it, and readers
+retry while it is odd or changes under them.
+
+Example:
+
+    from airtrack.src.camera.server import CameraServerCam
+
+    cam = CameraServerCam()
+    print(cam.get_signatures())
+    cam.close()
+"""
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from airtrack.settings import settings
+from airtrack.settings import AIRTRACK_CAMERA_POLL_INTERVAL
+from airtrack.settings import AIRTRACK_CAMERA_SERVER_BACKEND
+from airtrack.settings import AIRTRACK_CAMERA_SERVER_MAX_FRAME_AGE
+from airtrack.settings import AIRTRACK_CAMERA_SERVER_SLOTS
+
+from airtrack.src import utils
+from airtrack.src import workers
+
+from airtrack.src.camera import blocks
+from airtrack.src.camera.backend import CameraBackend
+from airtrack.src.definitions import AirtrackCameraBackend
+from airtrack.src.errors import err
+from airtrack.src.errors import CameraServerError
+
+logger = utils.create_logger(__name__)
+
+MAX_BLOCKS = 100
+
+SLOT_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('timestamp', '<f8'),
+    ('nblocks', '<u4'),
+    ('blocks', blocks.BLOCK_DTYPE, (MAX_BLOCKS,)),
+])
+
+# Settings the server process needs to open the camera with
+SERVER_SETTINGS = (
+    'AIRTRACK_CAMERA_INDEX',
+    'AIRTRACK_CAMERA_REPLAY_FILE',
+    'AIRTRACK_CAMERA_REPLAY_SPEED',
+    'AIRTRACK_CAMERA_REPLAY_LOOP',
+)
+
+
+def buffer_dtype(slots):
+    """Return the layout of a ring buffer of `slots` frames.
+
+    :rtype: ``numpy.dtype``
+    """
+    return np.dtype([
+        ('frames', '<u8'),
+        # Set by the client to stop the server
+        ('stop', '<u8'),
+        ('slots', SLOT_DTYPE, (slots,)),
+    ])
+
+
+class FrameRing:
+    """Shared-memory ring buffer of camera frames."""
+    # Times to retry reading a frame written meanwhile
+    MAX_READ_ATTEMPTS = 100
+
+    def __init__(self, shm, slots):
+        """
+        :keyword  shm:    The shared memory holding the ring buffer
+        :type     shm:    :class:``multiprocessing.shared_memory.SharedMemory``
+        :keyword  slots:  Number of frames the ring buffer holds
+        :type     slots:  ``int``
+        """
+        self._buffer = np.ndarray((), dtype=buffer_dtype(slots),
+                                  buffer=shm.buf)
+        self._frames = self._buffer['frames']
+        self._stop = self._buffer['stop']
+        self._slots = self._buffer['slots']
+        self._nslots = slots
+
+    @property
+    def stopped(self):
+        """``True`` once the server was told to stop."""
+        return bool(self._stop)
+
+    def stop(self):
+        """Tell the server to stop (client side)."""
+        self._stop[...] = 1
+
+    def write(self, timestamp, frame):
+        """Publish a frame (server side).
+
+        :keyword  timestamp:  Time (`time.monotonic`) the frame was read
+        :type     timestamp:  ``float``
+        :keyword  frame:      The blocks of the frame
+        :type     frame:      ``numpy.ndarray`` of :data:``BLOCK_DTYPE``
+        """
+        frames = int(self._frames)
+        slot = self._slots[frames % self._nslots]
+        nblocks = min(len(frame), MAX_BLOCKS)
+        # Odd while writing (even if a killed server left the slot odd)
+        seq = int(slot['seq']) | 1
+        slot['seq'] = seq
+        slot['timestamp'] = timestamp
+        slot['nblocks'] = nblocks
+        slot['blocks'][:nblocks] = frame[:nblocks]
+        slot['seq'] = seq + 1
+        self._frames[...] = frames + 1
+
+    def read(self):
+        """Return (a copy of) the latest frame (client side).
+
+        The blocks are copied out of the ring buffer before checking that
+        the server did not write the slot meanwhile, so that they cannot be
+        overwritten once returned.
+
+        :return: The frame timestamp and blocks, or ``None`` if no
+            (consistent) frame was published yet
+        :rtype: ``tuple`` of (``float``, ``numpy.ndarray``)
+        """
+        for _ in range(self.MAX_READ_ATTEMPTS):
+            frames = int(self._frames)
+            if not frames:
+                return None
+            slot = self._slots[(frames - 1) % self._nslots]
+            seq = int(slot['seq'])
+            if seq % 2:
+                continue
+            timestamp = float(slot['timestamp'])
+            frame = slot['blocks'][:int(slot['nblocks'])].copy()
+            if int(slot['seq']) == seq:
+                return timestamp, frame
+        return None
+
+    def release(self):
+        """Drop the references to the shared memory."""
+        self._buffer = self._frames = self._stop = self._slots = None
+
+
+def serve(shm_name, slots, backend, interval=AIRTRACK_CAMERA_POLL_INTERVAL):
+    """Read camera frames into the ring buffer until stopped (or orphaned).
+
+    Runs in the camera server process, once configured (see
+    :func:``airtrack.src.workers.serve_camera``).
+    """
+    # Not at module level: the camera base module imports this one
+    from airtrack.src.camera.base import create_backend
+    parent_pid = os.getppid()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = FrameRing(shm, slots)
+    camera = create_backend(backend, record_file=None)
+    try:
+        while not ring.stopped and os.getppid() == parent_pid:
+            ring.write(time.monotonic(), camera.get_blocks_array())
+            time.sleep(interval)
+    finally:
+        camera.close()
+        ring.release()
+        shm.close()
+
+
+class CameraServerCam(CameraBackend):
+    """Camera backend reading frames published by a camera server process."""
+    RESPAWN_INTERVAL = 1
+    STARTUP_TIMEOUT = 10
+    STOP_TIMEOUT = 5
+    STALE_FRAME_ERROR_MSG = 'No camera frame newer than {} sec.'
+    SERVER_BACKEND_ERROR_MSG = 'The camera server cannot serve itself.'
+
+    def __init__(self, backend=AIRTRACK_CAMERA_SERVER_BACKEND,
+                 slots=AIRTRACK_CAMERA_SERVER_SLOTS,
+                 max_frame_age=AIRTRACK_CAMERA_SERVER_MAX_FRAME_AGE):
+        """
+        :keyword  backend:  The backend the server reads frames from
+        :type     backend:  :class:``AirtrackCameraBackend`` or ``str``
+        :keyword  slots:    Number of frames the ring buffer holds
+        :type     slots:    ``int``
+        :keyword  max_frame_age:  Time (sec) to wait for a frame newer than
+            this, e.g. while the server is respawned, before giving up
+        :type     max_frame_age:  ``float``
+        """
+        self._backend = AirtrackCameraBackend(backend)
+        if self._backend is AirtrackCameraBackend.SERVER:
+            err(CameraServerError, logger,
+                message=self.SERVER_BACKEND_ERROR_MSG)
+        self._slots = slots
+        self._max_frame_age = max_frame_age
+        self._context = multiprocessing.get_context('spawn')
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=buffer_dtype(slots).itemsize)
+        self._shm.buf[:] = bytes(self._shm.size)
+        self._ring = FrameRing(self._shm, slots)
+        self._process = None
+        self._spawn_time = None
+        self.respawns = 0
+        self._spawn()
+
+    def _spawn(self):
+        camera_settings = {name: getattr(settings, name)
+                           for name in SERVER_SETTINGS}
+        self._process = self._context.Process(
+            target=workers.serve_camera,
+            # Plain values: unpickling enums would import airtrack first
+            args=(camera_settings, self._shm.name, self._slots,
+                  self._backend.value),
+            name='AirtrackCameraServer', daemon=True)
+        self._process.start()
+        self._spawn_time = time.monotonic()
+
+    def _check_server(self):
+        if self._process.is_alive():
+            return
+        if time.monotonic() - self._spawn_time < self.RESPAWN_INTERVAL:
+            return
+        logger.warning('Camera server died (exit code %s), respawning',
+                       self._process.exitcode)
+        self._process.join()
+        self.respawns += 1
+        self._spawn()
+
+    def _fresh_frame(self):
+        frame = self._ring.read()
+        if frame is None:
+            return None
+        timestamp, blocks_array = frame
+        if time.monotonic() - timestamp > self._max_frame_age:
+            return None
+        return blocks_array
+
+    def get_blocks_array(self):
+        """Return the blocks of the latest frame.
+
+        The returned array is a copy, owned by the caller (see
+        `FrameRing.read`).
+
+        :rtype: ``numpy.ndarray`` of
+            :data:``airtrack.src.camera.blocks.BLOCK_DTYPE``
+        """
+        # Give a (re)spawned server time to start up
+        deadline = max(time.monotonic() + self._max_frame_age,
+                       self._spawn_time + self.STARTUP_TIMEOUT)
+        while True:
+            self._check_server()
+            blocks_array = self._fresh_frame()
+            if blocks_array is not None:
+                return blocks_array
+            if time.monotonic() >= deadline:
+                err(CameraServerError, logger,
+                    message=self.STALE_FRAME_ERROR_MSG.format(
+                        self._max_frame_age))
+            time.sleep(AIRTRACK_CAMERA_POLL_INTERVAL / 2)
+
+    def close(self):
+        """Stop the camera server and free the ring buffer."""
+        # The stop flag lives in shared memory, rather than in e.g. a
+        # multiprocessing.Event, which a killed server could leave locked
+        self._ring.stop()
+        self._process.join(self.STOP_TIMEOUT)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._ring.release()
+        self._shm.close()
+        self._shm.unlink()
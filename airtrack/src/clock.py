@@ -0,0 +1,53 @@
+"""Airtrack clock module.
+
+This module provides the clocks that the Airtrack system reads time from and
+waits with: a real, monotonic clock (AirtrackClock) and a virtual clock
+(AirtrackVirtualClock) that only advances when told to, which lets
+simulations run much faster than real time.
+
+Example:
+
+    from airtrack.src.clock import AirtrackVirtualClock
+
+    clock = AirtrackVirtualClock()
+    clock.sleep(3)  # Returns immediately
+    print(clock.time())  # 3.0
+"""
+import threading
+import time
+
+
+class AirtrackClock:
+    """Real (monotonic) clock."""
+    realtime = True
+
+    def time(self):
+        """Return the current time (sec).
+
+        :rtype: ``float``
+        """
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        """Wait for `seconds` seconds."""
+        time.sleep(seconds)
+
+
+class AirtrackVirtualClock(AirtrackClock):
+    """Virtual clock, advanced explicitly or by sleeping."""
+    realtime = False
+
+    def __init__(self, start=0.0):
+        self._now = start
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self._now
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """Advance the clock by `seconds` seconds."""
+        with self._lock:
+            self._now += max(seconds, 0)
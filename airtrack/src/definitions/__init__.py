@@ -1,3 +1,9 @@
 from airtrack.src.definitions.actuator import AirtrackActuatorState
+from airtrack.src.definitions.benchmark import AirtrackBenchmarkMode
+from airtrack.src.definitions.camera import AirtrackCameraBackend
 from airtrack.src.definitions.camera import AirtrackCameraObject
+from airtrack.src.definitions.rig import AirtrackRigEventType
+from airtrack.src.definitions.session import AirtrackSessionEventType
+from airtrack.src.definitions.sma import AirtrackPeekState
 from airtrack.src.definitions.sma import AirtrackState
+from airtrack.src.definitions.trial import AirtrackTrialEventType
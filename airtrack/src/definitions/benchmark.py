@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class AirtrackBenchmarkMode(Enum):
+    # Bpod emulator, real time
+    EMULATOR = 'emulator'
+    # Simulated Bpod, virtual clock
+    SIMULATED = 'simulated'
@@ -3,3 +3,10 @@ from enum import Enum
 
 class AirtrackCameraObject(Enum):
     SUBJECT = 1
+
+
+class AirtrackCameraBackend(Enum):
+    PIXY = 'pixy'
+    REPLAY = 'replay'
+    # A camera server process serving one of the above
+    SERVER = 'server'
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class AirtrackRigEventType(Enum):
+    STARTED = 'started'
+    EXITED = 'exited'
+    CRASHED = 'crashed'
+    GAVE_UP = 'gave_up'
@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class AirtrackSessionEventType(Enum):
+    # State entries
+    STATE = 'state'
+    # Subject detection changes
+    SUBJECT = 'subject'
+    # Actuator transitions
+    ACTUATOR = 'actuator'
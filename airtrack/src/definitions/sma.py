@@ -7,3 +7,10 @@ states = list(state_transitions.keys())
 AirtrackState = Enum('AirtrackState', states)
 for state in AirtrackState:
     state.transitions = state_transitions[state.name]
+
+# Bpod states running an actuator peek with hardware timing
+AirtrackPeekState = Enum('AirtrackPeekState', [
+    'PEEK_PUSH',
+    'PEEK_REST',
+    'PEEK_PULL',
+])
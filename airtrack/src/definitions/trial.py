@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class AirtrackTrialEventType(Enum):
+    STARTED = 'started'
+    ENDED = 'ended'
+    FAILED = 'failed'
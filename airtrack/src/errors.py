@@ -6,6 +6,14 @@ class AirtrackError(AirtrackBaseError):
     """Airtrack error"""
 
 
+class AirtrackBringUpError(AirtrackError):
+    """Airtrack device bring-up error"""
+
+
+class AirtrackLaneError(AirtrackError):
+    """Airtrack lane error"""
+
+
 class AirtrackSubjectError(AirtrackError):
     """AirtrackCamera error"""
 
@@ -22,10 +30,42 @@ class AirtrackActuatorError(AirtrackError):
     """AirtrackActuator error"""
 
 
-class PixyCamError(Exception):
+class AirtrackSimulationError(AirtrackError):
+    """AirtrackSimulation error"""
+
+
+class AirtrackBenchmarkError(AirtrackError):
+    """Airtrack benchmark error"""
+
+
+class AirtrackRigError(AirtrackError):
+    """Airtrack rig error"""
+
+
+class AirtrackSessionError(AirtrackError):
+    """Airtrack session error"""
+
+
+class AirtrackAnalyticsError(AirtrackError):
+    """Airtrack analytics error"""
+
+
+class CameraBackendError(Exception):
+    """CameraBackend error"""
+
+
+class PixyCamError(CameraBackendError):
     """PixyCam error"""
 
 
+class ReplayCamError(CameraBackendError):
+    """ReplayCam error"""
+
+
+class CameraServerError(CameraBackendError):
+    """CameraServerCam error"""
+
+
 def err(error, logger, message):
     logger.debug(message)
     raise error(message)
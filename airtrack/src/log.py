@@ -0,0 +1,252 @@
+"""Airtrack logging module.
+
+This module provides the Airtrack logging pipeline (AirtrackLogPipeline).
+Loggers created with `utils.create_logger` only put their records on a queue;
+a listener thread formats the records and writes them to the console and,
+during a session, to a JSON Lines session file. Since records are formatted
+in the listener thread, a logging call neither formats nor writes anything,
+and a stalled terminal or disk never blocks the logging (e.g. a state
+machine callback) thread.
+
+Records keep their arguments until they are formatted, so log values rather
+than objects that are mutated afterwards.
+
+Every logger is rate limited: it may log bursts of up to
+AIRTRACK_LOG_RATE_BURST records, refilled at AIRTRACK_LOG_RATE_LIMIT records
+per second. Records over the limit (below WARNING) are dropped and counted.
+
+Example:
+
+    from airtrack.src import log
+
+    log.open_session_file('/tmp/session.jsonl')
+    ...
+    log.close_session_file()
+    print(log.suppressed())
+"""
+import atexit
+import collections
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from airtrack.settings import AIRTRACK_DEBUG_PREFIX
+from airtrack.settings import AIRTRACK_LOG_RATE_BURST
+from airtrack.settings import AIRTRACK_LOG_RATE_LIMIT
+
+CONSOLE_FORMAT = f'%(levelname)s:%(name)s:{AIRTRACK_DEBUG_PREFIX}%(message)s'
+
+
+class RateLimitFilter(logging.Filter):
+    """Per logger token bucket rate limit."""
+
+    def __init__(self, rate=AIRTRACK_LOG_RATE_LIMIT,
+                 burst=AIRTRACK_LOG_RATE_BURST):
+        """
+        :keyword  rate:   Records per second a logger may log (None disables
+            the rate limit)
+        :type     rate:   ``float``
+        :keyword  burst:  Records a logger may log at once
+        :type     burst:  ``int``
+        """
+        super().__init__()
+        self._rate = rate
+        self._burst = burst
+        # Logger name -> [tokens, last refill time]
+        self._buckets = {}
+        # Logger name -> records dropped since its last logged record
+        self._pending = collections.Counter()
+        self.suppressed = collections.Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self._rate is None or record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(
+                record.name, [self._burst, now])
+            bucket[0] = min(
+                self._burst, bucket[0] + (now - bucket[1]) * self._rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                self._pending[record.name] += 1
+                self.suppressed[record.name] += 1
+                return False
+            bucket[0] -= 1
+            record.suppressed = self._pending.pop(record.name, 0)
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler leaving record formatting to the listener thread."""
+
+    def __init__(self, queue, on_enqueue=None):
+        """
+        :keyword  queue:  The queue to put records on
+        :type     queue:  ``queue.SimpleQueue``
+        :keyword  on_enqueue (optional):  Called before a record is put on
+            the queue (e.g. to start the listener)
+        :type     on_enqueue (optional):  ``callable``
+        """
+        super().__init__(queue)
+        self._on_enqueue = on_enqueue
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if self._on_enqueue is not None:
+            self._on_enqueue()
+        self.queue.put_nowait(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format records as JSON objects, one per line."""
+
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class AirtrackLogPipeline:
+    """Airtrack queue-based logging pipeline."""
+
+    def __init__(self, rate=AIRTRACK_LOG_RATE_LIMIT,
+                 burst=AIRTRACK_LOG_RATE_BURST):
+        """
+        :keyword  rate:   Records per second each logger may log
+        :type     rate:   ``float``
+        :keyword  burst:  Records each logger may log at once
+        :type     burst:  ``int``
+        """
+        self._queue = queue.SimpleQueue()
+        self._rate_limit = RateLimitFilter(rate, burst)
+        self.handler = LazyQueueHandler(self._queue, self._start)
+        self.handler.addFilter(self._rate_limit)
+        console = logging.StreamHandler()
+        console.setLevel(logging.DEBUG)
+        console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        self._listener = logging.handlers.QueueListener(
+            self._queue, console, respect_handler_level=True)
+        self._file_handler = None
+        self._lock = threading.Lock()
+        self._running = False
+
+    def _start(self):
+        if self._running:
+            return
+        with self._lock:
+            self._start_listener()
+
+    def _start_listener(self):
+        # With the lock held
+        if not self._running:
+            self._listener.start()
+            self._running = True
+            atexit.register(self.stop)
+
+    def _stop_listener(self):
+        # With the lock held
+        if self._running:
+            self._listener.stop()
+            self._running = False
+            atexit.unregister(self.stop)
+
+    def stop(self):
+        """Log the queued records, then stop the listener thread."""
+        with self._lock:
+            self._stop_listener()
+
+    def _swap_session_file(self, file_handler):
+        # With the lock held throughout, so that the listener is neither
+        # restarted after a concurrent `stop` nor left with a stale file
+        previous, self._file_handler = self._file_handler, file_handler
+        handlers = tuple(
+            h for h in self._listener.handlers if h is not previous)
+        if file_handler is not None:
+            handlers = (*handlers, file_handler)
+        if previous is None:
+            self._listener.handlers = handlers
+            return None
+        # Log the queued records (to the previous file, too) before
+        # replacing it
+        running = self._running
+        self._stop_listener()
+        self._listener.handlers = handlers
+        if running:
+            self._start_listener()
+        return previous
+
+    def open_session_file(self, filename):
+        """Log to the JSON Lines file `filename` too, instead of any
+        previous session file.
+
+        :keyword  filename:  The session log file
+        :type     filename:  ``str``
+        """
+        file_handler = logging.FileHandler(filename)
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(JsonLinesFormatter())
+        with self._lock:
+            previous = self._swap_session_file(file_handler)
+        if previous is not None:
+            previous.close()
+
+    def close_session_file(self):
+        """Stop logging to the session file, once the queue is logged."""
+        with self._lock:
+            previous = self._swap_session_file(None)
+        if previous is not None:
+            previous.close()
+
+    def suppressed(self):
+        """Return the number of records dropped by the rate limit.
+
+        :rtype: ``dict`` of logger name -> ``int``
+        """
+        return dict(self._rate_limit.suppressed)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def pipeline():
+    """Return the Airtrack logging pipeline (created on first call).
+
+    :rtype: :class:``AirtrackLogPipeline``
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = AirtrackLogPipeline()
+        return _pipeline
+
+
+def open_session_file(filename):
+    """Also log to the JSON Lines file `filename`."""
+    pipeline().open_session_file(filename)
+
+
+def close_session_file():
+    """Stop logging to the session file."""
+    pipeline().close_session_file()
+
+
+def suppressed():
+    """Return the number of records dropped by the rate limit, per logger."""
+    return pipeline().suppressed()
@@ -0,0 +1,59 @@
+"""Airtrack trial pipeline module.
+
+This module provides a double-buffered trial pipeline (AirtrackTrialPipeline)
+that prepares the next trial in a background thread while the current trial
+runs.
+
+Example:
+
+    from airtrack.src.pipeline import AirtrackTrialPipeline
+
+    pipeline = AirtrackTrialPipeline(prepare=build_trial, discard=free_trial)
+    for i in range(10):
+        trial = pipeline.next()  # Prepared while the previous trial ran
+        if i < 9:
+            pipeline.prefetch()  # Start preparing the next trial
+        run(trial)
+        free_trial(trial)
+    pipeline.close()  # Discards any prefetched trial
+"""
+import concurrent.futures
+
+
+class AirtrackTrialPipeline:
+    """Double-buffered trial preparation interface."""
+
+    def __init__(self, prepare, discard=None):
+        """
+        :keyword  prepare:  Callable preparing and returning a trial
+        :type     prepare:  ``callable``
+        :keyword  discard (optional):  Callable taking a prepared trial that
+            is never returned by `next` (e.g. prefetched when the pipeline
+            is closed)
+        :type     discard (optional):  ``callable``
+        """
+        self._prepare = prepare
+        self._discard = discard
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='AirtrackTrialPipeline')
+        self._next = None
+
+    def prefetch(self):
+        """Start preparing the next trial, unless already started."""
+        if self._next is None:
+            self._next = self._executor.submit(self._prepare)
+
+    def next(self):
+        """Return the next prepared trial, waiting for it if needed."""
+        self.prefetch()
+        future, self._next = self._next, None
+        return future.result()
+
+    def close(self):
+        """Stop the pipeline, discarding any prefetched trial."""
+        future, self._next = self._next, None
+        self._executor.shutdown(wait=True)
+        if future is None or future.cancel() or future.exception():
+            return
+        if self._discard is not None:
+            self._discard(future.result())
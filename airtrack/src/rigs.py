@@ -0,0 +1,356 @@
+"""Airtrack rigs module.
+
+This module provides a rig manager (AirtrackRigManager) for running several
+Airtrack rigs on one host, each in its own worker process. Every rig has its
+own settings (e.g. Bpod serial port, camera index, session path), applied in
+its worker (see airtrack/src/workers.py) before the rest of airtrack is
+imported there. Rigs start within the same second, i.e. with the same
+session name, so each one keeps its sessions in a directory of its own
+(named after the rig, in AIRTRACK_SESSION_PATH, by default). The manager
+supervises the workers, restarts crashed ones (up to
+AIRTRACK_RIG_MAX_RESTARTS times, after AIRTRACK_RIG_RESTART_DELAY seconds,
+continuing from the trial they crashed in) and merges their trial events
+into a single stream.
+
+Example:
+
+    from airtrack.src.rigs import AirtrackRigManager
+    from airtrack.src.rigs import RigConfig
+
+    manager = AirtrackRigManager([
+        RigConfig('rig1', serial_port='/dev/ttyACM0', camera_index=0),
+        # Stock pixy2 builds can only open the first camera
+        RigConfig('rig2', serial_port='/dev/ttyACM1', simulate=True),
+    ], trials=100)
+
+    for event in manager.run():
+        print(event)
+"""
+import collections
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import time
+
+from airtrack.settings import settings
+from airtrack.settings import AIRTRACK_RIG_MAX_RESTARTS
+from airtrack.settings import AIRTRACK_RIG_RESTART_DELAY
+
+from airtrack.src import utils
+from airtrack.src import workers
+
+from airtrack.src.definitions import AirtrackRigEventType
+from airtrack.src.definitions import AirtrackTrialEventType
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackRigError
+
+logger = utils.create_logger(__name__)
+
+RigEvent = collections.namedtuple(
+    'RigEvent', ['rig', 'type', 'trial', 'time', 'duration', 'error'])
+
+
+class RigConfig:
+    """Configuration of a single rig."""
+    # Config key -> setting it overrides
+    SETTINGS = {
+        'serial_port': 'AIRTRACK_BPOD_SERIAL_PORT',
+        'camera_index': 'AIRTRACK_CAMERA_INDEX',
+        'session_path': 'AIRTRACK_SESSION_PATH',
+    }
+
+    def __init__(self, name, serial_port=None, camera_index=None,
+                 session_path=None, simulate=False, settings=None):
+        """
+        :keyword  name:  The rig name
+        :type     name:  ``str``
+        :keyword  serial_port (optional):  The Bpod serial port
+        :type     serial_port (optional):  ``str``
+        :keyword  camera_index (optional):  The Pixy2 camera to open
+        :type     camera_index (optional):  ``int``
+        :keyword  session_path (optional):  The session directory
+            (defaults to a directory named after the rig, in
+            AIRTRACK_SESSION_PATH)
+        :type     session_path (optional):  ``str``
+        :keyword  simulate (optional):  Simulate a subject on a virtual clock
+        :type     simulate (optional):  ``bool``
+        :keyword  settings (optional):  Other setting overrides
+        :type     settings (optional):  ``dict``
+        """
+        self.name = name
+        self.serial_port = serial_port
+        self.camera_index = camera_index
+        self.session_path = session_path
+        self.simulate = simulate
+        self.settings = dict(settings or {})
+
+    @classmethod
+    def from_dict(cls, config):
+        """Create a rig configuration from a (e.g. JSON) dict.
+
+        :rtype: :class:``RigConfig``
+        """
+        return cls(**config)
+
+    def opens_pixy(self):
+        """Return ``True`` if the rig opens a Pixy2 camera (directly or
+        through a camera server).
+
+        :rtype: ``bool``
+        """
+        if self.simulate:
+            return False
+        overrides = self.overrides()
+
+        def setting(name):
+            return overrides.get(name, getattr(settings, name))
+        backend = setting('AIRTRACK_CAMERA_BACKEND')
+        if backend == 'server':
+            backend = setting('AIRTRACK_CAMERA_SERVER_BACKEND')
+        return backend == 'pixy'
+
+    def overrides(self):
+        """Return the setting overrides of the rig.
+
+        :rtype: ``dict``
+        """
+        overrides = {setting: getattr(self, key)
+                     for key, setting in self.SETTINGS.items()
+                     if getattr(self, key) is not None}
+        overrides.update(self.settings)
+        overrides.setdefault('AIRTRACK_SESSION_PATH', os.path.join(
+            settings.AIRTRACK_SESSION_PATH, self.name))
+        return overrides
+
+    def __repr__(self):
+        return f'RigConfig({self.name!r}, {self.overrides()!r})'
+
+
+def run_rig(name, simulate, trials, first_trial, events):
+    """Run a rig, putting its trial events on `events`.
+
+    Runs in the rig worker process, once configured (see
+    :func:``airtrack.src.workers.run_rig``).
+    """
+    if simulate:
+        from airtrack.src.simulation import AirtrackSimulation as Airtrack
+    else:
+        from airtrack.src.base import Airtrack
+    # Let `AirtrackRigManager.stop` close the system on its way out
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+
+    def put(event_type, trial, duration=None, error=None):
+        events.put(RigEvent(
+            name, event_type, trial, time.time(), duration, error))
+
+    airtrack = Airtrack()
+    airtrack.trial_count = first_trial - 1
+    try:
+        for _ in range(trials) if trials is not None else itertools.count():
+            trial = airtrack.trial_count + 1
+            put(AirtrackTrialEventType.STARTED, trial)
+            try:
+                duration = airtrack.run_trial()
+            except Exception as e:
+                put(AirtrackTrialEventType.FAILED, trial, error=str(e))
+                raise
+            put(AirtrackTrialEventType.ENDED, trial, duration=duration)
+    finally:
+        airtrack.close()
+
+
+class _RigWorker:
+    """Bookkeeping of a rig worker process."""
+
+    def __init__(self, config):
+        self.config = config
+        self.process = None
+        self.restarts = 0
+        self.trials_done = 0
+        self.restart_time = None
+        self.finished = False
+
+
+class AirtrackRigManager:
+    """Airtrack multi-rig manager."""
+    POLL_INTERVAL = 0.5
+    STOP_TIMEOUT = 10
+    DUPLICATE_RIG_ERROR_MSG = 'Duplicate rig names: {}'
+    SHARED_SESSION_PATH_ERROR_MSG = 'Rigs sharing a session path: {}'
+    CAMERA_INDEX_ERROR_MSG = \
+        'Rig {}: this pixy2 build can only open the first PixyCam (index 0).'
+
+    def __init__(self, rigs, trials=None,
+                 max_restarts=AIRTRACK_RIG_MAX_RESTARTS,
+                 restart_delay=AIRTRACK_RIG_RESTART_DELAY):
+        """
+        :keyword  rigs:  The rigs to run
+        :type     rigs:  ``list`` of :class:``RigConfig``
+        :keyword  trials (optional):  Number of trials to run every rig for
+            (forever if not given)
+        :type     trials (optional):  ``int``
+        :keyword  max_restarts:  Times a crashed rig worker is restarted
+        :type     max_restarts:  ``int``
+        :keyword  restart_delay:  Time (sec) to wait before a restart
+        :type     restart_delay:  ``float``
+        """
+        names = collections.Counter(rig.name for rig in rigs)
+        duplicates = [name for name, count in names.items() if count > 1]
+        if duplicates:
+            err(AirtrackRigError, logger,
+                message=self.DUPLICATE_RIG_ERROR_MSG.format(duplicates))
+        session_paths = collections.defaultdict(list)
+        for rig in rigs:
+            session_paths[os.path.abspath(
+                rig.overrides()['AIRTRACK_SESSION_PATH'])].append(rig.name)
+        shared = [names for names in session_paths.values() if len(names) > 1]
+        if shared:
+            # They would write the same session files
+            err(AirtrackRigError, logger,
+                message=self.SHARED_SESSION_PATH_ERROR_MSG.format(shared))
+        for rig in rigs:
+            self._check_camera_index(rig)
+        self._trials = trials
+        self._max_restarts = max_restarts
+        self._restart_delay = restart_delay
+        # Workers start from a fresh interpreter, so that every rig is
+        # configured before airtrack is imported in it
+        self._context = multiprocessing.get_context('spawn')
+        self._events = self._context.Queue()
+        self._workers = {rig.name: _RigWorker(rig) for rig in rigs}
+
+    def _check_camera_index(self, rig):
+        # Rather than crash (and restart) the rig worker over it
+        if not rig.overrides().get('AIRTRACK_CAMERA_INDEX') or \
+                not rig.opens_pixy():
+            return
+        from airtrack.src.camera.pixy import PixyCam
+        if not PixyCam.index_supported():
+            err(AirtrackRigError, logger,
+                message=self.CAMERA_INDEX_ERROR_MSG.format(rig.name))
+
+    def _event(self, worker, event_type, error=None):
+        return RigEvent(worker.config.name, event_type,
+                        worker.trials_done + 1, time.time(), None, error)
+
+    def _start(self, worker):
+        trials = None if self._trials is None \
+            else self._trials - worker.trials_done
+        worker.process = self._context.Process(
+            target=workers.run_rig,
+            args=(worker.config.name, worker.config.overrides(),
+                  worker.config.simulate, trials, worker.trials_done + 1,
+                  self._events),
+            name=f'airtrack-rig-{worker.config.name}')
+        worker.process.start()
+        worker.restart_time = None
+        logger.info('Started rig %s (pid %d)',
+                    worker.config.name, worker.process.pid)
+        return self._event(worker, AirtrackRigEventType.STARTED)
+
+    def _handle_exit(self, worker):
+        exitcode = worker.process.exitcode
+        if exitcode == 0:
+            worker.finished = True
+            return self._event(worker, AirtrackRigEventType.EXITED)
+        error = f'exit code {exitcode}'
+        logger.warning('Rig %s crashed (%s)', worker.config.name, error)
+        if worker.restarts >= self._max_restarts:
+            worker.finished = True
+            return self._event(worker, AirtrackRigEventType.GAVE_UP, error)
+        worker.restarts += 1
+        worker.restart_time = time.monotonic() + self._restart_delay
+        return self._event(worker, AirtrackRigEventType.CRASHED, error)
+
+    def _count(self, event):
+        if event.type is AirtrackTrialEventType.ENDED:
+            worker = self._workers[event.rig]
+            worker.trials_done = max(worker.trials_done, event.trial)
+        return event
+
+    def _drain(self):
+        while True:
+            try:
+                yield self._count(self._events.get_nowait())
+            except queue.Empty:
+                return
+
+    def _supervise(self):
+        # Count the trials a worker ended before handling its exit
+        yield from self._drain()
+        now = time.monotonic()
+        for worker in self._workers.values():
+            if worker.finished:
+                continue
+            if worker.restart_time is not None:
+                if now >= worker.restart_time:
+                    yield self._start(worker)
+            elif not worker.process.is_alive():
+                yield self._handle_exit(worker)
+
+    @property
+    def running(self):
+        """``True`` while any rig has not finished."""
+        return any(not w.finished for w in self._workers.values())
+
+    def start(self):
+        """Start a worker process per rig.
+
+        :return: The rig started events
+        :rtype: ``list`` of :class:``RigEvent``
+        """
+        return [self._start(w) for w in self._workers.values()]
+
+    def events(self):
+        """Supervise the rigs, and yield their (trial and rig) events until
+        every rig has finished.
+
+        :rtype: ``iterator`` of :class:``RigEvent``
+        """
+        while self.running:
+            try:
+                yield self._count(
+                    self._events.get(timeout=self.POLL_INTERVAL))
+            except queue.Empty:
+                pass
+            yield from self._supervise()
+
+    def run(self):
+        """Start the rigs, and yield their events until every rig has
+        finished. The rigs are stopped if iteration stops early.
+
+        :rtype: ``iterator`` of :class:``RigEvent``
+        """
+        try:
+            yield from self.start()
+            yield from self.events()
+        finally:
+            self.stop()
+
+    def status(self):
+        """Return the status of every rig.
+
+        :rtype: ``dict`` of rig name -> ``dict``
+        """
+        return {name: {
+            'pid': w.process.pid if w.process else None,
+            'alive': bool(w.process and w.process.is_alive()),
+            'restarts': w.restarts,
+            'trials': w.trials_done,
+            'finished': w.finished,
+        } for name, w in self._workers.items()}
+
+    def stop(self):
+        """Stop (and close the systems of) all rigs."""
+        for worker in self._workers.values():
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        for worker in self._workers.values():
+            if worker.process is not None:
+                worker.process.join(self.STOP_TIMEOUT)
+                if worker.process.is_alive():
+                    worker.process.kill()
+            worker.finished = True
@@ -0,0 +1,332 @@
+"""Airtrack session module.
+
+This module provides a columnar session store: a writer
+(AirtrackSessionRecorder) that records, per session,
+
+- a `trials` table: trial number, start and end time, duration
+- an `events` table: time, trial, kind and name of every state entry,
+  subject detection change and actuator transition (see
+  AirtrackSessionEventType), with a value (e.g. 1 for a detected subject)
+
+and a reader (read_session) returning every table as columns. Session
+metadata (e.g. the animal run) is written to a JSON file alongside.
+
+Rows are buffered in memory, column by column, and every
+AIRTRACK_SESSION_CHUNK_SIZE rows are handed to a background thread that
+writes them as a chunk: a NumPy .npz file with one array per column, in the
+session store directory. Recording a row never waits on the disk.
+
+Event kinds and names repeat a handful of strings: chunks store them as
+integer codes into a lookup table of the chunk (e.g. `name` and
+`name.categories`), and chunks are compressed. Readers get the strings back.
+
+Example:
+
+    from airtrack.src.session import AirtrackSessionRecorder
+    from airtrack.src.session import read_session
+
+    recorder = AirtrackSessionRecorder('/tmp/session.airtrack',
+                                       metadata={'animal': 'mouse1'})
+    recorder.start_trial(1)
+    recorder.record('actuator', 'PUSHING')
+    recorder.end_trial(1, duration=3.2)
+    recorder.close()
+
+    events = read_session('/tmp/session.airtrack')['events']
+    print(events['time'], events['name'])
+"""
+import glob
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from airtrack.settings import AIRTRACK_SESSION_CHUNK_SIZE
+
+from airtrack.src import utils
+
+from airtrack.src.clock import AirtrackClock
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackSessionError
+
+logger = utils.create_logger(__name__)
+
+# Table name -> column dtypes
+TABLES = {
+    'trials': {
+        'trial': np.uint32,
+        'start_time': np.float64,
+        'end_time': np.float64,
+        'duration': np.float64,
+    },
+    'events': {
+        'time': np.float64,
+        'trial': np.uint32,
+        'kind': '<U8',
+        'name': '<U32',
+        'value': np.float64,
+    },
+}
+
+# Columns stored as codes into a lookup table of their chunk
+CATEGORICAL_COLUMNS = {'events': ('kind', 'name')}
+CATEGORY_CODE_DTYPE = np.uint16
+CATEGORIES_KEY = '{column}.categories'
+
+CHUNK_FILE_PATTERN = '{table}.{chunk:06d}.npz'
+METADATA_FILE = 'session.json'
+# Extension of session store directories
+SESSION_STORE_EXTENSION = '.airtrack'
+
+
+class _Table:
+    """Column buffers of a table."""
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = columns
+        self.rows = {column: [] for column in columns}
+        self.chunks = 0
+
+    def __len__(self):
+        return len(next(iter(self.rows.values())))
+
+    def append(self, row):
+        for column, value in zip(self.columns, row):
+            self.rows[column].append(value)
+
+    def take(self):
+        rows = self.rows
+        self.rows = {column: [] for column in self.columns}
+        chunk = self.chunks
+        self.chunks += 1
+        return chunk, rows
+
+
+class AirtrackSessionRecorder:
+    """Airtrack columnar session writer."""
+    WRITE_ERROR_MSG = 'Failed to write {} session chunk(s) to {}: {}'
+
+    def __init__(self, path, clock=None,
+                 chunk_size=AIRTRACK_SESSION_CHUNK_SIZE, metadata=None):
+        """
+        :keyword  path:  The session store directory (created if needed)
+        :type     path:  ``str``
+        :keyword  clock (optional):  The clock to timestamp records with
+        :type     clock (optional):  :class:``AirtrackClock``
+        :keyword  chunk_size:  Number of rows per chunk file
+        :type     chunk_size:  ``int``
+        :keyword  metadata (optional):  Session metadata (JSON serializable)
+        :type     metadata (optional):  ``dict``
+        """
+        os.makedirs(path, exist_ok=True)
+        if metadata is not None:
+            with open(os.path.join(path, METADATA_FILE), 'w') as f:
+                json.dump(metadata, f)
+        self.path = path
+        self._clock = clock or AirtrackClock()
+        self._chunk_size = chunk_size
+        self._tables = {name: _Table(name, columns)
+                        for name, columns in TABLES.items()}
+        self._trial = 0
+        self._trial_start_time = None
+        # Records come from state callbacks and actuator timers alike
+        self._lock = threading.Lock()
+        # A plain thread rather than an executor, which refuses new work
+        # at interpreter exit (i.e. when closed from atexit)
+        self._chunks = queue.Queue()
+        self._errors = []
+        self._writer = threading.Thread(
+            target=self._write_chunks, name='AirtrackSessionRecorder',
+            daemon=True)
+        self._writer.start()
+        self._closed = False
+
+    def _write_chunk(self, table, chunk, rows):
+        filename = os.path.join(
+            self.path, CHUNK_FILE_PATTERN.format(table=table.name,
+                                                 chunk=chunk))
+        columns = {column: np.array(values, dtype=table.columns[column])
+                   for column, values in rows.items()}
+        for column in CATEGORICAL_COLUMNS.get(table.name, ()):
+            categories, codes = np.unique(columns[column], return_inverse=True)
+            columns[column] = codes.astype(CATEGORY_CODE_DTYPE)
+            columns[CATEGORIES_KEY.format(column=column)] = categories
+        # Write under a temporary name, so that readers never see a partial
+        # chunk
+        tmp_filename = f'{filename}.tmp'
+        with open(tmp_filename, 'wb') as f:
+            np.savez_compressed(f, **columns)
+        os.replace(tmp_filename, filename)
+
+    def _try_write_chunk(self, table, chunk, rows):
+        try:
+            self._write_chunk(table, chunk, rows)
+        except Exception as e:
+            logger.error('Failed to write %s chunk %d: %s',
+                         table.name, chunk, e)
+            self._errors.append(e)
+
+    def _write_chunks(self):
+        while True:
+            item = self._chunks.get()
+            try:
+                if item is None:
+                    return
+                self._try_write_chunk(*item)
+            finally:
+                self._chunks.task_done()
+
+    def _flush(self, table):
+        if len(table):
+            self._chunks.put((table, *table.take()))
+
+    def _check_errors(self):
+        # Report the chunks lost since the last check
+        errors, self._errors = self._errors, []
+        if errors:
+            err(AirtrackSessionError, logger,
+                message=self.WRITE_ERROR_MSG.format(
+                    len(errors), self.path, errors[-1]))
+
+    def _append(self, table_name, row):
+        table = self._tables[table_name]
+        table.append(row)
+        if len(table) >= self._chunk_size:
+            self._flush(table)
+
+    def record(self, kind, name, value=np.nan):
+        """Record an event of the current trial.
+
+        :keyword  kind:   The event kind
+        :type     kind:   :class:``AirtrackSessionEventType`` or ``str``
+        :keyword  name:   The event name (e.g. the state name)
+        :type     name:   ``str``
+        :keyword  value (optional):  The event value
+        :type     value (optional):  ``float``
+        """
+        kind = getattr(kind, 'value', kind)
+        with self._lock:
+            self._append('events', (
+                self._clock.time(), self._trial, kind, name, value))
+
+    def start_trial(self, trial):
+        """Start recording trial `trial`."""
+        with self._lock:
+            self._trial = trial
+            self._trial_start_time = self._clock.time()
+
+    def end_trial(self, trial, duration):
+        """Record the end of trial `trial`, that lasted `duration` sec."""
+        with self._lock:
+            self._append('trials', (
+                trial, self._trial_start_time, self._clock.time(),
+                duration))
+
+    def flush(self):
+        """Write the buffered rows, and wait for all chunks to be written.
+
+        :raises AirtrackSessionError: If any chunk failed to be written
+            since the last flush
+        """
+        with self._lock:
+            for table in self._tables.values():
+                self._flush(table)
+        self._chunks.join()
+        self._check_errors()
+
+    def close(self):
+        """Stop the writer thread, and write the buffered rows.
+
+        :raises AirtrackSessionError: If any chunk failed to be written
+            since the last flush
+        """
+        if self._closed:
+            return
+        self._closed = True
+        # Let the writer thread finish the chunks it was handed, then write
+        # the rest from this thread
+        self._chunks.put(None)
+        self._writer.join()
+        with self._lock:
+            for table in self._tables.values():
+                if len(table):
+                    self._try_write_chunk(table, *table.take())
+        self._check_errors()
+        logger.debug('Wrote session to %s', self.path)
+
+
+class NullSessionRecorder:
+    """Session recorder that records nothing."""
+
+    def record(self, kind, name, value=np.nan):
+        pass
+
+    def start_trial(self, trial):
+        pass
+
+    def end_trial(self, trial, duration):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_RECORDER = NullSessionRecorder()
+
+
+def _decode_chunk(chunk):
+    columns = {column: chunk[column] for column in chunk.files}
+    for column in list(columns):
+        key = CATEGORIES_KEY.format(column=column)
+        # Chunks written before categorical columns store the strings
+        if key in columns:
+            columns[column] = columns.pop(key)[columns[column]]
+    return columns
+
+
+def read_table(path, table):
+    """Read a table of a session store.
+
+    :keyword  path:   The session store directory
+    :type     path:   ``str``
+    :keyword  table:  The table name (e.g. 'events')
+    :type     table:  ``str``
+
+    :return: Column name -> column
+    :rtype: ``dict`` of ``str`` -> ``numpy.ndarray``
+    """
+    filenames = sorted(glob.glob(os.path.join(
+        glob.escape(path), f'{glob.escape(table)}.*.npz')))
+    chunks = []
+    for filename in filenames:
+        with np.load(filename) as chunk:
+            chunks.append(_decode_chunk(chunk))
+    return {column: np.concatenate([chunk[column] for chunk in chunks])
+            if chunks else np.empty(0, dtype=dtype)
+            for column, dtype in TABLES[table].items()}
+
+
+def read_metadata(path):
+    """Read the metadata of a session store (empty if none was written).
+
+    :rtype: ``dict``
+    """
+    try:
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def read_session(path):
+    """Read every table of a session store.
+
+    :rtype: ``dict`` of table name -> ``dict`` of column name -> column
+    """
+    return {table: read_table(path, table) for table in TABLES}
@@ -0,0 +1 @@
+from airtrack.src.simulation.base import AirtrackSimulation
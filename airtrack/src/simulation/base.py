@@ -0,0 +1,51 @@
+"""Airtrack simulation base module.
+
+This module provides an interface (AirtrackSimulation) for running the
+Airtrack system against the Bpod emulator and a simulated subject, on a
+virtual clock, i.e. much faster than real time.
+
+Example:
+
+    from airtrack.src.simulation import AirtrackSimulation
+
+    simulation = AirtrackSimulation(seed=0)
+    simulation.run(trials=10000)
+    print(simulation.elapsed_time)
+    simulation.close()
+"""
+from airtrack.src.base import Airtrack
+from airtrack.src.clock import AirtrackVirtualClock
+from airtrack.src.simulation.bpod import SimulatedBpod
+from airtrack.src.simulation.subject import SimulatedSubject
+
+
+class AirtrackSimulation(Airtrack):
+    """Airtrack system simulation interface."""
+
+    def __init__(self, subject=None, clock=None, seed=None, **kwargs):
+        """
+        :keyword  subject (optional):  The subject to query (defaults to a
+            SimulatedSubject)
+        :type     subject (optional):  :class:``SimulatedSubject``
+        :keyword  clock (optional):  The clock to simulate on (defaults to
+            a new AirtrackVirtualClock)
+        :type     clock (optional):  :class:``AirtrackVirtualClock``
+        :keyword  seed (optional):  Random seed of the default subject
+        :type     seed (optional):  ``int``
+
+        Other keyword arguments are passed on to :class:``Airtrack``.
+        """
+        clock = clock or AirtrackVirtualClock()
+        self._start_time = clock.time()
+        super().__init__(
+            subject=subject or SimulatedSubject(clock, seed=seed),
+            clock=clock,
+            **kwargs)
+
+    def _make_bpod(self):
+        return SimulatedBpod(super()._make_bpod(), self._clock)
+
+    @property
+    def elapsed_time(self):
+        """Simulated time (sec) elapsed since the simulation was created."""
+        return self._clock.time() - self._start_time
@@ -0,0 +1,114 @@
+"""Airtrack simulated Bpod module.
+
+This module provides a proxy (SimulatedBpod) around an emulator-mode Bpod
+that runs Airtrack state machines in Python, on a (virtual) clock, instead
+of in real time:
+
+- `run_state_machine` steps through the states the state machine was set
+  up with, calling state callbacks and following their transitions.
+- Events triggered by callbacks and BNC outputs are captured, not sent.
+  Like on the Bpod, outputs a state does not set are low on entering it.
+
+Everything else is delegated to the wrapped Bpod.
+
+Example:
+
+    from pybpodapi.protocol import Bpod
+    from airtrack.src.clock import AirtrackVirtualClock
+    from airtrack.src.simulation.bpod import SimulatedBpod
+
+    bpod = SimulatedBpod(Bpod(emulator_mode=True), AirtrackVirtualClock())
+"""
+from airtrack.settings import AIRTRACK_STATE_TIMER
+
+from airtrack.src import utils
+
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackSimulationError
+
+from pybpodapi.protocol import Bpod
+
+logger = utils.create_logger(__name__)
+
+EXIT_STATE = 'exit'
+
+
+class SimulatedBpod:
+    """Bpod proxy simulating state machine runs."""
+    MAX_STATE_TRANSITIONS = 10 ** 6
+    MAX_STATE_TRANSITIONS_ERROR_MSG = \
+        'State machine did not exit after {} state transitions.'
+
+    def __init__(self, bpod, clock, state_timer=AIRTRACK_STATE_TIMER):
+        """
+        :keyword  bpod:   An emulator-mode pybpod Bpod object
+        :type     bpod:   :class:``pybpodapi.protocol.Bpod``
+        :keyword  clock:  The clock the simulation advances
+        :type     clock:  :class:``airtrack.src.clock.AirtrackClock``
+        :keyword  state_timer:  Time (sec) between state callback calls
+        :type     state_timer:  ``float``
+        """
+        self._bpod = bpod
+        self._clock = clock
+        self._state_timer = state_timer
+        self._triggered_event = None
+        self.outputs = {}
+        self.state_transition_count = 0
+
+    def __getattr__(self, name):
+        return getattr(self._bpod, name)
+
+    def manual_override(self, channel_type, channel_name, channel_number,
+                        value, ignore_emulator=False):
+        self.outputs[f'{channel_name}{channel_number}'] = value
+
+    def trigger_event_by_name(self, event_name, event_data):
+        self._triggered_event = event_name
+
+    def _run_state(self, description):
+        callback = description.get('callback')
+        conditions = description.get('state_change_conditions', {})
+        # Like the Bpod, drive the outputs a state does not set low on
+        # entering it (manual overrides included)
+        self.outputs = dict.fromkeys(self.outputs, 0)
+        for channel, value in description.get('output_actions', ()):
+            self.outputs[channel] = value
+        timeout = description.get('state_timer', 0)
+        timeout_state = conditions.get(Bpod.Events.Tup)
+        # Elapsed state time is summed up rather than read off the clock,
+        # so that rounding cannot leave a sub-ulp remainder to sleep for
+        elapsed = 0
+        while True:
+            self._triggered_event = None
+            if callback is not None:
+                callback()
+            if self._triggered_event in conditions:
+                return conditions[self._triggered_event]
+            step = self._state_timer
+            if timeout_state is not None:
+                step = min(step, timeout - elapsed)
+            self._clock.sleep(step)
+            elapsed += step
+            if timeout_state is not None and elapsed >= timeout:
+                return timeout_state
+
+    def run_state_machine(self, sma):
+        """Run `sma` to its exit state, on the simulation clock.
+
+        :keyword  sma:  A set up state machine
+        :type     sma:  :class:``airtrack.src.sma.AirtrackStateMachine``
+        """
+        descriptions = sma.state_descriptions
+        state_name = next(iter(descriptions))
+        for _ in range(self.MAX_STATE_TRANSITIONS):
+            description = descriptions[state_name]
+            state_name = self._run_state(description)
+            # Like the Bpod, drive the state's output channels low on exit
+            for channel, _ in description.get('output_actions', ()):
+                self.outputs[channel] = 0
+            self.state_transition_count += 1
+            if state_name == EXIT_STATE:
+                return True
+        err(AirtrackSimulationError, logger,
+            message=self.MAX_STATE_TRANSITIONS_ERROR_MSG.format(
+                self.MAX_STATE_TRANSITIONS))
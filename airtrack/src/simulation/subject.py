@@ -0,0 +1,64 @@
+"""Airtrack simulated subject module.
+
+This module provides a simulated subject (SimulatedSubject) that enters and
+exits the lane after exponentially distributed dwell times, measured on the
+given clock.
+
+Example:
+
+    from airtrack.src.clock import AirtrackVirtualClock
+    from airtrack.src.simulation.subject import SimulatedSubject
+
+    clock = AirtrackVirtualClock()
+    subject = SimulatedSubject(clock, seed=0)
+    clock.sleep(10)
+    print(subject.is_inside_lane())
+"""
+import random
+
+from airtrack.settings import AIRTRACK_SIMULATION_MEAN_INSIDE_LANE_TIME
+from airtrack.settings import AIRTRACK_SIMULATION_MEAN_OUTSIDE_LANE_TIME
+
+
+class SimulatedSubject:
+    """Simulated subject information interface."""
+
+    def __init__(self, clock,
+                 mean_inside_time=AIRTRACK_SIMULATION_MEAN_INSIDE_LANE_TIME,
+                 mean_outside_time=AIRTRACK_SIMULATION_MEAN_OUTSIDE_LANE_TIME,
+                 seed=None):
+        """
+        :keyword  clock:  The clock dwell times are measured on
+        :type     clock:  :class:``airtrack.src.clock.AirtrackClock``
+        :keyword  mean_inside_time:   Mean time (sec) spent inside the lane
+        :type     mean_inside_time:   ``float``
+        :keyword  mean_outside_time:  Mean time (sec) spent outside the lane
+        :type     mean_outside_time:  ``float``
+        :keyword  seed (optional):  Random seed
+        :type     seed (optional):  ``int``
+        """
+        self._clock = clock
+        self._mean_dwell_time = {
+            True: mean_inside_time, False: mean_outside_time}
+        self._random = random.Random(seed)
+        self._inside_lane = False
+        self._next_move_time = self._clock.time() + self._dwell_time()
+
+    def _dwell_time(self):
+        return self._random.expovariate(
+            1 / self._mean_dwell_time[self._inside_lane])
+
+    def is_inside_lane(self):
+        """Query subject for being inside or outside the airtable lane.
+
+        :return: ``True`` if the subject is inside the lane,
+            otherwise ``False``
+        :rtype: ``bool``
+        """
+        while self._clock.time() >= self._next_move_time:
+            self._inside_lane = not self._inside_lane
+            self._next_move_time += self._dwell_time()
+        return self._inside_lane
+
+    def clean_up(self):
+        """Clean up the object."""
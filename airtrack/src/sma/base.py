@@ -11,7 +11,11 @@ Example:
     bpod = Bpod(emulator_mode=True)
     bpod.open()
 
-    sma = AirtrackStateMachine(bpod)
+    sma = AirtrackStateMachine(bpod, subject)
+    # Or, let the Bpod time actuator peeks
+    # sma = AirtrackStateMachine(bpod, subject, hardware_timing=True)
+    # Or, enter the lane up to 50 ms ahead of the tracked subject
+    # sma = AirtrackStateMachine(bpod, subject, lead_time=0.05)
     sma.setup()
 
     bpod.send_state_machine(sma, ignore_emulator=True)
@@ -19,14 +23,23 @@ Example:
 """
 import functools
 
+from airtrack.settings import AIRTRACK_ACTUATOR_AT_REST_TIMEOUT
+from airtrack.settings import AIRTRACK_ACTUATOR_HARDWARE_TIMING
+from airtrack.settings import AIRTRACK_ACTUATOR_LEAD_TIME
+from airtrack.settings import AIRTRACK_ACTUATOR_PUSH_TIMEOUT
 from airtrack.settings import AIRTRACK_STATE_TIMER
 
+from airtrack.src import trace
 from airtrack.src import utils
 
 from airtrack.src.actuator import AirtrackActuator
+from airtrack.src.clock import AirtrackClock
+from airtrack.src.definitions import AirtrackPeekState as PeekState
+from airtrack.src.definitions import AirtrackSessionEventType as EventType
 from airtrack.src.definitions import AirtrackState as State
 from airtrack.src.errors import on_error_raise
 from airtrack.src.errors import AirtrackStateMachineError
+from airtrack.src.session import NULL_RECORDER
 
 from pybpodapi.protocol import Bpod
 from pybpodapi.protocol import StateMachine
@@ -36,12 +49,15 @@ logger = utils.create_logger(__name__)
 handle_error = on_error_raise(AirtrackStateMachineError, logger)
 
 UNBOUND_CALLBACK_ATTR_NAME = 'unbound_callback'
+EXIT_STATE_NAME = 'exit'
 
 
 def callback(state):
     def decorator(func):
+        @trace.span(f'callback.{state.name}')
         def wrapper(self):
-            logger.debug(f'Calling {state} callback')
+            logger.debug('Calling %s callback', state)
+            self._enter_state(state)
             return func(self, state)
         setattr(state, UNBOUND_CALLBACK_ATTR_NAME, wrapper)
         return wrapper
@@ -50,24 +66,64 @@ def callback(state):
 
 class AirtrackStateMachine(StateMachine):
     """Airtrack state machine interface."""
+    BNC_HIGH = 1
 
-    def __init__(self, bpod, subject):
+    def __init__(self, bpod, subject, clock=None,
+                 hardware_timing=AIRTRACK_ACTUATOR_HARDWARE_TIMING,
+                 loop=None, recorder=None,
+                 lead_time=AIRTRACK_ACTUATOR_LEAD_TIME):
+        """
+        :keyword  bpod:     A pybpod Bpod object
+        :type     bpod:     :class:``pybpodapi.protocol.Bpod``
+        :keyword  subject:  The subject to query
+        :type     subject:  :class:``airtrack.src.subject.AirtrackSubject``
+        :keyword  clock (optional):  The clock to time actions with
+        :type     clock (optional):  :class:``AirtrackClock``
+        :keyword  hardware_timing (optional):  Run actuator peeks as Bpod
+            states, timed by the Bpod, instead of from state callbacks
+        :type     hardware_timing (optional):  ``bool``
+        :keyword  loop (optional):  Time actuator actions with this event
+            loop, rather than a timer thread
+        :type     loop (optional):  :class:``asyncio.AbstractEventLoop``
+        :keyword  recorder (optional):  The session recorder to record state
+            entries, subject detections and actuator transitions with
+        :type     recorder (optional):
+            :class:``airtrack.src.session.AirtrackSessionRecorder``
+        :keyword  lead_time (optional):  Enter the lane up to this long
+            (sec) before the subject is predicted to enter a lane (0
+            disables predictions)
+        :type     lead_time (optional):  ``float``
+        """
         super().__init__(bpod)
         self._bpod = bpod
+        # Shared with the actuator, which writes from other threads
+        self._bpod_lock = utils.bpod_lock(bpod)
         self._subject = subject
-        self._actuator = AirtrackActuator(self._bpod)
-        # Bind `self` to state callbacks
+        self._clock = clock or AirtrackClock()
+        self._hardware_timing = hardware_timing
+        self._lead_time = lead_time
+        self._recorder = recorder or NULL_RECORDER
+        self._actuator = AirtrackActuator(
+            self._bpod, clock=self._clock, loop=loop, recorder=recorder)
+        # Last entered state and recorded subject detection
+        self._entered_state = None
+        self._recorded_inside_lane = None
+        # State name -> keyword arguments the state was added with
+        self.state_descriptions = {}
+        # Bind `self` to state callbacks, per state machine rather than on
+        # the (shared) states, since several state machines may coexist
+        self._callbacks = {}
         for s in State:
             unbound_callback = getattr(s, UNBOUND_CALLBACK_ATTR_NAME, None)
             if unbound_callback:
-                s.callback = functools.partial(unbound_callback, self)
-            else:
-                s.callback = None
+                self._callbacks[s] = functools.partial(unbound_callback, self)
 
     @callback(State.QUERY_SUBJECT_LOCATION)
     @handle_error
     def _query_subject_location(self, state):
-        if self._subject.is_inside_lane():
+        inside_lane = self._subject.is_inside_lane()
+        self._record_subject_detection(inside_lane)
+        if inside_lane or self._lane_entry_predicted():
             dest_state_name = State.ENTER_LANE.name
         else:
             dest_state_name = State.EXIT_LANE.name
@@ -77,9 +133,13 @@ class AirtrackStateMachine(StateMachine):
     @callback(State.ENTER_LANE)
     @handle_error
     def _enter_lane(self, state):
-        peek_completed = self._actuator.peek()
+        # With hardware timing, the peek states take over right away
+        peek_completed = self._hardware_timing or self._actuator.peek()
+        if self._hardware_timing:
+            # Peek states have no callback: record the peek as it starts
+            self._enter_state(PeekState.PEEK_PUSH)
         if peek_completed:
-            event = state.transitions['exit']
+            event = state.transitions[EXIT_STATE_NAME]
             self._trigger_event_by_name(event)
 
     @callback(State.EXIT_LANE)
@@ -87,16 +147,70 @@ class AirtrackStateMachine(StateMachine):
     def _exit_lane(self, state):
         pull_timed_out = self._actuator.pull()
         if pull_timed_out:
-            event = state.transitions['exit']
+            event = state.transitions[EXIT_STATE_NAME]
             self._trigger_event_by_name(event)
 
+    def _lane_entry_predicted(self):
+        # Subjects that cannot be tracked (e.g. simulated ones) predict none
+        predict_lane_entry = getattr(
+            self._subject, 'predict_lane_entry', None)
+        if not self._lead_time or predict_lane_entry is None:
+            return False
+        return predict_lane_entry(self._lead_time) is not None
+
+    def _enter_state(self, state):
+        # Callbacks are called on every state timer tick, entries only once
+        if state is not self._entered_state:
+            self._entered_state = state
+            # BNC outputs are low in a state that does not set them
+            self._actuator.note_state_entry()
+            self._recorder.record(EventType.STATE, state.name)
+
+    def _record_subject_detection(self, inside_lane):
+        if inside_lane != self._recorded_inside_lane:
+            self._recorded_inside_lane = inside_lane
+            self._recorder.record(
+                EventType.SUBJECT, 'inside_lane', float(inside_lane))
+
+    @trace.span('sma.trigger_event_by_name')
     @handle_error
     def _trigger_event_by_name(self, event_name):
-        self._bpod.trigger_event_by_name(event_name, 255)
+        with self._bpod_lock:
+            self._bpod.trigger_event_by_name(event_name, 255)
+
+    def _add_state(self, state_name, **kwargs):
+        self.state_descriptions[state_name] = kwargs
+        self.add_state(state_name, **kwargs)
+
+    def _add_peek_states(self):
+        self._add_state(
+            PeekState.PEEK_PUSH.name,
+            state_timer=AIRTRACK_ACTUATOR_PUSH_TIMEOUT,
+            state_change_conditions={
+                Bpod.Events.Tup: PeekState.PEEK_REST.name},
+            output_actions=[(Bpod.OutputChannels.BNC1, self.BNC_HIGH)])
+        # BNC outputs are low in a state that does not set them
+        self._add_state(
+            PeekState.PEEK_REST.name,
+            state_timer=AIRTRACK_ACTUATOR_AT_REST_TIMEOUT,
+            state_change_conditions={
+                Bpod.Events.Tup: PeekState.PEEK_PULL.name})
+        self._add_state(
+            PeekState.PEEK_PULL.name,
+            state_timer=AIRTRACK_ACTUATOR_PUSH_TIMEOUT,
+            state_change_conditions={Bpod.Events.Tup: EXIT_STATE_NAME},
+            output_actions=[(Bpod.OutputChannels.BNC2, self.BNC_HIGH)])
 
     @handle_error
     def setup(self):
-        """Set up the state machine."""
+        """Set up the state machine.
+
+        With hardware timing, the peek of ENTER_LANE is compiled into Bpod
+        states (push, rest, pull) that the Bpod times and sets the actuator
+        BNC outputs in; ENTER_LANE exits into them instead of the end of the
+        trial. A peek then runs to completion, even if the subject leaves the
+        lane meanwhile.
+        """
         for state in State:
             state_timer = None
             state_transitions = state.transitions.items()
@@ -113,11 +227,38 @@ class AirtrackStateMachine(StateMachine):
                     event if isinstance(event, str)
                     else Bpod.Events.Tup: other_state
                     for other_state, event in state_transitions}
-            self.add_state(
+            if self._hardware_timing and state is State.ENTER_LANE:
+                state_change_conditions = {
+                    event: PeekState.PEEK_PUSH.name
+                    if other_state == EXIT_STATE_NAME else other_state
+                    for event, other_state in state_change_conditions.items()}
+            self._add_state(
                 state.name,
                 state_timer=state_timer or AIRTRACK_STATE_TIMER,
-                callback=state.callback,
+                callback=self._callbacks.get(state),
                 state_change_conditions=state_change_conditions)
+        if self._hardware_timing:
+            self._add_peek_states()
+
+    @handle_error
+    def prepare_trial(self):
+        """Prepare the (already sent) state machine for another trial."""
+        # pybpod only initializes the runner state of a state machine when
+        # it is built, and leaves it at the exit state (NaN) after a run
+        self.current_state = 0
+        self.is_running = False
+        self._actuator.reset_peek()
+        self._entered_state = None
+        self._recorded_inside_lane = None
+
+    @handle_error
+    def discard(self):
+        """Discard the state machine (e.g. once replaced by another one).
+
+        Unlike `clean_up`, this cancels the scheduled actuator actions
+        without moving the actuator.
+        """
+        self._actuator.close()
 
     @handle_error
     def clean_up(self):
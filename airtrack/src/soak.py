@@ -0,0 +1,209 @@
+"""Airtrack soak test module.
+
+This module provides a long-run soak test (run_soak) of the Airtrack system:
+it runs trials for a given time or number of trials, against the Bpod
+emulator (in real time) or the simulated Bpod (on a virtual clock), with a
+simulated subject, and samples the process memory at intervals:
+
+- the resident set size (RSS) of the process
+- the memory traced by tracemalloc, and a tracemalloc snapshot
+
+The report lists the RSS growth rate and the allocation sites that grew the
+most between the first and the last sample, to spot slow leaks before they
+cost an unattended session.
+
+Example:
+
+    from airtrack.src import soak
+
+    report = soak.run_soak('simulated', duration=3600)
+    print(soak.format_report(report))
+"""
+import collections
+import itertools
+import linecache
+import time
+import tracemalloc
+
+import numpy as np
+
+from airtrack.settings import AIRTRACK_SOAK_SAMPLE_INTERVAL
+
+from airtrack.src import utils
+
+from airtrack.src.base import Airtrack
+from airtrack.src.clock import AirtrackClock
+from airtrack.src.definitions import AirtrackBenchmarkMode
+from airtrack.src.simulation import AirtrackSimulation
+from airtrack.src.simulation.subject import SimulatedSubject
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = utils.create_logger(__name__)
+
+PROC_STATM_FILE = '/proc/self/statm'
+
+Sample = collections.namedtuple(
+    'Sample', ['elapsed_time', 'trials', 'rss_kb', 'traced_kb'])
+
+
+def rss_kb():
+    """Return the current resident set size (KB) of the process.
+
+    Falls back to the peak resident set size where /proc is not available.
+
+    :rtype: ``int``
+    """
+    try:
+        with open(PROC_STATM_FILE) as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * resource.getpagesize() // 1024
+    except (OSError, AttributeError):
+        if resource is None:
+            return None
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def create_airtrack(mode, seed=None):
+    """Create the Airtrack system to soak.
+
+    :keyword  mode:  The mode to run the system in
+    :type     mode:  :class:``AirtrackBenchmarkMode`` or ``str``
+    :keyword  seed (optional):  Random seed of the simulated subject
+    :type     seed (optional):  ``int``
+
+    :rtype: :class:``airtrack.src.Airtrack``
+    """
+    mode = AirtrackBenchmarkMode(mode)
+    if mode is AirtrackBenchmarkMode.SIMULATED:
+        return AirtrackSimulation(seed=seed)
+    clock = AirtrackClock()
+    return Airtrack(subject=SimulatedSubject(clock, seed=seed), clock=clock)
+
+
+def _growth_rate(samples):
+    # KB per hour, fit over all samples
+    times = [s.elapsed_time for s in samples]
+    rss = [s.rss_kb for s in samples]
+    if len(samples) < 2 or None in rss or times[-1] <= times[0]:
+        return None
+    slope, _ = np.polyfit(times, rss, 1)
+    return float(slope * 3600)
+
+
+def _top_growth(first, last, top):
+    growth = []
+    for stat in last.compare_to(first, 'lineno')[:top]:
+        frame = stat.traceback[0]
+        growth.append({
+            'site': f'{frame.filename}:{frame.lineno}',
+            'code': linecache.getline(frame.filename, frame.lineno).strip(),
+            'size_diff_kb': stat.size_diff / 1024,
+            'count_diff': stat.count_diff,
+        })
+    return growth
+
+
+def run_soak(mode, duration=None, trials=None,
+             sample_interval=AIRTRACK_SOAK_SAMPLE_INTERVAL, top=10,
+             seed=None):
+    """Soak test the Airtrack system.
+
+    Runs until `duration` has passed or `trials` trials have run, whichever
+    comes first (or forever if neither is given).
+
+    :keyword  mode:  The mode to run the system in
+    :type     mode:  :class:``AirtrackBenchmarkMode`` or ``str``
+    :keyword  duration (optional):  Wall time (sec) to run for
+    :type     duration (optional):  ``float``
+    :keyword  trials (optional):  Number of trials to run
+    :type     trials (optional):  ``int``
+    :keyword  sample_interval:  Wall time (sec) between memory samples
+    :type     sample_interval:  ``float``
+    :keyword  top:  Number of top growing allocation sites to report
+    :type     top:  ``int``
+    :keyword  seed (optional):  Random seed of the simulated subject
+    :type     seed (optional):  ``int``
+
+    :return: The soak report
+    :rtype: ``dict``
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    airtrack = create_airtrack(mode, seed=seed)
+    samples = []
+    start_time = time.monotonic()
+    next_sample_time = start_time
+    trial = 0
+    first_snapshot = last_snapshot = None
+
+    def sample():
+        nonlocal last_snapshot
+        last_snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, __file__)])
+        traced, _ = tracemalloc.get_traced_memory()
+        samples.append(Sample(
+            time.monotonic() - start_time, trial, rss_kb(), traced // 1024))
+        logger.info('Soak sample: %s', samples[-1])
+
+    try:
+        for trial in itertools.count(1):
+            airtrack.run(trials=1)
+            now = time.monotonic()
+            if trial == 1:
+                # Measure growth from the first trial on, not from startup
+                sample()
+                first_snapshot = last_snapshot
+                next_sample_time = now + sample_interval
+            elif now >= next_sample_time:
+                sample()
+                next_sample_time += sample_interval
+            if trials is not None and trial >= trials or \
+                    duration is not None and now - start_time >= duration:
+                break
+        if samples[-1].trials != trial:
+            sample()
+    finally:
+        airtrack.close()
+        if not tracing:
+            tracemalloc.stop()
+    return {
+        'mode': AirtrackBenchmarkMode(mode).value,
+        'trials': trial,
+        'elapsed_time': samples[-1].elapsed_time,
+        'rss_growth_kb_per_hour': _growth_rate(samples),
+        'samples': [s._asdict() for s in samples],
+        'top_growth': _top_growth(first_snapshot, last_snapshot, top),
+    }
+
+
+def format_report(report):
+    """Return a soak report as text.
+
+    :keyword  report:  A report returned by `run_soak`
+    :type     report:  ``dict``
+
+    :rtype: ``str``
+    """
+    first, last = report['samples'][0], report['samples'][-1]
+    growth_rate = report['rss_growth_kb_per_hour']
+    lines = [
+        f'{report["trials"]} trials in {report["elapsed_time"]:.0f} sec '
+        f'({report["mode"]})',
+        f'RSS: {first["rss_kb"]} KB -> {last["rss_kb"]} KB'
+        + (f' ({growth_rate:+.1f} KB/hour)'
+           if growth_rate is not None else ''),
+        f'Traced: {first["traced_kb"]} KB -> {last["traced_kb"]} KB',
+        'Top growing allocation sites:',
+    ]
+    for site in report['top_growth']:
+        lines.append(
+            f'  {site["size_diff_kb"]:+10.1f} KB {site["count_diff"]:+8d} '
+            f'{site["site"]}  {site["code"]}')
+    return '\n'.join(lines)
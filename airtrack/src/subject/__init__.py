@@ -1 +1,3 @@
 from airtrack.src.subject.base import AirtrackSubject
+from airtrack.src.subject.base import SubjectLocation
+from airtrack.src.subject.base import LaneChange
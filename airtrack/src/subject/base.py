@@ -3,16 +3,55 @@
 This module provides an interface (AirtrackSubject) for querying subject
 (e.g. mouse) information of the Airtrack system.
 
+With lanes (AIRTRACK_LANES), the subject is located by the position of its
+block on a lane map, which tells the lane it is in (if any) and its distance
+to the lane boundary. Without lanes, the subject is inside the lane whenever
+its marker is hidden. Either way, a marker hidden for less than
+AIRTRACK_SUBJECT_OCCLUSION_GRACE seconds (e.g. briefly occluded) leaves the
+subject where it was last seen.
+
+The lane status is then debounced (see airtrack/src/subject/debounce.py)
+over the camera frames, with a hysteresis band of
+AIRTRACK_SUBJECT_LANE_HYSTERESIS pixels around the lane boundaries.
+
+The subject block positions also feed a subject tracker (a Kalman filter),
+from which, with lanes, lane entries and exits are predicted ahead of time.
+
 Example:
 
     subject = AirtrackSubject()
     if subject.is_inside_lane():
         print('Gotcha!')
+
+    # Or, locate the subject on a lane map
+    # subject = AirtrackSubject(lanes={
+    #     'left': [(0, 0), (150, 0), (150, 207), (0, 207)],
+    #     'right': [(166, 0), (315, 0), (315, 207), (166, 207)],
+    # })
+    # print(subject.locate().lane)
+    # print(subject.predict_lane_entry(horizon=0.1))
+
+    print(subject.suppressed_transitions)
+
     subject.clean_up()
 """
+import collections
 import logging
 
+import numpy as np
+
+from airtrack.settings import AIRTRACK_CAMERA_ADAPTIVE_POLLING
+from airtrack.settings import AIRTRACK_LANES
+from airtrack.settings import AIRTRACK_SUBJECT_LANE_HYSTERESIS
+from airtrack.settings import AIRTRACK_SUBJECT_OCCLUSION_GRACE
+
 from airtrack.src.camera.base import AirtrackCamera
+from airtrack.src.camera.polling import AdaptivePollInterval
+from airtrack.src.clock import AirtrackClock
+from airtrack.src.subject.debounce import LaneDebouncer
+from airtrack.src.subject.lanes import LaneMap
+from airtrack.src.subject.lanes import NO_LANE
+from airtrack.src.subject.tracker import SubjectTracker
 
 from airtrack.src.errors import on_error_raise
 from airtrack.src.errors import AirtrackCameraError
@@ -26,23 +65,209 @@ handle_camera_error = on_error_raise(
     logger,
     catch_error=AirtrackCameraError)
 
+# `lane` is the lane the subject is in (``None`` if none), `distance` its
+# signed distance (pixels) to the nearest lane boundary and `x`, `y` its
+# position (``None`` where unknown). `visible` is ``False`` while the
+# subject marker is hidden.
+SubjectLocation = collections.namedtuple(
+    'SubjectLocation', ['lane', 'distance', 'x', 'y', 'visible'])
+
+# The subject is predicted to move from `from_lane` into `lane` (``None``:
+# out of every lane) in `time` sec
+LaneChange = collections.namedtuple(
+    'LaneChange', ['time', 'from_lane', 'lane'])
+
 
 class AirtrackSubject:
     """Airtrack subject information interface."""
+    # The lane of a subject located without lanes
+    DEFAULT_LANE = 'lane'
+    # Number of predicted positions lane changes are looked for at
+    PREDICTION_STEPS = 50
+
+    def __init__(self, camera=None, lanes=AIRTRACK_LANES,
+                 occlusion_grace=AIRTRACK_SUBJECT_OCCLUSION_GRACE,
+                 debouncer=None,
+                 hysteresis=AIRTRACK_SUBJECT_LANE_HYSTERESIS,
+                 adaptive_polling=AIRTRACK_CAMERA_ADAPTIVE_POLLING,
+                 clock=None):
+        """
+        :keyword  camera (optional):  The camera to find the subject with
+        :type     camera (optional):  :class:``AirtrackCamera``
+        :keyword  lanes (optional):  Lane polygons in camera coordinates
+            (see :class:``airtrack.src.subject.lanes.LaneMap``)
+        :type     lanes (optional):  ``dict``
+        :keyword  occlusion_grace:  Time (sec) the subject marker may be
+            hidden for before the subject stops being located where it was
+            last seen
+        :type     occlusion_grace:  ``float``
+        :keyword  debouncer (optional):  The filter of the lane status
+        :type     debouncer (optional):
+            :class:``airtrack.src.subject.debounce.LaneDebouncer``
+        :keyword  hysteresis:  Distance (pixels) past a lane boundary the
+            subject must be to switch its lane status (with lanes)
+        :type     hysteresis:  ``float``
+        :keyword  adaptive_polling:  With lanes, poll continuously acquired
+            frames at a rate adapting to the subject proximity to lane
+            boundaries
+        :type     adaptive_polling:  ``bool``
+        :keyword  clock (optional):  The clock occlusions and predictions
+            are timed with
+        :type     clock (optional):  :class:``AirtrackClock``
+        """
+        self._camera = camera or AirtrackCamera()
+        self._lane_map = LaneMap(lanes) if lanes else None
+        if self._lane_map is not None and adaptive_polling:
+            self._camera.set_poll_interval_policy(
+                AdaptivePollInterval(self._lane_map))
+        self._occlusion_grace = occlusion_grace
+        self._debouncer = debouncer or LaneDebouncer()
+        self._hysteresis = hysteresis
+        self._clock = clock or AirtrackClock()
+        self._tracker = SubjectTracker()
+        self._location = None
+        self._last_seen_location = None
+        self._last_seen_time = None
+        self._last_frame_time = None
+
+    @property
+    def camera(self):
+        """The camera the subject is found with."""
+        return self._camera
+
+    @property
+    def lane_map(self):
+        """The lane map the subject is located on (``None`` without
+        lanes)."""
+        return self._lane_map
+
+    @property
+    def tracker(self):
+        """The tracker of the subject block positions."""
+        return self._tracker
+
+    @property
+    def suppressed_transitions(self):
+        """Number of lane status transitions the debounce filter
+        suppressed."""
+        return self._debouncer.suppressed
 
-    def __init__(self):
-        self._camera = AirtrackCamera()
+    def _seen_location(self, block):
+        x, y = int(block['x']), int(block['y'])
+        if self._lane_map is None:
+            # A visible marker is outside the lane
+            return SubjectLocation(None, None, x, y, True)
+        lane, distance = self._lane_map.locate(x, y)
+        return SubjectLocation(lane, distance, x, y, True)
+
+    def _hidden_location(self):
+        if self._lane_map is None:
+            return SubjectLocation(self.DEFAULT_LANE, None, None, None, False)
+        return SubjectLocation(None, None, None, None, False)
+
+    def _locate_frame(self, now, block):
+        if block is not None:
+            self._last_seen_location = self._seen_location(block)
+            self._last_seen_time = now
+            self._tracker.update(
+                now, self._last_seen_location.x, self._last_seen_location.y)
+            return self._last_seen_location
+        if self._last_seen_time is not None and \
+                now - self._last_seen_time < self._occlusion_grace:
+            return self._last_seen_location._replace(visible=False)
+        return self._hidden_location()
+
+    def _reads_inside(self, location):
+        if location.distance is None or self._debouncer.inside is None:
+            return location.lane is not None
+        # Hysteresis: cross the boundary by a margin to switch
+        if self._debouncer.inside:
+            return location.distance > -self._hysteresis
+        return location.distance > self._hysteresis
 
     @handle_camera_error
+    def locate(self):
+        """Locate the subject, in every camera frame since the last call.
+
+        :return: The location of the subject in the latest frame (the last
+            one located, if no frame was acquired since)
+        :rtype: :class:``SubjectLocation``
+        """
+        frames = self._camera.find_subject_blocks(
+            since=self._last_frame_time)
+        for timestamp, block in frames:
+            # Frames are timed on the monotonic clock, unlike virtual time
+            now = timestamp if self._clock.realtime else self._clock.time()
+            self._location = self._locate_frame(now, block)
+            self._debouncer.update(self._reads_inside(self._location), now)
+            self._last_frame_time = timestamp
+        return self._location
+
+    def _predict_lane_change(self, horizon):
+        if self._lane_map is None:
+            return None
+        times = np.linspace(0, horizon, self.PREDICTION_STEPS + 1)
+        trajectory = self._tracker.trajectory(self._clock.time(), times)
+        if trajectory is None:
+            return None
+        lanes, _ = self._lane_map.locate_array(*trajectory)
+        changes = np.flatnonzero(lanes != lanes[0])
+        if not len(changes):
+            return None
+        from_lane, lane = (self._lane_map.names[i] if i != NO_LANE else None
+                           for i in (lanes[0], lanes[changes[0]]))
+        return LaneChange(float(times[changes[0]]), from_lane, lane)
+
+    def predict_lane_entry(self, horizon):
+        """Predict, from the tracked subject positions, whether the subject
+        (now outside every lane) enters a lane within `horizon` sec.
+
+        Predictions need lanes, and are updated on every `locate`.
+
+        :keyword  horizon:  Time (sec) to predict ahead
+        :type     horizon:  ``float``
+
+        :return: When and into which lane the subject is predicted to move,
+            or ``None``
+        :rtype: :class:``LaneChange``
+        """
+        change = self._predict_lane_change(horizon)
+        if change is None or change.from_lane is not None or \
+                change.lane is None:
+            return None
+        return change
+
+    def predict_lane_exit(self, horizon):
+        """Predict, from the tracked subject positions, whether the subject
+        (now in a lane) exits every lane within `horizon` sec.
+
+        :keyword  horizon:  Time (sec) to predict ahead
+        :type     horizon:  ``float``
+
+        :return: When the subject is predicted to exit, or ``None``
+        :rtype: :class:``LaneChange``
+        """
+        change = self._predict_lane_change(horizon)
+        if change is None or change.from_lane is None or \
+                change.lane is not None:
+            return None
+        return change
+
     def is_inside_lane(self):
         """Query subject for being inside or outside the airtable lane.
 
-        :return: ``True`` if the subject is inside the lane,
-            otherwise ``False``
+        The lane status is debounced over the camera frames.
+
+        :return: ``True`` if the subject is inside the lane (any lane, with
+            lanes), otherwise ``False``
         :rtype: ``bool``
         """
-        return not self._camera.find_subject()
+        self.locate()
+        return self._debouncer.inside
 
     def clean_up(self):
         """Clean up the object."""
+        logger.info('Suppressed %d of %d lane status transitions',
+                    self._debouncer.suppressed,
+                    self._debouncer.suppressed + self._debouncer.transitions)
         self._camera.close()
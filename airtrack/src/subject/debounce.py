@@ -0,0 +1,119 @@
+"""Airtrack subject debounce module.
+
+This module provides a debounce filter (LaneDebouncer) for inside/outside
+lane readings, so that a single missed camera detection does not flip the
+subject lane status (and reverse the actuator):
+
+- the filtered status only switches once `votes` of the last `window`
+  readings (kept in a fixed-size ring buffer) disagree with it. `votes`
+  must be a majority of `window`, so that the readings that switched the
+  status do not switch it right back.
+- and only after it held for at least `min_dwell` sec
+
+Readings that disagreed with the filtered status, and then came back to it
+without switching it, are counted as suppressed transitions.
+
+Example:
+
+    from airtrack.src.subject.debounce import LaneDebouncer
+
+    debouncer = LaneDebouncer(votes=2, window=3)
+    for time, inside in enumerate([False, True, False, True, True]):
+        print(debouncer.update(inside, time))  # F F F T T
+    print(debouncer.suppressed)  # 1
+"""
+import numpy as np
+
+from airtrack.settings import AIRTRACK_SUBJECT_DEBOUNCE_MIN_DWELL
+from airtrack.settings import AIRTRACK_SUBJECT_DEBOUNCE_VOTES
+from airtrack.settings import AIRTRACK_SUBJECT_DEBOUNCE_WINDOW
+
+from airtrack.src import utils
+
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackSubjectError
+
+logger = utils.create_logger(__name__)
+
+
+class LaneDebouncer:
+    """N-of-M, minimum dwell time debounce filter of lane readings."""
+    INVALID_VOTES_ERROR_MSG = \
+        'Debounce votes must be a majority of the window size ({}).'
+
+    def __init__(self, votes=AIRTRACK_SUBJECT_DEBOUNCE_VOTES,
+                 window=AIRTRACK_SUBJECT_DEBOUNCE_WINDOW,
+                 min_dwell=AIRTRACK_SUBJECT_DEBOUNCE_MIN_DWELL):
+        """
+        :keyword  votes:   Readings (of the last `window`, more than half
+            of them) that must disagree with the filtered status to switch
+            it
+        :type     votes:   ``int``
+        :keyword  window:  Number of most recent readings kept
+        :type     window:  ``int``
+        :keyword  min_dwell:  Time (sec) the filtered status holds for at
+            least, once switched
+        :type     min_dwell:  ``float``
+        """
+        if not window // 2 < votes <= window:
+            err(AirtrackSubjectError, logger,
+                message=self.INVALID_VOTES_ERROR_MSG.format(window))
+        self._votes = votes
+        self._min_dwell = min_dwell
+        self._readings = np.zeros(window, dtype=bool)
+        self.reset()
+
+    def reset(self):
+        """Forget the readings and the filtered status."""
+        self._readings[:] = False
+        self._index = 0
+        self._size = 0
+        self._inside_readings = 0
+        self._switch_time = None
+        self._pending = False
+        self.inside = None
+        self.transitions = 0
+        self.suppressed = 0
+
+    def _push(self, inside):
+        if self._size == len(self._readings):
+            self._inside_readings -= int(self._readings[self._index])
+        else:
+            self._size += 1
+        self._readings[self._index] = inside
+        self._inside_readings += int(inside)
+        self._index = (self._index + 1) % len(self._readings)
+
+    def update(self, inside, time):
+        """Filter a reading.
+
+        :keyword  inside:  ``True`` if the subject was read inside the lane
+        :type     inside:  ``bool``
+        :keyword  time:    The time (sec) of the reading
+        :type     time:    ``float``
+
+        :return: The filtered status: ``True`` if the subject is inside the
+            lane, otherwise ``False``
+        :rtype: ``bool``
+        """
+        inside = bool(inside)
+        self._push(inside)
+        if self.inside is None:
+            # The first reading is taken as is
+            self.inside = inside
+            self._switch_time = time
+            return inside
+        disagreeing = self._size - self._inside_readings if self.inside \
+            else self._inside_readings
+        if inside != self.inside:
+            self._pending = True
+        if disagreeing >= self._votes and \
+                time - self._switch_time >= self._min_dwell:
+            self.inside = not self.inside
+            self._switch_time = time
+            self._pending = False
+            self.transitions += 1
+        elif self._pending and inside == self.inside:
+            self._pending = False
+            self.suppressed += 1
+        return self.inside
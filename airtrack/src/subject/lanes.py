@@ -0,0 +1,142 @@
+"""Airtrack lanes module.
+
+This module provides a lane map (LaneMap): the lanes of the Air-Track
+platform, as polygons in camera (Pixy2 block) coordinates, compiled into
+lookup grids with a cell per camera pixel, holding
+
+- the lane the pixel lies in (if any)
+- the signed distance (pixels) from the pixel to the nearest lane boundary:
+  positive inside a lane, negative outside every lane
+
+so that locating a block centroid is a single grid lookup, however many
+lanes (and polygon vertices) there are.
+
+Example:
+
+    from airtrack.src.subject.lanes import LaneMap
+
+    lane_map = LaneMap({
+        'left': [(0, 0), (150, 0), (150, 207), (0, 207)],
+        'right': [(166, 0), (315, 0), (315, 207), (166, 207)],
+    })
+    lane, distance = lane_map.locate(40, 100)
+    print(lane, distance)  # left 40.0
+"""
+import numpy as np
+
+from airtrack.src import utils
+
+from airtrack.src.errors import err
+from airtrack.src.errors import AirtrackLaneError
+
+logger = utils.create_logger(__name__)
+
+# Pixy2 color connected components frame size
+FRAME_WIDTH = 316
+FRAME_HEIGHT = 208
+
+NO_LANE = -1
+
+
+def _inside(xs, ys, polygon):
+    # Even-odd rule: count the polygon edges a ray to the right crosses
+    inside = np.zeros(xs.shape, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for (x1, y1), (x2, y2) in zip(polygon, np.roll(polygon, -1, 0)):
+            crosses = (y1 > ys) != (y2 > ys)
+            crossing_xs = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+            inside ^= crosses & (xs < crossing_xs)
+    return inside
+
+
+def _boundary_distance(xs, ys, polygon):
+    # Distance to the nearest polygon edge
+    distance = np.full(xs.shape, np.inf)
+    for p, q in zip(polygon, np.roll(polygon, -1, 0)):
+        dx, dy = q - p
+        length2 = dx * dx + dy * dy
+        t = 0 if not length2 else np.clip(
+            ((xs - p[0]) * dx + (ys - p[1]) * dy) / length2, 0, 1)
+        np.minimum(distance,
+                   np.hypot(xs - p[0] - t * dx, ys - p[1] - t * dy),
+                   out=distance)
+    return distance
+
+
+class LaneMap:
+    """Lane lookup grids of the Air-Track platform."""
+    INVALID_LANE_ERROR_MSG = \
+        'Lane {!r} is not a polygon of at least 3 (x, y) vertices.'
+
+    def __init__(self, lanes, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+        """
+        :keyword  lanes:   Lane name -> polygon vertices, in camera
+            coordinates. Where lanes overlap, the first one wins.
+        :type     lanes:   ``dict`` of ``str`` -> ``list`` of (x, y)
+        :keyword  width:   Camera frame width (pixels)
+        :type     width:   ``int``
+        :keyword  height:  Camera frame height (pixels)
+        :type     height:  ``int``
+        """
+        self.names = list(lanes)
+        self.width = width
+        self.height = height
+        ys, xs = np.mgrid[0:height, 0:width].astype(np.float64)
+        self._lanes = np.full((height, width), NO_LANE, dtype=np.int16)
+        inside_distance = np.zeros((height, width))
+        outside_distance = np.full((height, width), np.inf)
+        for index, (name, vertices) in enumerate(lanes.items()):
+            polygon = self._polygon(name, vertices)
+            inside = _inside(xs, ys, polygon)
+            distance = _boundary_distance(xs, ys, polygon)
+            claimed = inside & (self._lanes == NO_LANE)
+            self._lanes[claimed] = index
+            inside_distance[claimed] = distance[claimed]
+            np.minimum(outside_distance, distance, out=outside_distance)
+        self._distances = np.where(
+            self._lanes != NO_LANE, inside_distance,
+            -outside_distance).astype(np.float32)
+        logger.debug('Compiled lane map of lanes: %s', self.names)
+
+    def _polygon(self, name, vertices):
+        try:
+            polygon = np.asarray(vertices, dtype=np.float64)
+        except (TypeError, ValueError):
+            polygon = None
+        if polygon is None or polygon.ndim != 2 or \
+                polygon.shape[1] != 2 or len(polygon) < 3:
+            err(AirtrackLaneError, logger,
+                message=self.INVALID_LANE_ERROR_MSG.format(name))
+        return polygon
+
+    def locate(self, x, y):
+        """Locate a point (e.g. a block centroid) on the lane map.
+
+        Points outside the camera frame are clipped to its border.
+
+        :keyword  x:  The point x coordinate (pixels)
+        :type     x:  ``int``
+        :keyword  y:  The point y coordinate (pixels)
+        :type     y:  ``int``
+
+        :return: The lane the point lies in (``None`` if none) and its
+            signed distance to the nearest lane boundary
+        :rtype: ``tuple`` of (``str``, ``float``)
+        """
+        x = min(max(int(x), 0), self.width - 1)
+        y = min(max(int(y), 0), self.height - 1)
+        index = self._lanes[y, x]
+        lane = self.names[index] if index != NO_LANE else None
+        return lane, float(self._distances[y, x])
+
+    def locate_array(self, xs, ys):
+        """Locate many points at once (see `locate`).
+
+        :return: The index (in `names`) of the lane every point lies in
+            (`NO_LANE` if none), and its signed distance to the nearest lane
+            boundary
+        :rtype: ``tuple`` of (``numpy.ndarray``, ``numpy.ndarray``)
+        """
+        xs = np.clip(np.asarray(xs), 0, self.width - 1).astype(np.intp)
+        ys = np.clip(np.asarray(ys), 0, self.height - 1).astype(np.intp)
+        return self._lanes[ys, xs], self._distances[ys, xs]
@@ -0,0 +1,136 @@
+"""Airtrack subject tracker module.
+
+This module provides a subject tracker (SubjectTracker): a constant-velocity
+Kalman filter over the subject block positions, estimating the position and
+velocity of the subject marker, so that its position can be predicted ahead
+of time (e.g. to tell when it will enter a lane).
+
+The acceleration of the subject is modelled as white noise, of standard
+deviation AIRTRACK_SUBJECT_TRACKER_ACCELERATION, and block positions are
+taken to be off by AIRTRACK_SUBJECT_TRACKER_MEASUREMENT_NOISE pixels.
+
+Example:
+
+    from airtrack.src.subject.tracker import SubjectTracker
+
+    tracker = SubjectTracker()
+    tracker.update(0.00, 100, 50)
+    tracker.update(0.02, 104, 50)
+    print(tracker.predict(0.1))  # about (120, 50)
+"""
+import numpy as np
+
+from airtrack.settings import AIRTRACK_SUBJECT_TRACKER_ACCELERATION
+from airtrack.settings import AIRTRACK_SUBJECT_TRACKER_MEASUREMENT_NOISE
+
+# Measurement (position) of a [x, y, vx, vy] state
+H = np.array([[1., 0., 0., 0.],
+              [0., 1., 0., 0.]])
+
+
+class SubjectTracker:
+    """Constant-velocity Kalman filter of the subject marker position."""
+    # Velocity (pixels/sec) standard deviation before the first update
+    INITIAL_VELOCITY_STD = 1000
+    # Time (sec) without updates after which the estimate is dropped
+    MAX_GAP = 1
+
+    def __init__(self, acceleration=AIRTRACK_SUBJECT_TRACKER_ACCELERATION,
+                 measurement_noise=AIRTRACK_SUBJECT_TRACKER_MEASUREMENT_NOISE):
+        """
+        :keyword  acceleration:  Standard deviation (pixels/sec^2) of the
+            subject acceleration
+        :type     acceleration:  ``float``
+        :keyword  measurement_noise:  Standard deviation (pixels) of the
+            block positions
+        :type     measurement_noise:  ``float``
+        """
+        self._q = acceleration ** 2
+        self._r = np.eye(2) * measurement_noise ** 2
+        self.reset()
+
+    def reset(self):
+        """Drop the estimate."""
+        self._state = None
+        self._covariance = None
+        self.time = None
+        self.updates = 0
+
+    def _transition(self, dt):
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+        Q = np.zeros((4, 4))
+        Q[0, 0] = Q[1, 1] = dt ** 3 / 3
+        Q[0, 2] = Q[2, 0] = Q[1, 3] = Q[3, 1] = dt ** 2 / 2
+        Q[2, 2] = Q[3, 3] = dt
+        return F, Q * self._q
+
+    @property
+    def tracking(self):
+        """``True`` once the position and velocity are estimated (i.e.
+        after two updates)."""
+        return self.updates >= 2
+
+    @property
+    def velocity(self):
+        """The estimated velocity (pixels/sec), or ``None``.
+
+        :rtype: ``tuple`` of (``float``, ``float``)
+        """
+        if not self.tracking:
+            return None
+        return float(self._state[2]), float(self._state[3])
+
+    def update(self, time, x, y):
+        """Update the estimate with a block position.
+
+        :keyword  time:  The time (sec) the position was measured at
+        :type     time:  ``float``
+        :keyword  x:     The measured x coordinate (pixels)
+        :type     x:     ``float``
+        :keyword  y:     The measured y coordinate (pixels)
+        :type     y:     ``float``
+        """
+        z = np.array([x, y], dtype=np.float64)
+        if self._state is None or time - self.time > self.MAX_GAP:
+            self.reset()
+            self._state = np.array([x, y, 0., 0.])
+            self._covariance = np.diag([
+                self._r[0, 0], self._r[1, 1],
+                self.INITIAL_VELOCITY_STD ** 2,
+                self.INITIAL_VELOCITY_STD ** 2])
+        else:
+            F, Q = self._transition(max(time - self.time, 0))
+            state = F @ self._state
+            covariance = F @ self._covariance @ F.T + Q
+            S = H @ covariance @ H.T + self._r
+            K = covariance @ H.T @ np.linalg.inv(S)
+            self._state = state + K @ (z - H @ state)
+            self._covariance = (np.eye(4) - K @ H) @ covariance
+        self.time = time
+        self.updates += 1
+
+    def predict(self, time):
+        """Predict the position at `time` (without updating the estimate).
+
+        :return: The predicted position, or ``None`` if the subject is not
+            tracked (anymore)
+        :rtype: ``tuple`` of (``float``, ``float``)
+        """
+        if not self.tracking or time - self.time > self.MAX_GAP:
+            return None
+        dt = time - self.time
+        return (float(self._state[0] + self._state[2] * dt),
+                float(self._state[1] + self._state[3] * dt))
+
+    def trajectory(self, time, times):
+        """Predict the positions at `time` + every one of `times`.
+
+        :rtype: ``tuple`` of (``numpy.ndarray``, ``numpy.ndarray``), or
+            ``None`` if the subject is not tracked (anymore)
+        """
+        if not self.tracking or time - self.time > self.MAX_GAP:
+            return None
+        dts = time - self.time + np.asarray(times, dtype=np.float64)
+        return (self._state[0] + self._state[2] * dts,
+                self._state[1] + self._state[3] * dts)
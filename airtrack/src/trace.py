@@ -0,0 +1,224 @@
+"""Airtrack tracing module.
+
+This module provides a low-overhead span tracer (AirtrackTracer) for timing
+the hot paths of a trial (camera queries, state callbacks, event triggers,
+BNC writes). Spans are timed with `time.perf_counter_ns` and kept in a ring
+buffer of the AIRTRACK_TRACE_BUFFER_SIZE most recent spans. They can be
+exported to Chrome trace-event JSON (open it in chrome://tracing or
+https://ui.perfetto.dev) and summarized into per-span latency histograms.
+
+Tracing is enabled with AIRTRACK_TRACE. When disabled, `span` decorators
+return the decorated function itself, so tracing costs nothing.
+
+Example:
+
+    from airtrack.settings import settings
+
+    # Enable tracing before importing the traced modules
+    settings.configure(AIRTRACK_TRACE=True)
+
+    from airtrack.src import trace
+
+    @trace.span('camera.find_subject')
+    def find_subject():
+        ...
+
+    with trace.span('trial'):
+        find_subject()
+
+    trace.tracer().export_chrome_trace('trace.json')
+    print(trace.tracer().format_histograms())
+"""
+import collections
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from airtrack.settings import AIRTRACK_TRACE
+from airtrack.settings import AIRTRACK_TRACE_BUFFER_SIZE
+
+Span = collections.namedtuple(
+    'Span', ['name', 'start_ns', 'end_ns', 'thread_id'])
+
+
+class AirtrackTracer:
+    """Airtrack span tracer."""
+    # Histogram bucket upper bounds (us): 1us, 2us, 4us, ..., ~1s, and more
+    HISTOGRAM_BUCKETS = np.append(2.0 ** np.arange(21), np.inf)
+
+    def __init__(self, buffer_size=AIRTRACK_TRACE_BUFFER_SIZE):
+        """
+        :keyword  buffer_size:  Number of most recent spans kept
+        :type     buffer_size:  ``int``
+        """
+        self._spans = collections.deque(maxlen=buffer_size)
+
+    def record(self, name, start_ns, end_ns):
+        """Record a span.
+
+        :keyword  name:      The span name
+        :type     name:      ``str``
+        :keyword  start_ns:  Span start (`time.perf_counter_ns`)
+        :type     start_ns:  ``int``
+        :keyword  end_ns:    Span end (`time.perf_counter_ns`)
+        :type     end_ns:    ``int``
+        """
+        # deque.append is atomic, so spans may be recorded from any thread
+        self._spans.append(
+            Span(name, start_ns, end_ns, threading.get_ident()))
+
+    def spans(self):
+        """Return the buffered spans, oldest first.
+
+        :rtype: ``list`` of :class:``Span``
+        """
+        return list(self._spans)
+
+    def clear(self):
+        """Drop the buffered spans."""
+        self._spans.clear()
+
+    def durations(self):
+        """Return the span durations (us), per span name.
+
+        :rtype: ``dict`` of ``str`` -> :class:``numpy.ndarray``
+        """
+        durations = collections.defaultdict(list)
+        for s in self.spans():
+            durations[s.name].append(s.end_ns - s.start_ns)
+        return {name: np.array(ns, dtype=float) / 1e3
+                for name, ns in durations.items()}
+
+    def histograms(self):
+        """Summarize the span latencies, per span name.
+
+        :return: Span name -> count, mean, median, 99th percentile and
+            maximum latency (us), and the number of spans per
+            `HISTOGRAM_BUCKETS` bucket (keyed by bucket upper bound)
+        :rtype: ``dict``
+        """
+        histograms = {}
+        for name, us in sorted(self.durations().items()):
+            counts = np.bincount(
+                np.searchsorted(self.HISTOGRAM_BUCKETS, us),
+                minlength=len(self.HISTOGRAM_BUCKETS))
+            histograms[name] = {
+                'count': len(us),
+                'mean_us': float(us.mean()),
+                'p50_us': float(np.percentile(us, 50)),
+                'p99_us': float(np.percentile(us, 99)),
+                'max_us': float(us.max()),
+                'histogram': {
+                    float(bound): int(count)
+                    for bound, count in zip(self.HISTOGRAM_BUCKETS, counts)
+                    if count},
+            }
+        return histograms
+
+    def format_histograms(self):
+        """Return the span latency summaries as a table.
+
+        :rtype: ``str``
+        """
+        lines = [f'{"span":<40} {"count":>8} {"mean":>10} {"p50":>10} '
+                 f'{"p99":>10} {"max":>10}  (us)']
+        for name, h in self.histograms().items():
+            lines.append(
+                f'{name:<40} {h["count"]:>8} {h["mean_us"]:>10.1f} '
+                f'{h["p50_us"]:>10.1f} {h["p99_us"]:>10.1f} '
+                f'{h["max_us"]:>10.1f}')
+        return '\n'.join(lines)
+
+    def export_chrome_trace(self, filename):
+        """Write the buffered spans as Chrome trace-event JSON.
+
+        :keyword  filename:  The trace file
+        :type     filename:  ``str``
+        """
+        pid = os.getpid()
+        events = [{
+            'name': s.name,
+            'ph': 'X',
+            'ts': s.start_ns / 1e3,
+            'dur': (s.end_ns - s.start_ns) / 1e3,
+            'pid': pid,
+            'tid': s.thread_id,
+        } for s in self.spans()]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class _Span:
+    """A span, usable as a decorator or a context manager."""
+
+    def __init__(self, tracer, name):
+        self._tracer = tracer
+        self._name = name
+        self._start_ns = None
+
+    def __call__(self, func):
+        name = self._name
+        record = self._tracer.record
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start_ns = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start_ns, time.perf_counter_ns())
+        return wrapper
+
+    def __enter__(self):
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._tracer.record(
+            self._name, self._start_ns, time.perf_counter_ns())
+
+
+class _NullSpan:
+    """A span that does not trace anything."""
+
+    def __call__(self, func):
+        return func
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_tracer = AirtrackTracer() if AIRTRACK_TRACE else None
+
+
+def enabled():
+    """Return ``True`` if tracing is enabled."""
+    return _tracer is not None
+
+
+def tracer():
+    """Return the Airtrack tracer (``None`` if tracing is disabled).
+
+    :rtype: :class:``AirtrackTracer``
+    """
+    return _tracer
+
+
+def span(name):
+    """Return a span named `name`, to decorate a function or use as a context
+    manager with. Spans do nothing if tracing is disabled.
+
+    :keyword  name:  The span name
+    :type     name:  ``str``
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name)
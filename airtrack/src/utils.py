@@ -1,19 +1,27 @@
 import logging
+import threading
+import weakref
 
-from airtrack.settings import AIRTRACK_DEBUG_PREFIX
+from airtrack.src import log
+
+# Bpod -> lock serializing the commands written to its serial port
+_bpod_locks = weakref.WeakKeyDictionary()
+_bpod_locks_lock = threading.Lock()
 
 
 def create_logger(name):
     logger = logging.getLogger(name)
-    # Create console handler and set level to debug
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.DEBUG)
-    # Create formatter
-    formatter = logging.Formatter(
-        f'%(levelname)s:%(name)s:{AIRTRACK_DEBUG_PREFIX}%(message)s')
-    # Add formatter to ch
-    ch.setFormatter(formatter)
-    # Add ch to logger
-    logger.addHandler(ch)
+    # Hand records over to the (non-blocking) Airtrack logging pipeline
+    logger.addHandler(log.pipeline().handler)
     logger.propagate = False
     return logger
+
+
+def bpod_lock(bpod):
+    """Return the lock to hold while writing a command to `bpod`.
+
+    Commands are written from several threads (e.g. state callbacks and the
+    actuator scheduler), and interleaved serial writes corrupt them.
+    """
+    with _bpod_locks_lock:
+        return _bpod_locks.setdefault(bpod, threading.Lock())
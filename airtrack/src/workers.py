@@ -0,0 +1,38 @@
+"""Airtrack worker process module.
+
+This module provides the entry points of the processes Airtrack spawns (rig
+workers and camera servers). Spawned processes import the module of their
+entry point before running it, and airtrack modules read settings when they
+are imported: this module therefore imports nothing from airtrack until the
+settings of the process are configured.
+
+Example:
+
+    import multiprocessing
+    from airtrack.src import workers
+
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(
+        target=workers.run_rig,
+        args=('rig1', {'AIRTRACK_BPOD_SERIAL_PORT': '/dev/ttyACM0'}, False,
+              10, 1, context.Queue()))
+    process.start()
+"""
+
+
+def run_rig(name, overrides, *args):
+    """Run a rig (see :func:``airtrack.src.rigs.run_rig``), configured with
+    the setting overrides `overrides`."""
+    from airtrack.settings import settings
+    settings.configure(**overrides)
+    from airtrack.src.rigs import run_rig
+    run_rig(name, *args)
+
+
+def serve_camera(camera_settings, *args):
+    """Run a camera server (see :func:``airtrack.src.camera.server.serve``),
+    configured with the camera settings `camera_settings`."""
+    from airtrack.settings import settings
+    settings.configure(**camera_settings)
+    from airtrack.src.camera.server import serve
+    serve(*args)
@@ -1,10 +1,14 @@
 """User settings (pybpod-api requirement)."""
 from airtrack.settings import AIRTRACK_LOG_LEVEL
-from airtrack.settings import AIRTRACK_SESSION_PATH
 from airtrack.settings import AIRTRACK_SESSIONS_LOG_FILE
 from airtrack.settings import AIRTRACK_SESSION_NAME
 from airtrack.settings import AIRTRACK_BPOD_SERIAL_PORT
 from airtrack.settings import AIRTRACK_STREAM_SESSION_TO_STDOUT
+from airtrack.settings import settings
+
+# pybpod opens its log file (in the session directory) as soon as it is
+# imported, so the directory must exist by then
+AIRTRACK_SESSION_PATH = settings.make_session_path()
 
 PYBPOD_API_LOG_LEVEL = AIRTRACK_LOG_LEVEL
 PYBPOD_API_LOG_FILE = AIRTRACK_SESSIONS_LOG_FILE
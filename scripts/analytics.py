@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Report per-session and per-animal metrics of the recorded sessions (see
+airtrack/src/analytics.py)."""
+import argparse
+import json
+import logging
+import shutil
+
+from airtrack.settings import AIRTRACK_LOG_LEVEL
+from airtrack.settings import AIRTRACK_SESSION_PATH
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('-p', '--path', default=AIRTRACK_SESSION_PATH,
+                    help='Directory holding the session stores.')
+parser.add_argument('-b', '--by', choices=['session', 'animal', 'both'],
+                    default='both', help='Group the metrics by.')
+parser.add_argument('-a', '--animal', action='append',
+                    help='Only report this animal (repeatable).')
+parser.add_argument('--rebuild', action='store_true',
+                    help='Rebuild the index from scratch.')
+parser.add_argument('-o', '--output',
+                    help='Write the metrics (JSON) to this file.')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    logging.basicConfig(level=AIRTRACK_LOG_LEVEL)
+    from airtrack.src.analytics import AirtrackAnalytics
+    from airtrack.src.analytics import format_metrics
+    if args.rebuild:
+        shutil.rmtree(AirtrackAnalytics(args.path).index_path,
+                      ignore_errors=True)
+    analytics = AirtrackAnalytics(args.path)
+    analytics.update()
+    animals = {s['name']: s['animal'] for s in analytics.sessions()}
+    report = {}
+    if args.by in ('session', 'both'):
+        report['sessions'] = {
+            name: metrics
+            for name, metrics in analytics.session_metrics().items()
+            if not args.animal or animals[name] in args.animal}
+    if args.by in ('animal', 'both'):
+        report['animals'] = {
+            name: metrics
+            for name, metrics in analytics.animal_metrics().items()
+            if not args.animal or name in args.animal}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    for key, title in (('sessions', 'session'), ('animals', 'animal')):
+        if key in report:
+            print(format_metrics(report[key], title))
+            print()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Benchmark the Airtrack system end to end (see airtrack/src/benchmark.py).
+
+Exits with status 1 if --compare finds regressions against the baseline.
+"""
+import argparse
+import json
+import sys
+
+from airtrack.settings import settings
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('-m', '--mode', choices=['simulated', 'emulator'],
+                    default='simulated',
+                    help='Simulated Bpod on a virtual clock, or the Bpod '
+                         'emulator in real time.')
+parser.add_argument('-t', '--trials', type=int, default=1000,
+                    help='Number of trials to measure.')
+parser.add_argument('-w', '--warmup-trials', type=int, default=1,
+                    help='Number of trials to run before measuring.')
+parser.add_argument('-o', '--output',
+                    help='Write the results (JSON) to this file.')
+parser.add_argument('-c', '--compare', metavar='BASELINE',
+                    help='Compare the results against these (JSON) results.')
+parser.add_argument('--tolerance', type=float, default=0.1,
+                    help='Relative change a metric may worsen by.')
+parser.add_argument('-s', '--setting', action='append', default=[],
+                    metavar='NAME=VALUE',
+                    help='Override a setting (value parsed as JSON), e.g. '
+                         'AIRTRACK_ACTUATOR_PUSH_TIMEOUT=0.2.')
+
+
+def configure(overrides):
+    values = {}
+    for override in overrides:
+        name, _, value = override.partition('=')
+        try:
+            values[name] = json.loads(value)
+        except ValueError:
+            values[name] = value
+    # Settings are read on import, so configure them first
+    settings.configure(AIRTRACK_TRACE=True, **values)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    configure(args.setting)
+    from airtrack.src import benchmark
+    results = benchmark.run_benchmark(
+        args.mode, args.trials, warmup_trials=args.warmup_trials)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = benchmark.compare(
+            results, baseline, tolerance=args.tolerance)
+        for r in regressions:
+            print(f'REGRESSION {r.metric}: {r.baseline:.6g} -> '
+                  f'{r.value:.6g} ({r.change:+.1%})', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Fail if importing airtrack takes longer than the import time budget."""
+import argparse
+import subprocess
+import sys
+
+from airtrack.settings import AIRTRACK_CLI_IMPORT_TIME_BUDGET
+from airtrack.settings import AIRTRACK_IMPORT_TIME_BUDGET
+
+MODULES = ['airtrack', 'airtrack.settings', 'airtrack.src']
+# What the CLI (scripts/run.py, scripts/rigs.py) imports once the arguments
+# were parsed, i.e. what a rig process restarted between animals pays for
+CLI_MODULES = ['airtrack.src.base', 'airtrack.src.simulation',
+               'airtrack.src.rigs']
+IMPORT_CODE = '''
+import time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+print(time.perf_counter() - start)
+'''
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('-b', '--budget', type=float,
+                    default=AIRTRACK_IMPORT_TIME_BUDGET,
+                    help='Import time budget (sec).')
+parser.add_argument('-c', '--cli-budget', type=float,
+                    default=AIRTRACK_CLI_IMPORT_TIME_BUDGET,
+                    help='Import time budget of the CLI modules (sec).')
+parser.add_argument('-r', '--repeat', type=int, default=5,
+                    help='Number of cold imports to take the best of.')
+
+
+def import_time(modules):
+    # Import in a fresh interpreter, so that nothing is imported already
+    output = subprocess.check_output(
+        [sys.executable, '-c', IMPORT_CODE.format(modules=modules)])
+    return float(output)
+
+
+def check(name, modules, budget, repeat):
+    best = min(import_time(modules) for _ in range(repeat))
+    print(f'import {name}: {best:.3f} sec (budget: {budget:.3f} sec)')
+    return best <= budget
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    ok = check('airtrack', MODULES, args.budget, args.repeat)
+    ok &= check('airtrack (CLI)', CLI_MODULES, args.cli_budget, args.repeat)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+import argparse
+
+from airtrack.data.utils import render_state_diagrams
+
+parser = argparse.ArgumentParser(
+    description='Render the state diagram of the state transition table.')
+parser.add_argument('-f', '--force', action='store_true',
+                    help='Render even if the table did not change.')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    if render_state_diagrams(force=args.force):
+        print('Rendered state diagram.')
+    else:
+        print('State diagram is up to date.')
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Run several Airtrack rigs, one worker process each (see
+airtrack/src/rigs.py).
+
+The configuration file is a JSON object with a list of rigs, e.g.
+
+    {"rigs": [
+        {"name": "rig1", "serial_port": "/dev/ttyACM0", "camera_index": 0},
+        {"name": "rig2", "serial_port": "/dev/ttyACM1", "simulate": true,
+         "session_path": "/data/rig2",
+         "settings": {"AIRTRACK_STATE_TIMER": 0.05}}
+    ]}
+
+Stock pixy2 builds can only open the first camera (camera_index 0). Rigs
+without a session_path keep their sessions in a directory named after them,
+in AIRTRACK_SESSION_PATH.
+"""
+import argparse
+import json
+import logging
+
+from airtrack.settings import AIRTRACK_LOG_LEVEL
+from airtrack.settings import AIRTRACK_RIG_MAX_RESTARTS
+
+parser = argparse.ArgumentParser(
+    description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+parser.add_argument('config', help='Rig configuration (JSON) file.')
+parser.add_argument('-t', '--trials', type=int,
+                    help='Number of trials to run every rig for.')
+parser.add_argument('-r', '--max-restarts', type=int,
+                    default=AIRTRACK_RIG_MAX_RESTARTS,
+                    help='Times a crashed rig is restarted.')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    logging.basicConfig(level=AIRTRACK_LOG_LEVEL)
+    from airtrack.src.definitions import AirtrackRigEventType
+    from airtrack.src.rigs import AirtrackRigManager
+    from airtrack.src.rigs import RigConfig
+    with open(args.config) as f:
+        rigs = [RigConfig.from_dict(rig) for rig in json.load(f)['rigs']]
+    manager = AirtrackRigManager(
+        rigs, trials=args.trials, max_restarts=args.max_restarts)
+    for event in manager.run():
+        subject = 'rig' if isinstance(event.type, AirtrackRigEventType) \
+            else f'trial #{event.trial}'
+        print(f'{event.rig}: {subject} {event.type.value}'
+              + (f' ({event.duration:.3f} sec)' if event.duration else '')
+              + (f' [{event.error}]' if event.error else ''))
@@ -4,19 +4,23 @@ import argparse
 
 from airtrack.settings import AIRTRACK_LOG_LEVEL
 
-from airtrack.src import Airtrack
-
-logging.basicConfig(level=AIRTRACK_LOG_LEVEL)
-
 parser = argparse.ArgumentParser()
 parser.add_argument('-t', '--trials', type=int, help='Number of trials.')
+parser.add_argument('-s', '--simulate', action='store_true',
+                    help='Simulate a subject on a virtual clock.')
 
 
-def run(trials):
+def run(trials, simulate=False):
+    # Import the system only after the arguments were parsed
+    if simulate:
+        from airtrack.src.simulation import AirtrackSimulation as Airtrack
+    else:
+        from airtrack.src import Airtrack
     airtrack = Airtrack()
     airtrack.run(trials=trials)
 
 
 if __name__ == '__main__':
     args = parser.parse_args()
-    run(trials=args.trials)
+    logging.basicConfig(level=AIRTRACK_LOG_LEVEL)
+    run(trials=args.trials, simulate=args.simulate)
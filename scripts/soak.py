@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Soak test the Airtrack system, tracking memory growth (see
+airtrack/src/soak.py)."""
+import argparse
+import json
+import logging
+
+from airtrack.settings import AIRTRACK_LOG_LEVEL
+from airtrack.settings import AIRTRACK_SOAK_SAMPLE_INTERVAL
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('-m', '--mode', choices=['simulated', 'emulator'],
+                    default='emulator',
+                    help='Simulated Bpod on a virtual clock, or the Bpod '
+                         'emulator in real time.')
+parser.add_argument('-H', '--hours', type=float,
+                    help='Number of hours to run for.')
+parser.add_argument('-t', '--trials', type=int,
+                    help='Number of trials to run.')
+parser.add_argument('-i', '--sample-interval', type=float,
+                    default=AIRTRACK_SOAK_SAMPLE_INTERVAL,
+                    help='Time (sec) between memory samples.')
+parser.add_argument('-n', '--top', type=int, default=10,
+                    help='Number of top growing allocation sites to report.')
+parser.add_argument('--seed', type=int, help='Simulated subject seed.')
+parser.add_argument('-o', '--output',
+                    help='Write the report (JSON) to this file.')
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    logging.basicConfig(level=AIRTRACK_LOG_LEVEL)
+    from airtrack.src import soak
+    report = soak.run_soak(
+        args.mode,
+        duration=args.hours * 3600 if args.hours else None,
+        trials=args.trials,
+        sample_interval=args.sample_interval,
+        top=args.top,
+        seed=args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(soak.format_report(report))
@@ -10,6 +10,7 @@ setup(
     name='airtrack',
     version='1.0',
     packages=['airtrack'],
+    install_requires=['numpy'],
     author=['Chris Karageorgiou Kaneen'],
     author_email='ckarageorgkaneen@gmail.com',
     long_description=readme(),
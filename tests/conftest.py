@@ -0,0 +1,14 @@
+"""Airtrack test configuration.
+
+Settings are configured here, before any test imports the rest of airtrack,
+so that tests neither record sessions nor write to the home directory.
+"""
+import tempfile
+
+from airtrack.settings import settings
+
+settings.configure(
+    AIRTRACK_SESSION_PATH=tempfile.mkdtemp(prefix='airtrack-tests-'),
+    AIRTRACK_LOG_SESSION_FILE=False,
+    AIRTRACK_SESSION_RECORD=False,
+)
@@ -0,0 +1,49 @@
+"""Airtrack actuator tests (run against the Bpod emulator, simulated)."""
+from airtrack.settings import AIRTRACK_ACTUATOR_PUSH_TIMEOUT
+from airtrack.settings import AIRTRACK_STATE_TIMER
+
+from airtrack.src.actuator import AirtrackActuator
+from airtrack.src.definitions import AirtrackState as State
+from airtrack.src.simulation import AirtrackSimulation
+
+
+class InsideLaneSubject:
+    """Subject that never leaves the lane."""
+
+    def is_inside_lane(self):
+        return True
+
+    def clean_up(self):
+        pass
+
+
+def test_peek_push_outlasts_state_changes():
+    # The Bpod drives BNC outputs low on every state entry, and a peeking
+    # trial cycles through QUERY_SUBJECT_LOCATION and ENTER_LANE
+    simulation = AirtrackSimulation(
+        subject=InsideLaneSubject(), parallel_bringup=False)
+    bpod = simulation._bpod
+    run_state = bpod._run_state
+    # (start time, BNC1 output at the end) of every ENTER_LANE state
+    enter_lane_outputs = []
+
+    def run_and_sample_state(description):
+        start_time = simulation.elapsed_time
+        next_state = run_state(description)
+        enter_lane = simulation._sma.state_descriptions[State.ENTER_LANE.name]
+        if description is enter_lane:
+            enter_lane_outputs.append((start_time, bpod.outputs.get('BNC1')))
+        return next_state
+
+    bpod._run_state = run_and_sample_state
+    try:
+        simulation.run_trial()
+    finally:
+        simulation.close()
+    push_start_time = enter_lane_outputs[0][0]
+    pushing_outputs = [
+        output for start_time, output in enter_lane_outputs
+        if start_time + AIRTRACK_STATE_TIMER
+        <= push_start_time + AIRTRACK_ACTUATOR_PUSH_TIMEOUT]
+    assert len(pushing_outputs) >= 3
+    assert all(output == AirtrackActuator.HIGH for output in pushing_outputs)